@@ -22,6 +22,9 @@ config = {
     'prove_bit_lim': 256,
     'table_per_page_default': 50,
     'table_per_page_limit': 200,
+    'table_cache_size': 2**26,
+    'table_cache_ttl': 600.0,
+    'category_cache_ttl': 60.0,
     'max_content_length': 2**20,
     'max_factors_length': 2**18,
     'max_details_length': 2**19,
@@ -32,11 +35,24 @@ config = {
     'db_pass': 'test_fdb',
     'db_name': 'test_fdb',
     'db_con_lim': 64,
+    'db_con_min': 2,
+    'db_con_timeout': 10.0,
+    'db_con_max_age': 3600.0,
     'log_to_file': True,
+    'log_batch_size': 100,
+    'log_flush_interval': 2.0,
     'admin_email': 'admin@example.com',
     'proxy_fix_mode': 'none',
     'proxy_fix_hops': 0,
-    'pari_mem': 32000000
+    'pari_mem': 32000000,
+    'prime_workers': 4,
+    'prime_cache_size': 100000,
+    'prime_cache_file': 'primality.sqlite3',
+    'tdiv_bound': 100000,
+    'reservation_limit': 1000,
+    'reservation_lease_secs': 86400,
+    'api_batch_limit': 1000,
+    'api_export_limit': 2
 }
 '''
 
@@ -89,6 +105,21 @@ TABLE_PER_PAGE_DEFAULT: int = config['table_per_page_default']
 TABLE_PER_PAGE_LIMIT: int = config['table_per_page_limit']
 assert 0 < TABLE_PER_PAGE_DEFAULT <= TABLE_PER_PAGE_LIMIT <= 10000
 
+# approximate memory limit (bytes) for caching table pages (0 to disable)
+# and seconds before a cached page expires (to see changes by other processes)
+TABLE_CACHE_SIZE: int = config['table_cache_size']
+TABLE_CACHE_TTL: float = config['table_cache_ttl']
+assert isinstance(TABLE_CACHE_SIZE,int)
+assert isinstance(TABLE_CACHE_TTL,(int,float))
+assert TABLE_CACHE_SIZE >= 0
+assert TABLE_CACHE_TTL > 0
+
+# seconds before the cached category tree is reloaded (0 to disable caching)
+# (categories changed by other processes are seen after this time)
+CATEGORY_CACHE_TTL: float = config['category_cache_ttl']
+assert isinstance(CATEGORY_CACHE_TTL,(int,float))
+assert CATEGORY_CACHE_TTL >= 0
+
 # maximum length for post requests to the web server
 # minimum value allowed is 2**16
 MAX_CONTENT_LENGTH: int = config['max_content_length']
@@ -130,11 +161,36 @@ assert isinstance(DB_NAME,str)
 # limit on number of connections
 DB_CON_LIM: int = config['db_con_lim']
 assert isinstance(DB_CON_LIM,int)
+assert DB_CON_LIM > 0
+
+# number of connections to keep open when idle
+DB_CON_MIN: int = config['db_con_min']
+assert isinstance(DB_CON_MIN,int)
+assert 0 <= DB_CON_MIN <= DB_CON_LIM
+
+# seconds to wait for a free connection when the limit is reached
+DB_CON_TIMEOUT: float = config['db_con_timeout']
+assert isinstance(DB_CON_TIMEOUT,(int,float))
+assert DB_CON_TIMEOUT >= 0
+
+# seconds after which a connection is closed and replaced
+DB_CON_MAX_AGE: float = config['db_con_max_age']
+assert isinstance(DB_CON_MAX_AGE,(int,float))
+assert DB_CON_MAX_AGE > 0
 
 # whether to save log details to a file as well
 LOG_TO_FILE: bool = config['log_to_file']
 assert isinstance(LOG_TO_FILE,bool)
 
+# log messages are saved to the database by a background thread in batches
+# written when this many are waiting or after this many seconds
+LOG_BATCH_SIZE: int = config['log_batch_size']
+LOG_FLUSH_INTERVAL: float = config['log_flush_interval']
+assert isinstance(LOG_BATCH_SIZE,int)
+assert isinstance(LOG_FLUSH_INTERVAL,(int,float))
+assert LOG_BATCH_SIZE > 0
+assert LOG_FLUSH_INTERVAL > 0
+
 # email address for admin stuff
 # may eventually replace with a proper system for password resets
 ADMIN_EMAIL: str = config['admin_email']
@@ -152,3 +208,42 @@ assert PROXY_FIX_MODE is None or PROXY_FIX_HOPS > 0
 PARI_MEM: int = config['pari_mem']
 assert isinstance(PARI_MEM,int)
 assert PARI_MEM >= 8000000
+
+# number of processes for running primality tests in parallel
+# (0 runs them in the calling thread)
+PRIME_WORKERS: int = config['prime_workers']
+assert isinstance(PRIME_WORKERS,int)
+assert PRIME_WORKERS >= 0
+
+# number of primality test results to remember (0 to disable)
+# and a sqlite3 file to keep them between restarts (null for memory only)
+PRIME_CACHE_SIZE: int = config['prime_cache_size']
+PRIME_CACHE_FILE: str|None = config['prime_cache_file']
+assert isinstance(PRIME_CACHE_SIZE,int)
+assert PRIME_CACHE_SIZE >= 0
+assert PRIME_CACHE_FILE is None or isinstance(PRIME_CACHE_FILE,str)
+
+# primes below this bound are divided out of numbers when they are added
+# (batch trial division, 0 to disable, the prime products are kept in memory)
+TDIV_BOUND: int = config['tdiv_bound']
+assert isinstance(TDIV_BOUND,int)
+assert 0 <= TDIV_BOUND <= 2**24
+
+# number of factors each user can reserve for work at the same time
+# and the longest lease (seconds) before a reservation expires without renewal
+RESERVATION_LIMIT: int = config['reservation_limit']
+RESERVATION_LEASE_SECS: int = config['reservation_lease_secs']
+assert isinstance(RESERVATION_LIMIT,int)
+assert isinstance(RESERVATION_LEASE_SECS,int)
+assert RESERVATION_LIMIT >= 0
+assert RESERVATION_LEASE_SECS > 0
+
+# most ids/values looked up or factors submitted in one api request
+API_BATCH_LIMIT: int = config['api_batch_limit']
+assert isinstance(API_BATCH_LIMIT,int)
+assert API_BATCH_LIMIT > 0
+
+# most /api/export streams running at once (each holds a database connection)
+API_EXPORT_LIMIT: int = config['api_export_limit']
+assert isinstance(API_EXPORT_LIMIT,int)
+assert API_EXPORT_LIMIT > 0
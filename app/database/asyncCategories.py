@@ -0,0 +1,241 @@
+'''
+async versions of the hot read functions in categories
+(for awaiting from quart request handlers without blocking the event loop)
+'''
+
+import psycopg
+from typing import Iterable
+
+from app.database.asyncConnectionPool import FdbAsyncConnection
+from app.database.asyncNumbers import _getFactorTreeRows
+from app.database.categories import \
+    CategoryRow, \
+    CategoryTree, \
+    _cachedCategoryTree, \
+    _putCategoryTree, \
+    _PATH_QUERY, \
+    _PATH_BY_ID_QUERY, \
+    _NUMBER_INFO_QUERY
+from app.database.categoryStats import CategoryStatsRow
+from app.database.helpers import \
+    stringToPath, \
+    FdbException
+from app.database.numbers import \
+    NumberRow, \
+    _numberFactorizationFromTreeRows
+
+from app.config import \
+    DEBUG_EXTRA, \
+    CATEGORY_CACHE_TTL
+
+async def _getCategoryTree(con:psycopg.AsyncConnection,/) \
+        -> CategoryTree|None:
+    # cached category tree, loading it with one query if needed
+    # (none if caching is disabled)
+    if CATEGORY_CACHE_TTL == 0:
+        return None
+    tree,generation = _cachedCategoryTree()
+    if tree is None:
+        cur = await con.execute("select * from categories;")
+        tree = CategoryTree(CategoryRow(row) for row in await cur.fetchall())
+        _putCategoryTree(tree,generation)
+    return tree
+
+async def _getCategoryById(i:int,con:psycopg.AsyncConnection,/) \
+        -> None|CategoryRow:
+    # get category by id (from connection)
+    tree = await _getCategoryTree(con)
+    if tree is not None and i in tree.by_id:
+        return tree.by_id[i]
+    cur = await con.execute("select * from categories where id = %s;",(i,))
+    row = await cur.fetchone()
+    return None if row is None else CategoryRow(row)
+
+async def _getCategoryByPath(path:tuple[str,...],
+                             con:psycopg.AsyncConnection,/) \
+        -> None|list[CategoryRow]:
+    # get category by path (from connection)
+    tree = await _getCategoryTree(con)
+    if tree is not None:
+        ret = tree.byPath(path)
+        if ret is not None:
+            return ret
+    # may be created by another process after the tree was loaded
+    cur = await con.execute(_PATH_QUERY,(list(path),))
+    ret = [CategoryRow(row) for row in await cur.fetchall()]
+    assert ret != [], 'internal error (root category never created)'
+    return ret if len(ret) == len(path)+1 else None
+
+async def _getCategoryPathById(i:int,con:psycopg.AsyncConnection,/) \
+        -> None|list[CategoryRow]:
+    # full category path details from id (going back up to root)
+    tree = await _getCategoryTree(con)
+    if tree is not None:
+        ret = tree.pathById(i)
+        if ret is not None:
+            return ret
+    cur = await con.execute(_PATH_BY_ID_QUERY,(i,))
+    ret = [CategoryRow(row) for row in await cur.fetchall()]
+    if ret == []:
+        return None
+    assert ret[0].id == 0, 'internal error (parent does not exist)'
+    return ret
+
+async def getCategoryFullPath(pathOrId:int|tuple[str,...]|str,/) \
+        -> None|list[CategoryRow]:
+    '''
+    find info of a category and all its parents, empty path is root
+    none if it does not exist
+    '''
+    if isinstance(pathOrId,str):
+        pathOrId = stringToPath(pathOrId)
+
+    async with FdbAsyncConnection() as con:
+        if isinstance(pathOrId,tuple):
+            return await _getCategoryByPath(pathOrId,con)
+        else:
+            return await _getCategoryPathById(pathOrId,con)
+
+async def listCategory(pathOrId:int|tuple[str,...]|str,/) \
+        -> None|list[CategoryRow]:
+    '''
+    list category children (by id)
+    none if it does not exist
+    empty list is still possible for categories that do exist
+    '''
+    if isinstance(pathOrId,str):
+        pathOrId = stringToPath(pathOrId)
+
+    async with FdbAsyncConnection() as con:
+        if isinstance(pathOrId,tuple):
+            data = await _getCategoryByPath(pathOrId,con)
+            if data is None:
+                return None
+            pathOrId = data[-1].id
+        cur = await con.execute("select * from categories "
+                                "where parent_id = %s and id <> 0 "
+                                "order by order_num nulls last;",(pathOrId,))
+        return [CategoryRow(row) for row in await cur.fetchall()]
+
+async def getCategoryNumberInfo(path:tuple[str,...]|str,/,
+                                start:int,count:int=1) \
+        -> list[tuple[int,str,str|NumberRow,list[tuple[int,int,None|int]]]]:
+    '''
+    gets number table information for a category
+    each is (index,expr,int|number_row,list[factor,primality,id])
+    '''
+    if isinstance(path,str):
+        path = stringToPath(path)
+
+    async with FdbAsyncConnection() as con:
+        cat = await _getCategoryByPath(path,con)
+        if cat is None:
+            raise FdbException('category does not exist')
+        cat = cat[-1]
+        ret: list[tuple[int,str,str|NumberRow,list[tuple[int,int,None|int]]]] \
+            = []
+
+        # sequence rows with their number rows (if stored in database)
+        cur = await con.execute(_NUMBER_INFO_QUERY,
+                                (cat.id,start,start+count))
+        seq_rows = await cur.fetchall()
+
+        # factor trees at once for cofactors without a stored summary
+        num_rows = [None if row[3] is None else NumberRow(row[3:])
+                    for row in seq_rows]
+        tree_rows = await _getFactorTreeRows((num.cof_id for num in num_rows
+                                              if num is not None
+                                              and num.summary is None
+                                              and num.cof_id is not None),con)
+
+    for (index,value,expr,*_),num in zip(seq_rows,num_rows):
+
+        if DEBUG_EXTRA:
+            assert isinstance(index,int)
+            assert value is None or isinstance(value,str)
+            assert expr is None or isinstance(expr,str)
+
+        if expr is None:
+            expr = ''
+
+        if num is None: # number not stored in database
+            ret.append((index,expr,value,[]))
+
+        elif num.summary is not None: # number stored in database
+            ret.append((index,expr,num,num.summary))
+
+        else: # summary not computed yet
+            factors = _numberFactorizationFromTreeRows(num,tree_rows)
+            ret.append((index,expr,num,factors))
+
+    return ret
+
+async def findCategoriesWithNumber(i:int,/) \
+        -> list[tuple[CategoryRow,int,tuple[str,...]]]:
+    '''
+    list of (row,index,path) for categories containing number id i
+    '''
+    async with FdbAsyncConnection() as con:
+        cur = await con.execute("select cat_id,index from sequences "
+                                "where num_id = %s;",(i,))
+        cat_ids: list[tuple[int,int]] = await cur.fetchall()
+        ret: list[tuple[CategoryRow,int,tuple[str,...]]] = []
+
+        for cat_id,index in cat_ids:
+            path = await _getCategoryPathById(cat_id,con)
+            assert path is not None, 'internal error'
+            ret.append((path[-1],index,tuple(r.name for r in path[1:])))
+
+        return ret
+
+async def findCategoryIndexRange(path:tuple[str,...]|str|int,/) \
+        -> None|tuple[int,int]:
+    '''
+    find the min and max of the indexes in a category (from category_stats)
+    '''
+    if isinstance(path,str):
+        path = stringToPath(path)
+
+    async with FdbAsyncConnection() as con:
+        if isinstance(path,tuple):
+            row = await _getCategoryByPath(path,con)
+            if row is None:
+                return None
+            path = row[-1].id
+
+        cur = await con.execute("select index_min,index_max "
+                                "from category_stats where cat_id = %s;",
+                                (path,))
+        row = await cur.fetchone()
+        if row is not None:
+            cmin,cmax = row
+            if isinstance(cmin,int) and isinstance(cmax,int):
+                return (cmin,cmax)
+        return None
+
+async def getCategoryStatsMany(cat_ids:Iterable[int],/) \
+        -> dict[int,CategoryStatsRow]:
+    '''
+    stats by category id (categories without sequence entries are missing)
+    '''
+    async with FdbAsyncConnection() as con:
+        cur = await con.execute("select * from category_stats "
+                                "where cat_id = any(%s);",(list(cat_ids),))
+        return {row[0]: CategoryStatsRow(row) for row in await cur.fetchall()}
+
+async def getCategoryStatsTotals() -> dict[str,int|None]:
+    '''
+    totals over all tables with sequence entries
+    '''
+    async with FdbAsyncConnection() as con:
+        cur = await con.execute("select count(*),"
+                                "coalesce(sum(count),0)::bigint,"
+                                "coalesce(sum(complete),0)::bigint,"
+                                "count(*) filter (where complete = count),"
+                                "count(*) filter (where "
+                                "count <> index_max-index_min+1),"
+                                "max(bits_max) from category_stats;")
+        row = await cur.fetchone()
+        assert row is not None, 'internal error'
+        return dict(zip(('tables','entries','complete','tables_complete',
+                         'tables_with_gaps','bits_max'),row))
@@ -0,0 +1,34 @@
+'''
+async versions of the read functions in changes
+'''
+
+from app.database.asyncConnectionPool import FdbAsyncConnection
+from app.database.changes import ChangeRow
+
+async def getChangesSince(cursor:int,/,limit:int=1000) -> list[ChangeRow]:
+    '''
+    change log entries after cursor (an entry id) in order, up to limit
+    '''
+    async with FdbAsyncConnection() as con:
+        cur = await con.execute("select id,kind,fac_id,num_id,time "
+                                "from changes where id > %s "
+                                "order by id limit %s;",(cursor,limit))
+        return [ChangeRow(row) for row in await cur.fetchall()]
+
+async def getChangesCursor() -> int:
+    '''
+    id of the latest change log entry (0 if empty)
+    '''
+    async with FdbAsyncConnection() as con:
+        cur = await con.execute("select coalesce(max(id),0) from changes;")
+        return (await cur.fetchone())[0] # type:ignore
+
+async def getRecentChanges(count:int,/) -> list[ChangeRow]:
+    '''
+    latest change log entries, newest first
+    '''
+    async with FdbAsyncConnection() as con:
+        cur = await con.execute("select id,kind,fac_id,num_id,time "
+                                "from changes order by id desc limit %s;",
+                                (count,))
+        return [ChangeRow(row) for row in await cur.fetchall()]
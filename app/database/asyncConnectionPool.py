@@ -0,0 +1,120 @@
+'''
+manages an async connection pool for use from quart request handlers
+(same behavior as connectionPool but with psycopg.AsyncConnection)
+'''
+
+import asyncio
+import psycopg
+import sys
+import time
+
+from app.config import \
+    DB_PASS, \
+    DB_CON_LIM, \
+    DB_CON_TIMEOUT, \
+    DB_CON_MAX_AGE
+
+from app.database.connectionPool import _CON_STRING
+from app.database.helpers import FdbException
+
+async def _makeAsyncConnection() -> psycopg.AsyncConnection:
+    return await psycopg.AsyncConnection.connect(_CON_STRING,password=DB_PASS)
+
+# reusable async connection objects (bound to the serving event loop)
+_ASYNC_CON_POOL: list[psycopg.AsyncConnection] = []
+_ASYNC_CON_CREATED: dict[int,float] = {} # id(con) -> creation time
+_ASYNC_CON_COUNT: int = 0
+_ASYNC_CON_COND = asyncio.Condition()
+
+def _asyncConnectionUsable(con:psycopg.AsyncConnection,/) -> bool:
+    # cheap liveness and age check before reuse
+    return not con.closed and not con.broken and \
+        time.monotonic() - _ASYNC_CON_CREATED[id(con)] <= DB_CON_MAX_AGE
+
+async def _discardAsyncConnection(con:psycopg.AsyncConnection,/):
+    # close a connection and free its slot
+    global _ASYNC_CON_COUNT
+    _ASYNC_CON_CREATED.pop(id(con),None)
+    try:
+        await con.close()
+    except Exception:
+        pass
+    async with _ASYNC_CON_COND:
+        _ASYNC_CON_COUNT -= 1
+        _ASYNC_CON_COND.notify()
+
+class FdbAsyncConnection:
+    '''
+    for handling async database connection
+    async with FdbAsyncConnection() as con: ...
+    caller must call await con.commit() if doing write operations
+    waits for a connection if the limit is reached (exception on timeout)
+    '''
+
+    def __init__(self):
+        self.con = None
+
+    async def __aenter__(self) -> psycopg.AsyncConnection:
+        global _ASYNC_CON_COUNT
+        deadline = time.monotonic() + DB_CON_TIMEOUT
+
+        while True:
+            con = None
+            async with _ASYNC_CON_COND:
+                while True:
+                    if _ASYNC_CON_POOL:
+                        con = _ASYNC_CON_POOL.pop()
+                        break
+                    if _ASYNC_CON_COUNT < DB_CON_LIM:
+                        # reserve slot before awaiting the new connection
+                        _ASYNC_CON_COUNT += 1
+                        break
+                    try:
+                        await asyncio.wait_for(_ASYNC_CON_COND.wait(),
+                                               deadline - time.monotonic())
+                    except TimeoutError:
+                        raise FdbException('timed out waiting for database '
+                                           'connection')
+
+            if con is not None:
+                if _asyncConnectionUsable(con):
+                    break
+                await _discardAsyncConnection(con)
+                continue
+
+            try:
+                con = await _makeAsyncConnection()
+            except:
+                async with _ASYNC_CON_COND:
+                    _ASYNC_CON_COUNT -= 1
+                    _ASYNC_CON_COND.notify()
+                raise
+            _ASYNC_CON_CREATED[id(con)] = time.monotonic()
+            sys.stderr.write(
+                f'created async connection, total is now {_ASYNC_CON_COUNT}\n')
+            break
+
+        self.con = con
+        return self.con
+
+    async def __aexit__(self,exctyp,excval,traceback) -> None:
+        assert isinstance(self.con,psycopg.AsyncConnection)
+        try:
+            await self.con.rollback()
+        except Exception:
+            pass
+        if not _asyncConnectionUsable(self.con):
+            await _discardAsyncConnection(self.con)
+            return
+        async with _ASYNC_CON_COND:
+            _ASYNC_CON_POOL.append(self.con)
+            _ASYNC_CON_COND.notify()
+
+async def closeAsyncDatabaseConnections():
+    global _ASYNC_CON_POOL, _ASYNC_CON_COUNT
+    async with _ASYNC_CON_COND:
+        for con in _ASYNC_CON_POOL:
+            _ASYNC_CON_CREATED.pop(id(con),None)
+            await con.close()
+        _ASYNC_CON_COUNT -= len(_ASYNC_CON_POOL)
+        _ASYNC_CON_POOL = []
@@ -0,0 +1,151 @@
+'''
+async versions of the hot read functions in numbers
+(for awaiting from quart request handlers without blocking the event loop)
+'''
+
+import psycopg
+from typing import Iterable
+
+from app.database.asyncConnectionPool import FdbAsyncConnection
+from app.database.helpers import intToFdbNumber
+from app.database.numbers import \
+    FactorRow, \
+    NumberRow, \
+    _numberFactorizationFromTreeRows, \
+    _FACTOR_TREE_QUERY
+
+async def _getNumberById(i:int,con:psycopg.AsyncConnection,/) \
+        -> None|NumberRow:
+    # get number by id (from connection)
+    cur = await con.execute("select * from numbers where id = %s;",(i,))
+    row = await cur.fetchone()
+    return None if row is None else NumberRow(row)
+
+async def getNumberById(i:int,/) -> None|NumberRow:
+    '''
+    returns the database row for a number (those to be factored)
+    result is none if number is not in database
+    '''
+    async with FdbAsyncConnection() as con:
+        return await _getNumberById(i,con)
+
+async def getNumberByValue(n:int,/) -> None|NumberRow:
+    '''
+    returns the database row for a number (those to be factored)
+    result is none if number is not in database
+    '''
+    if n < 2:
+        return None
+    async with FdbAsyncConnection() as con:
+        cur = await con.execute("select * from numbers where value = %s;",
+                                (intToFdbNumber(n),))
+        row = await cur.fetchone()
+        return None if row is None else NumberRow(row)
+
+async def getFactorById(i:int,/) -> None|FactorRow:
+    '''
+    returns the database row for a factor (intermediate results)
+    result is none if factor is not in database
+    '''
+    async with FdbAsyncConnection() as con:
+        cur = await con.execute("select * from factors where id = %s;",(i,))
+        row = await cur.fetchone()
+        return None if row is None else FactorRow(row)
+
+async def getFactorByValue(n:int,/) -> None|FactorRow:
+    '''
+    returns the database row for a factor (intermediate results)
+    result is none if factor is not in database
+    '''
+    if n <= 0:
+        return None
+    async with FdbAsyncConnection() as con:
+        cur = await con.execute("select * from factors where value = %s;",
+                                (intToFdbNumber(n),))
+        row = await cur.fetchone()
+        return None if row is None else FactorRow(row)
+
+async def _getFactorTreeRows(ids:Iterable[int],
+                             con:psycopg.AsyncConnection,/) \
+        -> dict[int,FactorRow]:
+    # async version of numbers._getFactorTreeRows
+    cur = await con.execute(_FACTOR_TREE_QUERY,(list(ids),))
+    ret: dict[int,FactorRow] = {}
+    for row in await cur.fetchall():
+        f_row = FactorRow(row)
+        ret[f_row.id] = f_row
+    return ret
+
+async def getNumberFactorizationById(i:int,/) \
+        -> None|list[tuple[int,int,None|int]]:
+    '''
+    builds the current factorization data for a number, finding by id
+    returns none if number does not exist
+    returns a list of (factor,primality,id) tuples, or none if not in database
+    id is none for small factors
+    '''
+    async with FdbAsyncConnection() as con:
+        row = await _getNumberById(i,con)
+        if row is None:
+            return None
+        if row.summary is not None:
+            return row.summary
+        rows = {} if row.cof_id is None \
+            else await _getFactorTreeRows([row.cof_id],con)
+    return _numberFactorizationFromTreeRows(row,rows)
+
+async def getNumbersMany(ids:Iterable[int],values:Iterable[int],/) \
+        -> list[NumberRow]:
+    '''
+    returns the database rows for numbers found by id or value
+    (a single query, numbers not in the database are left out)
+    '''
+    async with FdbAsyncConnection() as con:
+        cur = await con.execute("select * from numbers "
+                                "where id = any(%s) or value = any(%s) "
+                                "order by id;",
+                                (list(ids),[intToFdbNumber(n)
+                                            for n in values if n > 1]))
+        return [NumberRow(row) for row in await cur.fetchall()]
+
+async def getFactorsMany(ids:Iterable[int],values:Iterable[int],/) \
+        -> list[FactorRow]:
+    '''
+    returns the database rows for factors found by id or value
+    (a single query, factors not in the database are left out)
+    '''
+    async with FdbAsyncConnection() as con:
+        cur = await con.execute("select * from factors "
+                                "where id = any(%s) or value = any(%s) "
+                                "order by id;",
+                                (list(ids),[intToFdbNumber(n)
+                                            for n in values if n > 0]))
+        return [FactorRow(row) for row in await cur.fetchall()]
+
+async def getNumberFactorizationsMany(rows:Iterable[NumberRow],/) \
+        -> dict[int,list[tuple[int,int,None|int]]]:
+    '''
+    factorizations for number rows (by number id), uses the stored summaries
+    and a single query for the cofactor trees of the others
+    '''
+    rows = list(rows)
+    ret = {row.id:row.summary for row in rows if row.summary is not None}
+    cof_ids = [row.cof_id for row in rows
+               if row.summary is None and row.cof_id is not None]
+    trees: dict[int,FactorRow] = {}
+    if cof_ids != []:
+        async with FdbAsyncConnection() as con:
+            trees = await _getFactorTreeRows(cof_ids,con)
+    for row in rows:
+        if row.summary is None:
+            ret[row.id] = _numberFactorizationFromTreeRows(row,trees)
+    return ret
+
+async def getOldFactors(i:int,/) -> list[tuple[int,int]]:
+    '''
+    get a list of factor ID pairs for old factorizations
+    '''
+    async with FdbAsyncConnection() as con:
+        cur = await con.execute("select f1_id,f2_id from factors_old "
+                                "where fac_id = %s;",(i,))
+        return await cur.fetchall()
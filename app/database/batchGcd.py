@@ -0,0 +1,140 @@
+'''
+finds factors shared between stored composites with batch gcd
+- related numbers (such as repunits) often have common factors which are
+  not found by factoring each number separately
+- uses a product tree and remainder tree (Bernstein) so all gcds of each
+  value with the product of the others take quasi-linear time
+- splits are applied through _FactorCascade in one transaction per round
+'''
+
+import gmpy2
+import psycopg
+from typing import Iterable
+
+from app.database.connectionPool import FdbConnection
+from app.database.helpers import \
+    fdbNumberToInt, \
+    stringToPath, \
+    pathToString, \
+    FdbException
+from app.database.constants import Primality
+from app.database.logging import logDatabaseInfoMessage
+from app.database.categories import _getCategoryByPath
+from app.database.numbers import \
+    _FactorCascade, \
+    _completeNumbers, \
+    _getFactorTreeRows
+from app.utils.trialDivision import _productTree
+
+def batchGcd(values:Iterable[int],/) -> list[int]:
+    '''
+    gcd of each value with the product of all other values
+    (result equals the value when all its prime factors are shared)
+    '''
+    xs = [gmpy2.mpz(v) for v in values] # type:ignore
+    if len(xs) < 2:
+        return [1]*len(xs)
+
+    # reduce the product modulo x**2 going down the tree
+    tree = _productTree(xs)
+    rems = tree[-1]
+    for level in reversed(tree[:-1]):
+        rems = [rems[i//2] % (x*x) for i,x in enumerate(level)]
+
+    # rem = (product mod x**2) so rem/x = (product of others mod x)
+    return [int(gmpy2.gcd(x,rem//x)) for x,rem in zip(xs,rems)] # type:ignore
+
+def findSharedFactors(values:list[int],/) -> list[tuple[int,int]]:
+    '''
+    nontrivial (value,factor) pairs from factors shared between the values
+    '''
+    gcds = batchGcd(values)
+    ret: list[tuple[int,int]] = []
+
+    # values sharing all their prime factors need gcds with single values
+    # (only those sharing a factor with something can help)
+    sharing = [v for v,g in zip(values,gcds) if g > 1]
+    for v,g in zip(values,gcds):
+        if g == 1:
+            continue
+        if g == v:
+            for w in sharing:
+                d = int(gmpy2.gcd(v,w)) # type:ignore
+                if 1 < d < v:
+                    ret.append((v,d))
+                    break
+        else:
+            ret.append((v,g))
+    return ret
+
+def _compositeFactors(con:psycopg.Connection,/) -> dict[int,int]:
+    # id -> value for all composite (or unknown) factors not yet factored
+    cur = con.execute("select id,value from factors "
+                      "where primality in (%s,%s) and f1_id is null;",
+                      (Primality.UNKNOWN,Primality.COMPOSITE))
+    return {f_id:fdbNumberToInt(f_b) for f_id,f_b in cur.fetchall()}
+
+def _categoryCompositeFactors(cat_id:int,con:psycopg.Connection,/) \
+        -> dict[int,int]:
+    # same for the cofactors of incomplete numbers in a category and below
+    cur = con.execute("with recursive cats (id) as (select %s::bigint "
+                      "union select categories.id from categories "
+                      "join cats on categories.parent_id = cats.id "
+                      "where categories.id <> 0) "
+                      "select distinct numbers.cof_id from sequences "
+                      "join cats on sequences.cat_id = cats.id "
+                      "join numbers on sequences.num_id = numbers.id "
+                      "where not numbers.complete "
+                      "and numbers.cof_id is not null;",(cat_id,))
+    rows = _getFactorTreeRows((row[0] for row in cur.fetchall()),con)
+    return {row.id:row.value for row in rows.values()
+            if row.f1_id is None
+            and row.primality in (Primality.UNKNOWN,Primality.COMPOSITE)}
+
+def refactorSharedFactors(path:None|tuple[str,...]|str=None,/,
+                          max_rounds:int=10) -> int:
+    '''
+    split composites using factors shared with other composites
+    uses all unfactored composites, or the cofactors in a category path
+    repeats until no new splits are found (at most max_rounds times)
+    returns the number of factors given a new factorization
+    '''
+    assert max_rounds > 0
+    if isinstance(path,str):
+        path = stringToPath(path)
+    total = 0
+
+    for _ in range(max_rounds):
+        with FdbConnection() as con:
+            if path is None:
+                factors = _compositeFactors(con)
+            else:
+                data = _getCategoryByPath(path,con)
+                if data is None:
+                    raise FdbException(f'category {pathToString(path)} '
+                                       f'does not exist')
+                factors = _categoryCompositeFactors(data[-1].id,con)
+
+            ids = list(factors)
+            found = findSharedFactors([factors[i] for i in ids])
+            if found == []:
+                break
+            id_by_value = {factors[i]:i for i in ids}
+
+            # apply all splits together
+            cascade = _FactorCascade(con)
+            for v,d in found:
+                cascade.tryFactors(id_by_value[v],[d])
+            num_ids = cascade.write()
+            con.commit()
+
+        count = len(set(cascade.factored))
+        logDatabaseInfoMessage(f'batch gcd of {len(ids)} composites found '
+                               f'{len(found)} shared factors, '
+                               f'{count} factors split')
+        _completeNumbers(num_ids)
+        total += count
+        if count == 0:
+            break
+
+    return total
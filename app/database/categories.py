@@ -5,7 +5,11 @@ manages categories and tables for listing number sequences
 import psycopg
 import psycopg.sql
 import re
-from typing import Generator
+import threading
+import time
+from typing import \
+    Generator, \
+    Iterable
 
 from app.database.connectionPool import FdbConnection
 from app.database.helpers import \
@@ -13,14 +17,20 @@ from app.database.helpers import \
     pathToString, \
     FdbException
 from app.database.logging import logDatabaseInfoMessage
+from app.database.categoryStats import \
+    _addCategoryStats, \
+    _refreshCategoryStats
+from app.utils.tableCache import invalidateTableCategory
 from app.database.numbers import \
     _getNumberByValue, \
-    _getNumberById, \
     deleteNumberById, \
     NumberRow, \
-    _getNumberFactorizationHelper
+    _getFactorTreeRows, \
+    _numberFactorizationFromTreeRows
 
-from app.config import DEBUG_EXTRA
+from app.config import \
+    DEBUG_EXTRA, \
+    CATEGORY_CACHE_TTL
 
 # what a path component is allowed to contain
 _PATH_NAME_RE = re.compile(r'[\w\+\-\=][\w\+\-\=\.]*')
@@ -75,8 +85,126 @@ class CategoryRow:
             f'info={repr(self.info)},' \
             f'expr={repr(self.expr)})>'
 
+class CategoryTree:
+    '''
+    all category rows indexed for path lookups without queries
+    '''
+
+    def __init__(self,rows:Iterable[CategoryRow]):
+        self.by_id: dict[int,CategoryRow] = {}
+        self.by_name: dict[tuple[int,str],CategoryRow] = {}
+        for row in rows:
+            self.by_id[row.id] = row
+            if row.id != 0: # root is its own parent
+                self.by_name[(row.parent_id,row.name)] = row
+
+    def byPath(self,path:tuple[str,...],/) -> None|list[CategoryRow]:
+        row = self.by_id.get(0)
+        if row is None:
+            return None
+        ret = [row]
+        for p in path:
+            row = self.by_name.get((row.id,p))
+            if row is None:
+                return None
+            ret.append(row)
+        return ret
+
+    def pathById(self,i:int,/) -> None|list[CategoryRow]:
+        row = self.by_id.get(i)
+        if row is None:
+            return None
+        ret = [row]
+        while row.id != 0:
+            row = self.by_id.get(row.parent_id)
+            if row is None: # inconsistent (should not happen)
+                return None
+            ret.append(row)
+        return ret[::-1]
+
+# category tree cache shared by the sync and async lookups (per process)
+# generation changes on invalidation so trees loaded before then are not used
+_TREE_LOCK = threading.Lock()
+_TREE: CategoryTree|None = None
+_TREE_TIME = 0.0
+_TREE_GENERATION = 0
+
+def _cachedCategoryTree() -> tuple[CategoryTree|None,int]:
+    # cached tree (none if not loaded or expired) and the generation to pass
+    # to _putCategoryTree after loading one
+    with _TREE_LOCK:
+        if _TREE is not None \
+                and time.monotonic() - _TREE_TIME < CATEGORY_CACHE_TTL:
+            return _TREE,_TREE_GENERATION
+        return None,_TREE_GENERATION
+
+def _putCategoryTree(tree:CategoryTree,generation:int,/):
+    global _TREE, _TREE_TIME
+    with _TREE_LOCK:
+        if generation == _TREE_GENERATION:
+            _TREE = tree
+            _TREE_TIME = time.monotonic()
+
+def invalidateCategoryTree():
+    '''
+    drop the cached category tree (after categories are changed)
+    '''
+    global _TREE, _TREE_GENERATION
+    with _TREE_LOCK:
+        _TREE = None
+        _TREE_GENERATION += 1
+
+def _getCategoryTree(con:psycopg.Connection,/) -> CategoryTree|None:
+    # cached category tree, loading it with one query if needed
+    # (none if caching is disabled)
+    if CATEGORY_CACHE_TTL == 0:
+        return None
+    tree,generation = _cachedCategoryTree()
+    if tree is None:
+        cur = con.execute("select * from categories;")
+        tree = CategoryTree(CategoryRow(row) for row in cur.fetchall())
+        _putCategoryTree(tree,generation)
+    return tree
+
+# single query lookups following the path down from root or the parents up
+# from a category (rows in order starting at root)
+_PATH_QUERY = "with recursive walk (depth,id) as (" \
+    "select 0,0::bigint union all " \
+    "select walk.depth+1,categories.id from walk join categories " \
+    "on categories.parent_id = walk.id and categories.id <> 0 " \
+    "and categories.name = (%s::text[])[walk.depth+1]) " \
+    "select categories.* from walk join categories " \
+    "on categories.id = walk.id order by walk.depth;"
+_PATH_BY_ID_QUERY = "with recursive walk (depth,id) as (" \
+    "select 0,%s::bigint union all " \
+    "select walk.depth+1,categories.parent_id from walk join categories " \
+    "on categories.id = walk.id where walk.id <> 0) " \
+    "select categories.* from walk join categories " \
+    "on categories.id = walk.id order by walk.depth desc;"
+
+def _queryCategoryByPath(path:tuple[str,...],con:psycopg.Connection,/) \
+        -> None|list[CategoryRow]:
+    # get category by path from the database (not cached)
+    cur = con.execute(_PATH_QUERY,(list(path),))
+    ret = [CategoryRow(row) for row in cur.fetchall()]
+    assert ret != [], 'internal error (root category never created)'
+    return ret if len(ret) == len(path)+1 else None
+
+def _queryCategoryPathById(i:int,con:psycopg.Connection,/) \
+        -> None|list[CategoryRow]:
+    # full category path details from id from the database (not cached)
+    cur = con.execute(_PATH_BY_ID_QUERY,(i,))
+    ret = [CategoryRow(row) for row in cur.fetchall()]
+    if ret == []:
+        return None
+    assert ret[0].id == 0, 'internal error (parent does not exist)'
+    return ret
+
 def _getCategoryById(i:int,con:psycopg.Connection,/) -> None|CategoryRow:
     # get category by id (from connection)
+    tree = _getCategoryTree(con)
+    if tree is not None and i in tree.by_id:
+        return tree.by_id[i]
     cur = con.execute("select * from categories where id = %s;",(i,))
     row = cur.fetchone()
     return None if row is None else CategoryRow(row)
@@ -84,48 +212,23 @@ def _getCategoryById(i:int,con:psycopg.Connection,/) -> None|CategoryRow:
 def _getCategoryByPath(path:tuple[str,...],con:psycopg.Connection,/) \
         -> None|list[CategoryRow]:
     # get categogry by path (from connection)
-    row = _getCategoryById(0,con)
-    assert row is not None, 'internal error (root category never created)'
-    ret = [row]
-
-    for p in path:
-        cur = con.execute("select * from categories "
-                          "where parent_id = %s and name = %s;",
-                          (row.id,p))
-        row2 = cur.fetchone()
-        if row2 is None:
-            return None
-
-        if DEBUG_EXTRA:
-            assert cur.fetchone() is None, 'internal error (duplicate path)'
-
-        row = CategoryRow(row2)
-        ret.append(row)
-
-    return ret
+    tree = _getCategoryTree(con)
+    if tree is not None:
+        ret = tree.byPath(path)
+        if ret is not None:
+            return ret
+    # may be created by another process after the tree was loaded
+    return _queryCategoryByPath(path,con)
 
 def _getCategoryPathById(i:int,con:psycopg.Connection,/) \
         -> None|list[CategoryRow]:
     # full category path details from id (going back up to root)
-    row = _getCategoryById(i,con)
-    if row is None:
-        return None
-
-    ret = [row]
-    while row.id != 0:
-        cur = con.execute("select * from categories where id = %s;",
-                          (row.parent_id,))
-        row2 = cur.fetchone()
-        assert row2 is not None, 'internal error (parent does not exist)'
-
-        if DEBUG_EXTRA:
-            assert cur.fetchone() is None, 'internal error (duplicate id)'
-
-        row = CategoryRow(row2)
-        ret.append(row)
-
-    # switch order to start at root
-    return ret[::-1]
+    tree = _getCategoryTree(con)
+    if tree is not None:
+        ret = tree.pathById(i)
+        if ret is not None:
+            return ret
+    return _queryCategoryPathById(i,con)
 
 def getCategory(pathOrId:int|tuple[str,...]|str,/) -> None|CategoryRow:
     '''
@@ -246,6 +349,7 @@ def createCategory(path:tuple[str,...]|str,/,is_table:bool,
             f'created {'table' if is_table else 'category'} '
             f'id {new_row.id} with path {pathToString(path)}')
         con.commit()
+        invalidateCategoryTree()
         return new_row
 
 # prepare queries for the columns that may be updated in categories table
@@ -265,7 +369,7 @@ def _setCategoryColumn(pathOrId:int|tuple[str,...]|str,value,column:str,/):
 
     with FdbConnection() as con:
         if isinstance(pathOrId,tuple):
-            pathdata = _getCategoryByPath(pathOrId,con)
+            pathdata = _queryCategoryByPath(pathOrId,con)
             if pathdata is not None:
                 pathdata = pathdata[-1]
         else:
@@ -276,6 +380,7 @@ def _setCategoryColumn(pathOrId:int|tuple[str,...]|str,value,column:str,/):
 
         con.execute(_SET_CATEGORY_COLUMN_QUERIES[column],(value,pathdata.id))
         con.commit()
+        invalidateCategoryTree()
 
         if isinstance(pathOrId,tuple):
             logDatabaseInfoMessage(
@@ -358,10 +463,10 @@ def renameCategory(old:tuple[str,...]|str,new:tuple[str,...]|str,/):
         raise FdbException('invalid path name')
 
     with FdbConnection() as con:
-        olddata = _getCategoryByPath(old,con)
+        olddata = _queryCategoryByPath(old,con)
         if olddata is None:
             raise FdbException('old path does not exist')
-        newdata = _getCategoryByPath(new[:-1],con)
+        newdata = _queryCategoryByPath(new[:-1],con)
         if newdata is None:
             raise FdbException('new path parent does not exist')
 
@@ -369,6 +474,7 @@ def renameCategory(old:tuple[str,...]|str,new:tuple[str,...]|str,/):
                     "name = %s where id = %s;",
                     (newdata[-1].id,new[-1],olddata[-1].id))
         con.commit()
+        invalidateCategoryTree()
         logDatabaseInfoMessage(
             f'renamed {pathToString(old)} to {pathToString(new)}')
 
@@ -384,12 +490,14 @@ def deleteCategory(path:tuple[str,...]|str,/):
         raise FdbException('cannot remove root category')
 
     with FdbConnection() as con:
-        data = _getCategoryByPath(path,con)
+        data = _queryCategoryByPath(path,con)
         if data is None:
             raise FdbException('path does not exist')
 
         con.execute('delete from categories where id = %s;',(data[-1].id,))
         con.commit()
+        invalidateCategoryTree()
+        invalidateTableCategory(data[-1].id)
         logDatabaseInfoMessage(f'deleted {pathToString(path)}')
 
 def reorderSubcategories(path:tuple[str,...]|str,/,order:list[str]):
@@ -401,7 +509,7 @@ def reorderSubcategories(path:tuple[str,...]|str,/,order:list[str]):
         path = stringToPath(path)
 
     with FdbConnection() as con:
-        data = _getCategoryByPath(path,con)
+        data = _queryCategoryByPath(path,con)
         if data is None:
             raise FdbException('path does not exist')
 
@@ -416,6 +524,7 @@ def reorderSubcategories(path:tuple[str,...]|str,/,order:list[str]):
         con.cursor().executemany("update categories set order_num = %s "
                                  "where id = %s;",queryparams)
         con.commit()
+        invalidateCategoryTree()
         logDatabaseInfoMessage(f'reordered listing for {pathToString(path)}')
 
 def _walkCategories(row:CategoryRow,path:tuple[str,...],
@@ -470,11 +579,17 @@ def createCategoryNumber(path:tuple[str,...]|str,index:int,/,
                 raise FdbException('number does not exist')
             nid = num.id
             valstr = None
+            # completeNumber() cannot count the number until this commits
+            # (the foreign key only takes a key share lock)
+            con.execute("select 1 from numbers where id = %s for share;",
+                        (nid,))
 
         con.execute("insert into sequences (cat_id,index,num_id,value,expr) "
                     "values (%s,%s,%s,%s,%s);",
                     (cat.id,index,nid,valstr,expr))
+        _addCategoryStats(((cat.id,index),),con)
         con.commit()
+        invalidateTableCategory(cat.id)
         logDatabaseInfoMessage(f'created {pathToString(path)} index {index}')
 
 def updateCategoryNumber(path:tuple[str,...]|str,index:int,/,expr:str|None):
@@ -497,6 +612,7 @@ def updateCategoryNumber(path:tuple[str,...]|str,index:int,/,expr:str|None):
                           (expr,cat.id,index))
         updated = cur.fetchone() is not None
         con.commit()
+        invalidateTableCategory(cat.id)
         if updated:
             logDatabaseInfoMessage(
                 f'updated {pathToString(path)} index {index}')
@@ -518,8 +634,11 @@ def deleteCategoryNumber(path:tuple[str,...]|str,index:int,/):
         cur = con.execute("delete from sequences where cat_id = %s and "
                           "index = %s returning num_id;",(cat.id,index))
         row = cur.fetchone()
+        if row is not None:
+            _refreshCategoryStats((cat.id,),con)
         con.commit()
         if row is not None:
+            invalidateTableCategory(cat.id)
             logDatabaseInfoMessage(
                 f'deleted {pathToString(path)} index {index}')
             deleteNumberById(row[0])
@@ -549,6 +668,16 @@ def getCategoryNumberRows(path:tuple[str,...]|str,/,start:int,count:int=1) \
 
     return ret
 
+# sequence rows of a table index range with their number rows (if stored)
+# (shared with asyncCategories)
+_NUMBER_INFO_QUERY = "select sequences.index,sequences.value," \
+    "sequences.expr,numbers.* from sequences " \
+    "left join numbers on sequences.num_id = numbers.id " \
+    "where sequences.cat_id = %s " \
+    "and %s <= sequences.index " \
+    "and sequences.index < %s " \
+    "order by sequences.index;"
+
 def getCategoryNumberInfo(path:tuple[str,...]|str,/,start:int,count:int=1) \
         -> list[tuple[int,str,str|NumberRow,list[tuple[int,int,None|int]]]]:
     '''
@@ -566,29 +695,36 @@ def getCategoryNumberInfo(path:tuple[str,...]|str,/,start:int,count:int=1) \
         ret: list[tuple[int,str,str|NumberRow,list[tuple[int,int,None|int]]]] \
             = []
 
-        cur = con.execute("select * from sequences where cat_id = %s "
-                          "and %s <= index and index < %s "
-                          "order by index;",(cat.id,start,start+count))
-        for cat_id,index,num_id,value,expr in cur.fetchall():
+        # sequence rows with their number rows (if stored in database)
+        cur = con.execute(_NUMBER_INFO_QUERY,(cat.id,start,start+count))
+        seq_rows = cur.fetchall()
+
+        # factor trees at once for cofactors without a stored summary
+        num_rows = [None if row[3] is None else NumberRow(row[3:])
+                    for row in seq_rows]
+        tree_rows = _getFactorTreeRows((num.cof_id for num in num_rows
+                                        if num is not None
+                                        and num.summary is None
+                                        and num.cof_id is not None),con)
+
+        for (index,value,expr,*_),num in zip(seq_rows,num_rows):
 
             if DEBUG_EXTRA:
-                assert cat_id == cat.id
                 assert isinstance(index,int)
-                assert num_id is None or isinstance(num_id,int)
                 assert value is None or isinstance(value,str)
                 assert expr is None or isinstance(expr,str)
 
             if expr is None:
                 expr = ''
 
-            if num_id is None: # number not stored in database
+            if num is None: # number not stored in database
                 ret.append((index,expr,value,[]))
 
-            else: # number stored in database
-                num = _getNumberById(num_id,con)
-                assert num is not None, 'internal error'
-                factors = _getNumberFactorizationHelper(num,con)
-                assert factors is not None, 'internal error'
+            elif num.summary is not None: # number stored in database
+                ret.append((index,expr,num,num.summary))
+
+            else: # summary not computed yet
+                factors = _numberFactorizationFromTreeRows(num,tree_rows)
                 ret.append((index,expr,num,factors))
 
         return ret
@@ -616,7 +752,7 @@ def findCategoriesWithNumber(i:int,/) \
 def findCategoryIndexRange(path:tuple[str,...]|str|int,/) \
         -> None|tuple[int,int]:
     '''
-    find the min and max of the indexes in a category
+    find the min and max of the indexes in a category (from category_stats)
     '''
     if isinstance(path,str):
         path = stringToPath(path)
@@ -628,7 +764,7 @@ def findCategoryIndexRange(path:tuple[str,...]|str|int,/) \
                 return None
             path = row[-1].id
 
-        cur = con.execute("select min(index),max(index) from sequences "
+        cur = con.execute("select index_min,index_max from category_stats "
                           "where cat_id = %s;",(path,))
         row = cur.fetchone()
         if row is not None:
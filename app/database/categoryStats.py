@@ -0,0 +1,149 @@
+'''
+per table statistics kept in the category_stats table
+- updated in the transactions changing sequences or number completion so
+  directory pages and the stats page need one lookup instead of scanning
+- adding sequence entries and completing numbers update the row in place,
+  deleting entries recomputes the row (a removed min/max cannot be undone)
+- rebuildCategoryStats() recomputes every row (for existing databases)
+'''
+
+import psycopg
+from typing import Iterable
+
+from app.database.connectionPool import FdbConnection
+
+from app.config import DEBUG_EXTRA
+
+# bit length of a number stored as big endian bytes without leading zeros
+_BITS_SQL = "(length(numbers.value)*8-8+" \
+    "length(ltrim(get_byte(numbers.value,0)::bit(8)::text,'0')))"
+
+# stats aggregated from sequence rows (followed by a where clause)
+_AGGREGATE_SQL = "select sequences.cat_id,count(*)," \
+    "min(sequences.index),max(sequences.index)," \
+    f"min({_BITS_SQL}),max({_BITS_SQL})," \
+    "count(*) filter (where numbers.id is null or numbers.complete) " \
+    "from sequences left join numbers on sequences.num_id = numbers.id "
+
+class CategoryStatsRow:
+    '''
+    object representation for row in category_stats table
+    bit sizes only count values stored in the numbers table
+    values not stored in the numbers table count as complete
+    '''
+
+    def __init__(self,row):
+        if DEBUG_EXTRA:
+            assert isinstance(row,tuple)
+            assert len(row) == 7
+            assert isinstance(row[0],int)
+            assert isinstance(row[1],int)
+            assert row[2] is None or isinstance(row[2],int)
+            assert row[3] is None or isinstance(row[3],int)
+            assert row[4] is None or isinstance(row[4],int)
+            assert row[5] is None or isinstance(row[5],int)
+            assert isinstance(row[6],int)
+        self.cat_id: int = row[0]
+        self.count: int = row[1]
+        self.index_min: int|None = row[2]
+        self.index_max: int|None = row[3]
+        self.bits_min: int|None = row[4]
+        self.bits_max: int|None = row[5]
+        self.complete: int = row[6]
+
+    @property
+    def index_range(self) -> None|tuple[int,int]:
+        if self.index_min is None or self.index_max is None:
+            return None
+        return (self.index_min,self.index_max)
+
+    @property
+    def has_gaps(self) -> bool:
+        # indexes are unique within a table
+        return self.count != 0 and \
+            self.count != self.index_max-self.index_min+1 # type:ignore
+
+    def __repr__(self) -> str:
+        return f'<CategoryStatsRow(' \
+            f'cat_id={self.cat_id},' \
+            f'count={self.count},' \
+            f'index_min={self.index_min},' \
+            f'index_max={self.index_max},' \
+            f'bits_min={self.bits_min},' \
+            f'bits_max={self.bits_max},' \
+            f'complete={self.complete})>'
+
+def _addCategoryStats(entries:Iterable[tuple[int,int]],
+                      con:psycopg.Connection,/):
+    # include newly inserted (cat_id,index) sequence entries
+    entries = list(entries)
+    if entries == []:
+        return
+    con.execute("insert into category_stats as s "
+                + _AGGREGATE_SQL +
+                "where (sequences.cat_id,sequences.index) in "
+                "(select * from unnest(%s::bigint[],%s::bigint[])) "
+                "group by sequences.cat_id "
+                "on conflict (cat_id) do update set "
+                "count = s.count + excluded.count, "
+                "index_min = least(s.index_min,excluded.index_min), "
+                "index_max = greatest(s.index_max,excluded.index_max), "
+                "bits_min = least(s.bits_min,excluded.bits_min), "
+                "bits_max = greatest(s.bits_max,excluded.bits_max), "
+                "complete = s.complete + excluded.complete;",
+                tuple(map(list,zip(*entries))))
+
+def _refreshCategoryStats(cat_ids:Iterable[int],con:psycopg.Connection,/):
+    # recompute stats of categories from their sequence rows
+    cat_ids = list(cat_ids)
+    if cat_ids == []:
+        return
+    con.execute("delete from category_stats where cat_id = any(%s);",
+                (cat_ids,))
+    con.execute("insert into category_stats "
+                + _AGGREGATE_SQL +
+                "where sequences.cat_id = any(%s) "
+                "group by sequences.cat_id;",(cat_ids,))
+
+def _changeCategoryStatsComplete(num_ids:Iterable[int],change:int,
+                                 con:psycopg.Connection,/):
+    # numbers changed completion (change is 1 completed, -1 uncompleted)
+    num_ids = list(num_ids)
+    if num_ids == []:
+        return
+    con.execute("update category_stats set complete = complete + %s * t.count "
+                "from (select cat_id,count(*) from sequences "
+                "where num_id = any(%s) group by cat_id) as t "
+                "where category_stats.cat_id = t.cat_id;",(change,num_ids))
+
+def rebuildCategoryStats() -> int:
+    '''
+    recompute stats for all tables, returns how many tables have entries
+    '''
+    with FdbConnection() as con:
+        con.execute("lock table category_stats in exclusive mode;")
+        con.execute("delete from category_stats;")
+        cur = con.execute("insert into category_stats "
+                          + _AGGREGATE_SQL +
+                          "group by sequences.cat_id;")
+        count = cur.rowcount
+        con.commit()
+        return count
+
+def getCategoryStatsMany(cat_ids:Iterable[int],/) \
+        -> dict[int,CategoryStatsRow]:
+    '''
+    stats by category id (categories without sequence entries are missing)
+    '''
+    with FdbConnection() as con:
+        cur = con.execute("select * from category_stats "
+                          "where cat_id = any(%s);",(list(cat_ids),))
+        return {row[0]: CategoryStatsRow(row) for row in cur.fetchall()}
+
+def getAllCategoryStats() -> dict[int,CategoryStatsRow]:
+    '''
+    stats of all categories with sequence entries by category id
+    '''
+    with FdbConnection() as con:
+        cur = con.execute("select * from category_stats;")
+        return {row[0]: CategoryStatsRow(row) for row in cur.fetchall()}
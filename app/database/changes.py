@@ -0,0 +1,78 @@
+'''
+append-only change log for syncing incrementally
+- entries are written in the transaction making the change
+- the id of the last entry read is the cursor for reading newer ones
+- writers hold an advisory lock from logging until commit so ids become
+  visible in increasing order (a reader never skips an entry committed later
+  with a smaller id)
+'''
+
+from datetime import datetime
+import psycopg
+from typing import Iterable
+
+from app.database.connectionPool import FdbConnection
+
+from app.config import DEBUG_EXTRA
+
+# advisory lock key for writing change log entries
+_CHANGES_LOCK = 0x6664626368616e67
+
+class ChangeRow:
+    '''
+    object representation for row in changes table
+    kind is from ChangeType in constants
+    '''
+
+    def __init__(self,row):
+        if DEBUG_EXTRA:
+            assert isinstance(row,tuple)
+            assert len(row) == 5
+            assert isinstance(row[0],int)
+            assert isinstance(row[1],int)
+            assert row[2] is None or isinstance(row[2],int)
+            assert row[3] is None or isinstance(row[3],int)
+            assert isinstance(row[4],datetime)
+        self.id: int = row[0]
+        self.kind: int = row[1]
+        self.fac_id: int|None = row[2]
+        self.num_id: int|None = row[3]
+        self.time: datetime = row[4]
+
+    def __repr__(self) -> str:
+        return f'<ChangeRow(' \
+            f'id={self.id},' \
+            f'kind={self.kind},' \
+            f'fac_id={self.fac_id},' \
+            f'num_id={self.num_id},' \
+            f'time={repr(self.time)})>'
+
+def _logChanges(changes:Iterable[tuple[int,int|None,int|None]],
+                con:psycopg.Connection,/):
+    # add (kind,fac_id,num_id) entries, call right before commit
+    # (the lock is held until the transaction ends)
+    changes = list(changes)
+    if changes == []:
+        return
+    con.execute("select pg_advisory_xact_lock(%s);",(_CHANGES_LOCK,))
+    con.execute("insert into changes (kind,fac_id,num_id) "
+                "select * from unnest(%s::int[],%s::bigint[],%s::bigint[]);",
+                tuple(map(list,zip(*changes))))
+
+def getChangesSince(cursor:int,/,limit:int=1000) -> list[ChangeRow]:
+    '''
+    change log entries after cursor (an entry id) in order, up to limit
+    '''
+    with FdbConnection() as con:
+        cur = con.execute("select id,kind,fac_id,num_id,time from changes "
+                          "where id > %s order by id limit %s;",
+                          (cursor,limit))
+        return [ChangeRow(row) for row in cur.fetchall()]
+
+def getChangesCursor() -> int:
+    '''
+    id of the latest change log entry (0 if empty)
+    '''
+    with FdbConnection() as con:
+        cur = con.execute("select coalesce(max(id),0) from changes;")
+        return cur.fetchone()[0] # type:ignore
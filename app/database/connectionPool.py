@@ -1,9 +1,15 @@
 '''
 manages a connection pool to reuse for accessing database
+- at most DB_CON_LIM connections, callers wait up to DB_CON_TIMEOUT seconds
+- idle connections are checked before reuse and replaced when broken
+- connections older than DB_CON_MAX_AGE seconds are closed and replaced
+- thread safe (hypercorn may run sync code in worker threads)
 '''
 
 import psycopg
 import sys
+import threading
+import time
 
 from app.config import \
     DB_USER, \
@@ -11,7 +17,10 @@ from app.config import \
     DB_NAME, \
     DB_PORT, \
     DB_PASS, \
-    DB_CON_LIM
+    DB_CON_LIM, \
+    DB_CON_MIN, \
+    DB_CON_TIMEOUT, \
+    DB_CON_MAX_AGE
 
 from app.database.helpers import FdbException
 
@@ -19,54 +28,215 @@ _CON_STRING = \
          f'postgres://{DB_USER}@{DB_HOST}/{DB_NAME}' if DB_PORT == 5432 \
     else f'postgres://{DB_USER}@{DB_HOST}:{DB_PORT}/{DB_NAME}'
 
+# idle connections are pinged before reuse after this many seconds
+# (more recently used connections only get the cheap closed/broken check)
+_PING_AFTER_IDLE = 30.0
+
+# idle connections above DB_CON_MIN are closed after this many seconds
+_CLOSE_AFTER_IDLE = 300.0
+
 def _makeConnection() -> psycopg.Connection:
     #return psycopg.connect(host=DB_HOST,port=DB_PORT,
     #                       user=DB_USER,password=DB_PASS,dbname=DB_NAME)
     return psycopg.connect(_CON_STRING,password=DB_PASS)
 
+class _PoolEntry:
+    ''' connection with the times used for recycling '''
+
+    def __init__(self,con:psycopg.Connection):
+        self.con = con
+        self.created = time.monotonic()
+        self.released = self.created
+
 # reusable connection objects for any purpose
-_CON_POOL: list[psycopg.Connection] = []
-_CON_COUNT: int = 0
+_CON_POOL: list[_PoolEntry] = [] # idle connections (most recent last)
+_CON_IN_USE: dict[int,_PoolEntry] = {} # id(con) -> entry
+_CON_COUNT: int = 0 # idle + in use + being created
+_CON_COND = threading.Condition()
+
+# counters for monitoring pool behavior
+_CON_STATS: dict[str,int] = {
+    'checkouts': 0, # connections handed out
+    'waits': 0, # checkouts that had to wait for a connection
+    'timeouts': 0, # checkouts that gave up waiting
+    'creations': 0, # new connections opened
+    'discards': 0 # connections closed for being broken or too old
+}
+
+def _closeQuietly(con:psycopg.Connection,/):
+    # close a connection that may already be broken
+    try:
+        con.close()
+    except Exception:
+        pass
+
+def _entryUsable(entry:_PoolEntry,/) -> bool:
+    # liveness check for an idle connection before handing it out
+    con = entry.con
+    if con.closed or con.broken:
+        return False
+    now = time.monotonic()
+    if now - entry.created > DB_CON_MAX_AGE:
+        return False
+    if now - entry.released > _PING_AFTER_IDLE:
+        try:
+            con.execute("select 1;")
+            con.rollback()
+        except Exception:
+            return False
+    return True
+
+def _discardEntry(entry:_PoolEntry,/):
+    # close a connection and free its slot (must hold _CON_COND)
+    global _CON_COUNT
+    _closeQuietly(entry.con)
+    _CON_COUNT -= 1
+    _CON_STATS['discards'] += 1
+    _CON_COND.notify()
+
+def _reapIdleConnections():
+    # close connections idle for a long time, keeping at least DB_CON_MIN
+    # (must hold _CON_COND)
+    global _CON_POOL, _CON_COUNT
+    now = time.monotonic()
+    while _CON_POOL and _CON_COUNT > DB_CON_MIN \
+            and now - _CON_POOL[0].released > _CLOSE_AFTER_IDLE:
+        _closeQuietly(_CON_POOL.pop(0).con)
+        _CON_COUNT -= 1
+
+def _acquireConnection() -> _PoolEntry:
+    # get an idle connection, open a new one, or wait for one to be released
+    global _CON_COUNT
+    deadline = time.monotonic() + DB_CON_TIMEOUT
+    waited = False
+
+    while True:
+        entry = None
+        with _CON_COND:
+            _reapIdleConnections()
+            while entry is None:
+                if _CON_POOL:
+                    entry = _CON_POOL.pop()
+                    break
+                if _CON_COUNT < DB_CON_LIM:
+                    _CON_COUNT += 1 # reserve slot, create outside the lock
+                    break
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    _CON_STATS['timeouts'] += 1
+                    sys.stderr.write(f'timed out waiting for a database '
+                                     f'connection ({DB_CON_LIM} in use)\n')
+                    raise FdbException('timed out waiting for database '
+                                       'connection')
+                if not waited:
+                    _CON_STATS['waits'] += 1
+                    waited = True
+                _CON_COND.wait(remaining)
+
+        # reuse idle connection if it is still good
+        if entry is not None:
+            if _entryUsable(entry):
+                break
+            with _CON_COND:
+                _discardEntry(entry)
+            continue
+
+        # open a new connection in the reserved slot
+        try:
+            entry = _PoolEntry(_makeConnection())
+        except:
+            with _CON_COND:
+                _CON_COUNT -= 1
+                _CON_COND.notify()
+            raise
+        with _CON_COND:
+            _CON_STATS['creations'] += 1
+            sys.stderr.write(
+                f'created connection, total is now {_CON_COUNT}\n')
+        break
+
+    with _CON_COND:
+        _CON_STATS['checkouts'] += 1
+        _CON_IN_USE[id(entry.con)] = entry
+    return entry
+
+def _releaseConnection(con:psycopg.Connection,/):
+    # return a connection to the pool, closing it if broken or too old
+    with _CON_COND:
+        entry = _CON_IN_USE.pop(id(con))
+    try:
+        con.rollback()
+        usable = not con.broken \
+            and time.monotonic() - entry.created <= DB_CON_MAX_AGE
+    except Exception:
+        usable = False
+    with _CON_COND:
+        if usable:
+            entry.released = time.monotonic()
+            _CON_POOL.append(entry)
+            _CON_COND.notify()
+        else:
+            _discardEntry(entry)
 
 class FdbConnection:
     '''
     for handling database connection
     with FdbConnection() as con: ...
     caller must call con.commit() if doing write operations
+    waits for a connection if the limit is reached (exception on timeout)
     '''
 
     def __init__(self):
         self.con = None
 
     def __enter__(self) -> psycopg.Connection:
-        global _CON_POOL, _CON_COUNT
-        if _CON_POOL == []:
-            if _CON_COUNT >= DB_CON_LIM:
-                sys.stderr.write(
-                    f'tried to open more than {DB_CON_LIM} connections\n')
-                raise FdbException('exceeded database connection limit')
-            self.con = _makeConnection()
-            _CON_COUNT += 1
-            sys.stderr.write(f'created connection, total is now {_CON_COUNT}\n')
-        else:
-            self.con = _CON_POOL.pop()
+        self.con = _acquireConnection().con
         return self.con
 
     def __exit__(self,exctyp,excval,traceback) -> None:
         #if exctyp is not None or excval is not None or traceback is not None:
         #    _stderr_log(f'_dbcon.__exit__ received {exctyp}: {excval}')
         #    _stderr_write(str(traceback))
-        global _CON_POOL
         assert isinstance(self.con,psycopg.Connection)
-        self.con.rollback()
-        _CON_POOL.append(self.con)
+        _releaseConnection(self.con)
+
+def openDatabaseConnections():
+    '''
+    open connections until the pool has at least DB_CON_MIN
+    '''
+    global _CON_COUNT
+    while True:
+        with _CON_COND:
+            if _CON_COUNT >= DB_CON_MIN:
+                return
+            _CON_COUNT += 1
+        try:
+            entry = _PoolEntry(_makeConnection())
+        except:
+            with _CON_COND:
+                _CON_COUNT -= 1
+                _CON_COND.notify()
+            raise
+        with _CON_COND:
+            _CON_STATS['creations'] += 1
+            _CON_POOL.append(entry)
+            _CON_COND.notify()
+
+def getConnectionPoolStats() -> dict[str,int]:
+    '''
+    counters for the connection pool (checkouts, waits, creations, ...)
+    along with the current number of open and idle connections
+    '''
+    with _CON_COND:
+        return _CON_STATS | {'open': _CON_COUNT, 'idle': len(_CON_POOL)}
 
 def closeDatabaseConnections():
     global _CON_POOL, _CON_COUNT
-    for con in _CON_POOL:
-        con.close()
-    _CON_POOL = []
-    _CON_COUNT = 0
+    with _CON_COND:
+        for entry in _CON_POOL:
+            _closeQuietly(entry.con)
+        _CON_COUNT -= len(_CON_POOL)
+        _CON_POOL = []
 
 '''
 old sqlite3 stuff
@@ -16,3 +16,11 @@ class Primality:
     COMPOSITE = 0
     PROBABLE = 1
     PRIME = 2
+
+class ChangeType:
+    ''' change log entry types '''
+    NUMBER_ADDED = 0
+    FACTOR_SPLIT = 1 # factor given a new factorization
+    FACTOR_PRIMALITY = 2 # factor primality status changed
+    NUMBER_COMPLETED = 3
+    NUMBER_UNCOMPLETED = 4 # prime factor set back to probable or composite
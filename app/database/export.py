@@ -0,0 +1,158 @@
+'''
+streaming export of categories, sequences, numbers, and factors as ndjson
+- rows are read with server side cursors in batches so memory use does not
+  depend on the table sizes
+- each line is a json object with a "type" of category, sequence, or factor
+- numbers are given as decimal strings (json numbers may lose precision)
+'''
+
+import json
+import psycopg
+import zlib
+from typing import Generator
+
+from app.database.connectionPool import FdbConnection
+from app.database.helpers import \
+    stringToPath, \
+    pathToString, \
+    FdbException
+from app.database.categories import \
+    CategoryRow, \
+    _getCategoryByPath, \
+    _walkCategories
+from app.database.numbers import \
+    FactorRow, \
+    NumberRow, \
+    _getFactorTreeRows, \
+    _numberFactorizationFromTreeRows
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+# rows fetched from a server side cursor at a time
+_BATCH_SIZE = 1000
+
+# compressed output is produced in chunks of about this size (uncompressed)
+_CHUNK_SIZE = 2**16
+
+EXPORT_COMPRESSION = (None,'gzip','zstd')
+
+def _categoryRecord(path:tuple[str,...],row:CategoryRow,/) -> dict:
+    return {'type': 'category',
+            'id': row.id,
+            'path': pathToString(path),
+            'title': row.title,
+            'is_table': row.is_table,
+            'info': row.info,
+            'expr': row.expr}
+
+def _sequenceRecords(path:tuple[str,...],cat_id:int,
+                     con:psycopg.Connection,/) -> Generator[dict,None,None]:
+    # sequence rows of a table with their numbers and factorizations
+    # (factor trees are queried per batch for numbers without a summary)
+    with con.cursor(name=f'export_sequences_{cat_id}') as cur:
+        cur.itersize = _BATCH_SIZE
+        cur.execute("select sequences.index,sequences.value,sequences.expr,"
+                    "numbers.* from sequences "
+                    "left join numbers on sequences.num_id = numbers.id "
+                    "where sequences.cat_id = %s "
+                    "order by sequences.index;",(cat_id,))
+        while True:
+            seq_rows = cur.fetchmany(_BATCH_SIZE)
+            if seq_rows == []:
+                break
+            num_rows = [None if row[3] is None else NumberRow(row[3:])
+                        for row in seq_rows]
+            tree_rows = _getFactorTreeRows((num.cof_id for num in num_rows
+                                            if num is not None
+                                            and num.summary is None
+                                            and num.cof_id is not None),con)
+            for (index,value,expr,*_),num in zip(seq_rows,num_rows):
+                record = {'type': 'sequence',
+                          'path': pathToString(path),
+                          'index': index,
+                          'expr': expr}
+                if num is None: # value not stored in numbers table
+                    record['value'] = value
+                else:
+                    factors = num.summary if num.summary is not None \
+                        else _numberFactorizationFromTreeRows(num,tree_rows)
+                    record['value'] = str(num.value)
+                    record['number_id'] = num.id
+                    record['complete'] = num.complete
+                    record['factors'] = [[str(f),p,i] for f,p,i in factors]
+                yield record
+
+def _factorRecords(con:psycopg.Connection,/) -> Generator[dict,None,None]:
+    # the whole factors table (the factor trees referenced by numbers)
+    with con.cursor(name='export_factors') as cur:
+        cur.itersize = _BATCH_SIZE
+        cur.execute("select * from factors order by id;")
+        for row in cur:
+            f_row = FactorRow(row)
+            yield {'type': 'factor',
+                   'id': f_row.id,
+                   'value': str(f_row.value),
+                   'primality': f_row.primality,
+                   'f1_id': f_row.f1_id,
+                   'f2_id': f_row.f2_id}
+
+def exportRecords(path:tuple[str,...]|str=(),/,factors:bool=False) \
+        -> Generator[dict,None,None]:
+    '''
+    categories below path (default root) each followed by their sequence
+    rows if they are tables, then all factors if factors is true
+    '''
+    if isinstance(path,str):
+        path = stringToPath(path)
+
+    with FdbConnection() as con:
+        # one transaction so the export is a consistent snapshot
+        con.execute("set transaction isolation level repeatable read, "
+                    "read only;")
+        data = _getCategoryByPath(path,con)
+        if data is None:
+            raise FdbException('path does not exist')
+        for cat_path,row in _walkCategories(data[-1],path,con):
+            yield _categoryRecord(cat_path,row)
+            if row.is_table:
+                yield from _sequenceRecords(cat_path,row.id,con)
+        if factors:
+            yield from _factorRecords(con)
+
+def exportNdjson(path:tuple[str,...]|str=(),/,factors:bool=False,
+                 compression:str|None=None) -> Generator[bytes,None,None]:
+    '''
+    exportRecords() as ndjson in chunks, compressed with gzip or zstd
+    '''
+    if compression not in EXPORT_COMPRESSION:
+        raise FdbException(f'unsupported compression {compression}')
+    if compression == 'zstd' and zstandard is None:
+        raise FdbException('zstd compression requires zstandard package')
+
+    if compression == 'gzip':
+        compressor = zlib.compressobj(wbits=31) # gzip header
+        compress,flush = compressor.compress,compressor.flush
+    elif compression == 'zstd':
+        compressor = zstandard.ZstdCompressor().compressobj() # type:ignore
+        compress,flush = compressor.compress,compressor.flush
+    else:
+        compress,flush = (lambda b: b),(lambda: b'')
+
+    lines: list[str] = []
+    size = 0
+    for record in exportRecords(path,factors=factors):
+        line = json.dumps(record,separators=(',',':'))
+        lines.append(line)
+        size += len(line) + 1
+        if size >= _CHUNK_SIZE:
+            chunk = compress(('\n'.join(lines)+'\n').encode())
+            lines,size = [],0
+            if chunk:
+                yield chunk
+    chunk = compress(('\n'.join(lines)+'\n').encode()) if lines else b''
+    chunk += flush()
+    if chunk:
+        yield chunk
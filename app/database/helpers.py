@@ -17,7 +17,8 @@ from app.config import \
     PRP_BIT_LIM, \
     PROVE_BIT_LIM
 
-from app.utils.primeTest import prpTest, primeTest
+from app.utils.primeTest import primeTest
+from app.utils.primeCache import prpTestCached, primeTestCached
 
 class FdbException(Exception):
     ''' exception type for database issues '''
@@ -110,8 +111,8 @@ def fdbPrimality(n:int,/) -> int:
     if n.bit_length() > PRP_BIT_LIM:
         return Primality.UNKNOWN
     if n.bit_length() <= PROVE_BIT_LIM:
-        return Primality.PRIME if primeTest(n) else Primality.COMPOSITE
-    return Primality.PROBABLE if prpTest(n) else Primality.COMPOSITE
+        return Primality.PRIME if primeTestCached(n) else Primality.COMPOSITE
+    return Primality.PROBABLE if prpTestCached(n) else Primality.COMPOSITE
 
 def stringToPath(s:str,/) -> tuple[str,...]:
     ''' convert string to tuple of path components '''
@@ -0,0 +1,379 @@
+'''
+bulk loading of sequence numbers (used by prefactor/dbinsert.py)
+- records are processed in chunks, each chunk is a single transaction
+- values are deduplicated against the numbers/factors tables with one query
+  per chunk and inserted with a single insert ... select from unnest(...)
+- existing numbers and sequence entries are skipped, so an interrupted load
+  can be repeated or resumed from the last committed record count
+  (incomplete existing numbers are completed if their cofactor allows it)
+'''
+
+import psycopg
+from typing import \
+    Generator, \
+    Iterable
+
+from app.database.connectionPool import FdbConnection
+from app.database.helpers import \
+    intToFdbNumber, \
+    fdbNumberToInt, \
+    spfsToFdbFormat, \
+    stringToPath, \
+    pathToString, \
+    FdbException, \
+    primeTest
+from app.database.constants import Primality, ChangeType
+from app.database.changes import _logChanges
+from app.database.categoryStats import _addCategoryStats
+from app.database.logging import \
+    logDatabaseInfoMessage, \
+    logDatabaseWarnMessage
+from app.database.categories import _getCategoryByPath
+from app.database.numbers import \
+    NumberRow, \
+    _updateNumberSummaries, \
+    _tryFactorNumberById, \
+    completeNumber
+from app.utils.primeService import fdbPrimalityMany
+from app.utils.trialDivision import smallFactorsMany
+from app.utils.tableCache import invalidateTableCategory
+
+from app.config import \
+    DEBUG_EXTRA, \
+    NUM_BIT_LIM
+
+# (path or none,index,value,expr,factors or none)
+# factors is a list of known prime factors (like the fs for addNumber)
+# when factors is none the number is not added (it must already exist)
+IngestRecord = tuple[None|str|tuple[str,...],int,int,str,None|list[int]]
+
+class IngestProgress:
+    '''
+    totals reported after each committed chunk
+    records = input records processed so far (for resuming)
+    inserted = values of the numbers inserted by the last chunk only
+    '''
+
+    def __init__(self):
+        self.records = 0
+        self.inserted: list[int] = []
+        self.numbers_added = 0
+        self.numbers_existing = 0
+        self.factors_added = 0
+        self.sequences_added = 0
+        self.sequences_existing = 0
+
+    def __repr__(self) -> str:
+        return f'<IngestProgress(' \
+            f'records={self.records},' \
+            f'numbers_added={self.numbers_added},' \
+            f'numbers_existing={self.numbers_existing},' \
+            f'factors_added={self.factors_added},' \
+            f'sequences_added={self.sequences_added},' \
+            f'sequences_existing={self.sequences_existing})>'
+
+def _splitSmallFactors(n:int,fs:Iterable[int],/) \
+        -> tuple[list[int],int,list[int]]:
+    # same split as addNumber: (small prime factors,cofactor,large factors)
+    cof = n
+    spfs: list[int] = []
+    fs_large: list[int] = []
+    for f in sorted(set(fs)):
+        if f.bit_length() <= 64:
+            if not primeTest(f):
+                raise FdbException(f'provided non prime factor {f}')
+            while cof % f == 0:
+                spfs.append(f)
+                cof //= f
+        else:
+            fs_large.append(f)
+    return spfs,cof,fs_large
+
+def _getCategoryIds(paths:Iterable[tuple[str,...]],
+                    cache:dict[tuple[str,...],int],con:psycopg.Connection,/):
+    # resolve table paths to category ids (cached between chunks)
+    for path in paths:
+        if path in cache:
+            continue
+        data = _getCategoryByPath(path,con)
+        if data is None:
+            raise FdbException(f'category {pathToString(path)} does not exist')
+        if not data[-1].is_table:
+            raise FdbException(f'category {pathToString(path)} is not a table')
+        cache[path] = data[-1].id
+
+def _getFactorIds(values:Iterable[int],con:psycopg.Connection,/) \
+        -> tuple[dict[int,int],int]:
+    # ids of factors by value, inserting those that do not exist
+    # returns (value -> (id),number inserted)
+    values = list(values)
+    ret: dict[int,int] = {}
+    if values == []:
+        return ret,0
+
+    cur = con.execute("select id,value from factors where value = any(%s);",
+                      ([intToFdbNumber(v) for v in values],))
+    for f_id,f_b in cur.fetchall():
+        ret[fdbNumberToInt(f_b)] = f_id
+
+    new_values = [v for v in values if v not in ret]
+    if new_values == []:
+        return ret,0
+
+    for v in new_values:
+        if v.bit_length() <= 64:
+            logDatabaseWarnMessage(f'inserted small factor {v} '
+                                   f'({v.bit_length()} bits)')
+    cur = con.execute("insert into factors (value,primality) "
+                      "select * from unnest(%s::bytea[],%s::int[]) "
+                      "on conflict (value) do nothing returning id,value;",
+                      ([intToFdbNumber(v) for v in new_values],
+                       fdbPrimalityMany(new_values)))
+    inserted = cur.fetchall()
+    for f_id,f_b in inserted:
+        ret[fdbNumberToInt(f_b)] = f_id
+
+    # inserted by another connection after the select above
+    missing = [v for v in new_values if v not in ret]
+    if missing:
+        cur = con.execute("select id,value from factors "
+                          "where value = any(%s);",
+                          ([intToFdbNumber(v) for v in missing],))
+        for f_id,f_b in cur.fetchall():
+            ret[fdbNumberToInt(f_b)] = f_id
+
+    return ret,len(inserted)
+
+def _ingestChunk(records:list[IngestRecord],
+                 cat_ids:dict[tuple[str,...],int],
+                 progress:IngestProgress,
+                 con:psycopg.Connection,/) -> tuple[list[tuple[int,list[int]]],
+                                                     list[int],set[int]]:
+    # load a chunk in the current transaction (caller commits right after)
+    # returns (numbers needing factoring with provided factors,
+    #          numbers needing completion,category ids changed)
+
+    # numbers to add with their provided factors (merged if repeated)
+    num_factors: dict[int,set[int]] = {}
+    lookup_values: set[int] = set()
+    for path,index,value,expr,factors in records:
+        if value < 2:
+            continue
+        if value.bit_length() > NUM_BIT_LIM:
+            raise FdbException('number exceeds size limit '
+                               f'({value.bit_length()} > {NUM_BIT_LIM})')
+        lookup_values.add(value)
+        if factors is not None:
+            if any(f < 2 or value % f != 0 for f in factors):
+                raise FdbException(f'invalid factors for index {index}')
+            num_factors.setdefault(value,set()).update(factors)
+
+    # existing numbers (one query for the chunk)
+    num_ids: dict[int,int] = {}
+    to_factor: list[tuple[int,list[int]]] = []
+    # incomplete existing numbers by id with their cofactor id (checked
+    # below since a chunk committed by an interrupted run, which is read
+    # again when resuming, may not have finished completing its numbers)
+    recheck: dict[int,int|None] = {}
+    if lookup_values:
+        cur = con.execute("select * from numbers where value = any(%s);",
+                          ([intToFdbNumber(v) for v in lookup_values],))
+        for row in cur.fetchall():
+            n_row = NumberRow(row)
+            num_ids[n_row.value] = n_row.id
+            if n_row.value in num_factors:
+                progress.numbers_existing += 1
+                if not n_row.complete and num_factors[n_row.value]:
+                    to_factor.append((n_row.id,
+                                      sorted(num_factors[n_row.value])))
+                    continue
+            if not n_row.complete:
+                recheck[n_row.id] = n_row.cof_id
+
+    # split provided factors for new numbers
+    new_nums: list[tuple[int,list[int],int,list[int]]] = []
+    for value,factors in num_factors.items():
+        if value not in num_ids:
+            spfs,cof,fs_large = _splitSmallFactors(value,factors)
+            new_nums.append((value,spfs,cof,fs_large))
+
+    # small primes that were not provided (trial division for the chunk)
+    tdiv = smallFactorsMany(cof for _,_,cof,_ in new_nums)
+    new_nums = [(value,spfs+tdiv_fs,cof,fs_large)
+                for (value,spfs,_,fs_large),(tdiv_fs,cof)
+                in zip(new_nums,tdiv)]
+
+    # cofactors (one select and one insert for the chunk)
+    cof_ids,factors_added = _getFactorIds(
+        set(cof for _,_,cof,_ in new_nums if cof != 1),con)
+    progress.factors_added += factors_added
+
+    # primality of the cofactors decides completion for most new numbers
+    # (an already factored or 64 bit prime cofactor goes through
+    # completeNumber which moves small primes into the number row)
+    cof_rows: dict[int,tuple[int,bool]] = {}
+    check_ids = set(cof_ids.values())
+    check_ids.update(f_id for f_id in recheck.values() if f_id is not None)
+    if check_ids:
+        cur = con.execute("select id,primality,f1_id is not null "
+                          "from factors where id = any(%s);",
+                          (list(check_ids),))
+        for f_id,primality,factored in cur.fetchall():
+            cof_rows[f_id] = (primality,factored)
+
+    # existing numbers that should have been completed
+    to_complete: list[int] = [n_id for n_id,cof_id in recheck.items()
+                              if cof_id is None
+                              or cof_rows[cof_id][0] == Primality.PRIME
+                              or cof_rows[cof_id][1]]
+    changes: list[tuple[int,int|None,int|None]] = []
+    if new_nums:
+        params: tuple[list,...] = ([],[],[],[],[],[])
+        needs_complete: set[int] = set()
+        inserted_complete: set[int] = set()
+        fs_large_map = {value:fs_large for value,_,_,fs_large in new_nums
+                        if fs_large}
+        for value,spfs,cof,_ in new_nums:
+            cof_id = None if cof == 1 else cof_ids[cof]
+            spf2b,spf4b,spf8b = spfsToFdbFormat(spfs)
+            if cof_id is None:
+                complete = True
+            else:
+                primality,factored = cof_rows[cof_id]
+                if factored or (primality == Primality.PRIME
+                                and cof.bit_length() <= 64):
+                    needs_complete.add(value)
+                complete = primality == Primality.PRIME \
+                    and value not in needs_complete
+            if complete:
+                inserted_complete.add(value)
+            for param,item in zip(params,(intToFdbNumber(value),spf2b,spf4b,
+                                          spf8b,cof_id,complete)):
+                param.append(item)
+
+        cur = con.execute("insert into numbers "
+                          "(value,spf2,spf4,spf8,cof_id,complete) "
+                          "select * from unnest(%s::bytea[],%s::bytea[],"
+                          "%s::bytea[],%s::bytea[],%s::bigint[],%s::bool[]) "
+                          "on conflict (value) do nothing returning id,value;",
+                          params)
+        inserted = cur.fetchall()
+        for n_id,n_b in inserted:
+            num_ids[fdbNumberToInt(n_b)] = n_id
+            changes.append((ChangeType.NUMBER_ADDED,None,n_id))
+            if fdbNumberToInt(n_b) in inserted_complete:
+                changes.append((ChangeType.NUMBER_COMPLETED,None,n_id))
+        progress.numbers_added += len(inserted)
+        progress.inserted = [fdbNumberToInt(n_b) for _,n_b in inserted]
+        progress.numbers_existing += len(new_nums) - len(inserted)
+        _updateNumberSummaries((n_id for n_id,_ in inserted),con)
+
+        # numbers inserted by another connection after the select above
+        # are handled like existing numbers
+        missing = [value for value,_,_,_ in new_nums if value not in num_ids]
+        if missing:
+            cur = con.execute("select id,value from numbers "
+                              "where value = any(%s);",
+                              ([intToFdbNumber(v) for v in missing],))
+            for n_id,n_b in cur.fetchall():
+                value = fdbNumberToInt(n_b)
+                num_ids[value] = n_id
+                to_factor.append((n_id,sorted(num_factors[value])))
+
+        for n_id,n_b in inserted:
+            value = fdbNumberToInt(n_b)
+            if value in fs_large_map:
+                to_factor.append((n_id,fs_large_map[value]))
+            elif value in needs_complete:
+                to_complete.append(n_id)
+
+    # sequences (one insert for the chunk)
+    _getCategoryIds(set(stringToPath(path) if isinstance(path,str) else path
+                        for path,_,_,_,_ in records if path is not None),
+                    cat_ids,con)
+    seq_params: tuple[list,...] = ([],[],[],[],[])
+    seq_count = 0
+    for path,index,value,expr,_ in records:
+        if path is None:
+            continue
+        if isinstance(path,str):
+            path = stringToPath(path)
+        if value < 2:
+            nid,valstr = None,str(value)
+        elif value in num_ids:
+            nid,valstr = num_ids[value],None
+        else:
+            raise FdbException(f'number for {pathToString(path)} index {index}'
+                               f' does not exist')
+        for param,item in zip(seq_params,(cat_ids[path],index,nid,valstr,expr)):
+            param.append(item)
+        seq_count += 1
+
+    cat_changed: set[int] = set()
+    if seq_count:
+        # completeNumber() cannot count the numbers until this commits
+        # (the foreign key only takes a key share lock)
+        con.execute("select id from numbers where id = any(%s) "
+                    "order by id for share;",
+                    (sorted(set(n for n in seq_params[2] if n is not None)),))
+        cur = con.execute("insert into sequences "
+                          "(cat_id,index,num_id,value,expr) "
+                          "select * from unnest(%s::bigint[],%s::bigint[],"
+                          "%s::bigint[],%s::text[],%s::text[]) "
+                          "on conflict (cat_id,index) do nothing "
+                          "returning cat_id,index;",seq_params)
+        seq_inserted = cur.fetchall()
+        progress.sequences_added += len(seq_inserted)
+        progress.sequences_existing += seq_count - len(seq_inserted)
+        cat_changed.update(cat_id for cat_id,_ in seq_inserted)
+        _addCategoryStats(seq_inserted,con)
+
+    _logChanges(changes,con)
+    return to_factor,to_complete,cat_changed
+
+def bulkIngest(records:Iterable[IngestRecord],/,chunk_size:int=1000) \
+        -> Generator[IngestProgress,None,None]:
+    '''
+    add numbers and sequence entries in chunks of records
+    yields the totals after each chunk is committed
+    (progress.records can be saved to skip those records when resuming)
+    exception if a record is invalid, earlier chunks remain committed
+    '''
+    assert chunk_size > 0
+    progress = IngestProgress()
+    cat_ids: dict[tuple[str,...],int] = {}
+    records = iter(records)
+
+    while True:
+        chunk: list[IngestRecord] = []
+        for record in records:
+            chunk.append(record)
+            if len(chunk) == chunk_size:
+                break
+        if chunk == []:
+            break
+
+        progress.inserted = []
+        with FdbConnection() as con:
+            to_factor,to_complete,cat_changed = \
+                _ingestChunk(chunk,cat_ids,progress,con)
+            con.commit()
+        progress.records += len(chunk)
+        logDatabaseInfoMessage(f'bulk ingest committed {len(chunk)} records '
+                               f'({progress.numbers_added} numbers added, '
+                               f'{progress.sequences_added} sequence entries '
+                               f'added so far)')
+        if DEBUG_EXTRA:
+            assert progress.sequences_added + progress.sequences_existing \
+                <= progress.records
+
+        # uncommon cases use the regular per number functions
+        for n_id,fs in to_factor:
+            _tryFactorNumberById(n_id,fs)
+            completeNumber(n_id)
+        for n_id in to_complete:
+            completeNumber(n_id)
+        for cat_id in cat_changed:
+            invalidateTableCategory(cat_id)
+
+        yield progress
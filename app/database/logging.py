@@ -1,11 +1,19 @@
 '''
 manages logging for changes to the database
+messages saved to the database are buffered and written by a background
+thread (one copy per batch) so write paths do not need an extra transaction
 '''
 
+import atexit
+from datetime import datetime
 import os
 import sys
+import threading
 
-from app.config import LOG_TO_FILE
+from app.config import \
+    LOG_TO_FILE, \
+    LOG_BATCH_SIZE, \
+    LOG_FLUSH_INTERVAL
 
 from app.database.helpers import \
     currentTimeUtc, \
@@ -23,6 +31,68 @@ if LOG_TO_FILE:
     LOG_FILE_NAME = timestampToString(currentTimeUtc())
     LOG_FILE = open(f'{LOG_DIR}/{LOG_FILE_NAME}.log','a')
 
+# messages waiting to be saved (text,level,time)
+_LOG_BUFFER: list[tuple[str,int,datetime]] = []
+_LOG_COND = threading.Condition()
+_LOG_THREAD: threading.Thread|None = None
+_LOG_STOP = False
+
+def _writeLogRows(rows:list[tuple[str,int,datetime]],/):
+    # save a batch of messages with a single copy
+    with FdbConnection() as con:
+        with con.cursor().copy("copy logs (text,level,time) from stdin") \
+                as copy:
+            for row in rows:
+                copy.write_row(row)
+        con.commit()
+
+def _logWriter():
+    # background thread writing buffered messages until stopped
+    global _LOG_BUFFER
+    while True:
+        with _LOG_COND:
+            if not _LOG_STOP and len(_LOG_BUFFER) < LOG_BATCH_SIZE:
+                _LOG_COND.wait(LOG_FLUSH_INTERVAL)
+            rows = _LOG_BUFFER
+            _LOG_BUFFER = []
+            stop = _LOG_STOP
+        if rows:
+            try:
+                _writeLogRows(rows)
+            except Exception as e:
+                # messages were still written to stderr (and log file)
+                _writeStderr(f'[{__name__}] failed to save {len(rows)} log '
+                             f'messages to database: {e}')
+        if stop:
+            return
+
+def _startLogWriter():
+    # start the writer on first use (so it is not started before forking)
+    # (must hold _LOG_COND)
+    global _LOG_THREAD, _LOG_STOP
+    _LOG_STOP = False
+    _LOG_THREAD = threading.Thread(target=_logWriter,name='fdb-log-writer',
+                                   daemon=True)
+    _LOG_THREAD.start()
+
+def flushLogging():
+    '''
+    wait for buffered log messages to be saved and stop the writer thread
+    (it starts again if more messages are logged)
+    '''
+    global _LOG_STOP, _LOG_THREAD
+    with _LOG_COND:
+        thread = _LOG_THREAD
+        if thread is None:
+            return
+        _LOG_STOP = True
+        _LOG_THREAD = None
+        _LOG_COND.notify()
+    thread.join()
+
+# scripts do not call closeLogging()
+atexit.register(flushLogging)
+
 def _writeStderr(s:str,/):
     ''' write to stderr '''
     print(s,file=sys.stderr,flush=True)
@@ -41,9 +111,12 @@ def logDatabaseMessage(s:str,saveToDb:bool,level:int,/):
               flush=True)
     if not saveToDb:
         return
-    with FdbConnection() as con:
-        con.execute("insert into logs (text,level) values (%s,%s);",(s,level))
-        con.commit()
+    with _LOG_COND:
+        _LOG_BUFFER.append((s,level,currentTimeUtc()))
+        if _LOG_THREAD is None:
+            _startLogWriter()
+        elif len(_LOG_BUFFER) >= LOG_BATCH_SIZE:
+            _LOG_COND.notify()
 
 def logDatabaseDebugMessage(s:str,/):
     ''' log debug message (not saved in database) '''
@@ -63,6 +136,7 @@ def logDatabaseCritMessage(s:str,/):
 
 def closeLogging():
     global _logfile,_logname
+    flushLogging()
     if LOG_FILE is not None and LOG_FILE_NAME is not None:
         LOG_FILE.close()
         if os.path.getsize(LOG_FILE_NAME) == 0:
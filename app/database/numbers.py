@@ -4,7 +4,9 @@ manages the tables storing numbers and factors
 - factors are intermediate (nontrivial) results
 '''
 
+import math
 import psycopg
+from psycopg.types.json import Jsonb
 from typing import \
     Generator, \
     Iterable
@@ -17,13 +19,21 @@ from app.database.helpers import \
     spfsToFdbFormat, \
     FdbException, \
     primeTest, \
-    prpTest, \
     fdbPrimality
-from app.database.constants import Primality
+from app.database.constants import Primality, ChangeType
+from app.database.changes import _logChanges
+from app.database.categoryStats import _changeCategoryStatsComplete
 from app.database.logging import \
     logDatabaseInfoMessage, \
     logDatabaseWarnMessage, \
     logDatabaseDebugMessage
+from app.utils.primeService import \
+    submitPrpTest, \
+    fdbPrimalityMany
+from app.utils.tableCache import \
+    invalidateTableNumbers, \
+    clearTableCache
+from app.utils.trialDivision import smallFactors
 
 from app.config import \
     DEBUG_EXTRA, \
@@ -44,6 +54,9 @@ numbers store small prime factors as part of the row storage
 for production, try to find all 64 bit factors before inserting
 for remaining large factors, reference a number in the factors table
 numbers are marked as complete when the full prime factorization is known
+numbers also store a summary (flat factorization) and progress ratio so pages
+do not need to walk the factors tree, updated when a number factorization or
+primality of one of its factors changes (null until first computed)
 '''
 
 class FactorRow:
@@ -85,7 +98,7 @@ class NumberRow:
     def __init__(self,row):
         if DEBUG_EXTRA:
             assert isinstance(row,tuple)
-            assert len(row) == 7
+            assert len(row) == 9
             assert isinstance(row[0],int)
             assert isinstance(row[1],bytes)
             assert row[2] is None or isinstance(row[2],bytes)
@@ -93,6 +106,8 @@ class NumberRow:
             assert row[4] is None or isinstance(row[4],bytes)
             assert row[5] is None or isinstance(row[5],int)
             assert isinstance(row[6],bool)
+            assert row[7] is None or isinstance(row[7],list)
+            assert row[8] is None or isinstance(row[8],float)
         self.id: int = row[0]
         self.value: int = fdbNumberToInt(row[1])
         n2,n4,n8 = fdbFormatToSpfs(row[2],row[3],row[4])
@@ -106,6 +121,10 @@ class NumberRow:
         self.spfs = n2 + n4 + n8
         self.cof_id: int|None = row[5]
         self.complete: bool = row[6]
+        self.summary: None|list[tuple[int,int,None|int]] = \
+            None if row[7] is None else \
+            [(int(f,16),p,i) for f,p,i in row[7]]
+        self.progress: None|float = row[8]
 
     def __repr__(self) -> str:
         return f'<NumberRow(' \
@@ -113,7 +132,8 @@ class NumberRow:
             f'value={self.value},' \
             f'spfs=[{','.join(map(str,self.spfs))}],' \
             f'cof_id={self.cof_id},' \
-            f'complete={self.complete})>'
+            f'complete={self.complete},' \
+            f'progress={self.progress})>'
 
 def _getNumberByValue(n:int,con:psycopg.Connection,/) -> None|NumberRow:
     # get number by value (from connection)
@@ -211,10 +231,11 @@ def setFactorPrime(i:int,test:bool,/):
         if row.value.bit_length() <= PROVE_BIT_LIM:
             raise FdbException(f'factor is small enough for primality proving')
 
-        if test and not prpTest(row.value):
+        if test and not submitPrpTest(row.value).result():
             raise FdbException(f'factor id {i} is actually composite')
         con.execute("update factors set primality = %s where id = %s;",
                     (Primality.PRIME,i))
+        _logChanges([(ChangeType.FACTOR_PRIMALITY,i,None)],con)
 
         con.commit()
         logDatabaseInfoMessage(f'factor id {i} set to prime')
@@ -223,6 +244,7 @@ def setFactorPrime(i:int,test:bool,/):
         num_rows: list[NumberRow] = []
         _getNumbersWithFactor(num_rows,row,con)
 
+    invalidateTableNumbers(num_row.id for num_row in num_rows)
     for num_row in num_rows:
         completeNumber(num_row.id)
 
@@ -241,25 +263,35 @@ def setFactorProbable(i:int,test:bool,/):
 
         was_prime = (row.primality == Primality.PRIME)
 
-        if test and not prpTest(row.value):
+        if test and not submitPrpTest(row.value).result():
             raise FdbException(f'factor id {i} is actually composite')
         con.execute("update factors set primality = %s where id = %s;",
                     (Primality.PROBABLE,i))
+        _logChanges([(ChangeType.FACTOR_PRIMALITY,i,None)],con)
 
         con.commit()
         logDatabaseInfoMessage(f'factor id {i} set to probable')
 
         # uncomplete numbers if switching from prime
         # (not sure why this would ever happen)
+        # (summaries include primality so they change either way)
         num_rows: list[NumberRow] = []
-        if was_prime:
-            _getNumbersWithFactor(num_rows,row,con)
+        _getNumbersWithFactor(num_rows,row,con)
 
-        for num_row in num_rows:
-            con.execute("update numbers set complete = false where id = %s;",
-                        (num_row.id,))
+        if was_prime:
+            cur = con.execute("update numbers set complete = false "
+                              "where id = any(%s) and complete returning id;",
+                              ([num_row.id for num_row in num_rows],))
+            uncompleted = [n_id for n_id, in cur.fetchall()]
+            _changeCategoryStatsComplete(uncompleted,-1,con)
+        _updateNumberSummaries((num_row.id for num_row in num_rows),con)
+        if was_prime:
+            _logChanges(((ChangeType.NUMBER_UNCOMPLETED,None,n_id)
+                         for n_id in uncompleted),con)
         con.commit()
 
+    invalidateTableNumbers(num_row.id for num_row in num_rows)
+
 def setFactorComposite(i:int,test:bool,/):
     '''
     sets a factor (by ID) as proven composite
@@ -275,68 +307,108 @@ def setFactorComposite(i:int,test:bool,/):
 
         was_prime = (row.primality == Primality.PRIME)
 
-        if test and prpTest(row.value):
+        if test and submitPrpTest(row.value).result():
             raise FdbException(f'factor id {i} prp test says it is prime,'
                                f' check if it is a BPSW pseudoprime?')
         con.execute("update factors set primality = %s where id = %s;",
                     (Primality.COMPOSITE,i))
+        _logChanges([(ChangeType.FACTOR_PRIMALITY,i,None)],con)
 
         con.commit()
         logDatabaseInfoMessage(f'factor id {i} set to composite')
 
         # uncomplete numbers if switching from prime to composite
         # (necessary if number is incorrectly set as prime)
+        # (summaries include primality so they change either way)
         num_rows: list[NumberRow] = []
-        if was_prime:
-            _getNumbersWithFactor(num_rows,row,con)
+        _getNumbersWithFactor(num_rows,row,con)
 
-        for num_row in num_rows:
-            con.execute("update numbers set complete = false where id = %s;",
-                        (num_row.id,))
+        if was_prime:
+            cur = con.execute("update numbers set complete = false "
+                              "where id = any(%s) and complete returning id;",
+                              ([num_row.id for num_row in num_rows],))
+            uncompleted = [n_id for n_id, in cur.fetchall()]
+            _changeCategoryStatsComplete(uncompleted,-1,con)
+        _updateNumberSummaries((num_row.id for num_row in num_rows),con)
+        if was_prime:
+            _logChanges(((ChangeType.NUMBER_UNCOMPLETED,None,n_id)
+                         for n_id in uncompleted),con)
         con.commit()
 
-def _getFactorFactorizationHelper(row:FactorRow,
-                                  con:psycopg.Connection,/) \
-        -> list[tuple[int,int,int]]:
-    # helper function to get factorization of a factor
-    if row.f1_id is None: # does not split into 2 factors, return itself
-        assert row.f2_id is None, f'internal error: row={row}'
-        return [(row.value,row.primality,row.id)]
+    invalidateTableNumbers(num_row.id for num_row in num_rows)
+
+# all factor rows reachable from a list of ids through f1_id/f2_id
+# (shared with asyncNumbers)
+_FACTOR_TREE_QUERY = "with recursive tree (id,f1_id,f2_id) as (" \
+    "select id,f1_id,f2_id from factors where id = any(%s) " \
+    "union " \
+    "select factors.id,factors.f1_id,factors.f2_id " \
+    "from factors join tree " \
+    "on factors.id in (tree.f1_id,tree.f2_id)) " \
+    "select factors.* from factors " \
+    "join tree on factors.id = tree.id;"
+
+def _getFactorTreeRows(ids:Iterable[int],con:psycopg.Connection,/) \
+        -> dict[int,FactorRow]:
+    # all factor rows reachable from ids through f1_id/f2_id (single query)
+    # returns a dict mapping id -> row, used to rebuild factorizations
+    cur = con.execute(_FACTOR_TREE_QUERY,(list(ids),))
+    ret: dict[int,FactorRow] = {}
+    for row in cur.fetchall():
+        f_row = FactorRow(row)
+        ret[f_row.id] = f_row
+    return ret
 
-    assert row.f2_id is not None, f'internal error: row={row}'
-    f1_row = _getFactorById(row.f1_id,con)
-    f2_row = _getFactorById(row.f2_id,con)
-    assert f1_row is not None, f'internal error: row={row}'
-    assert f2_row is not None, f'internal error: row={row}'
-    ret = _getFactorFactorizationHelper(f1_row,con) \
-        + _getFactorFactorizationHelper(f2_row,con)
+def _factorizationFromTreeRows(i:int,rows:dict[int,FactorRow],/) \
+        -> list[tuple[int,int,int]]:
+    # rebuild factorization of factor id i from _getFactorTreeRows() result
+    # walks the tree iteratively, leaves are in the same order as recursion
+    ret: list[tuple[int,int,int]] = []
+    stack = [i]
+    while stack:
+        row = rows.get(stack.pop())
+        assert row is not None, f'internal error: missing factor in tree of {i}'
+        if row.f1_id is None: # does not split into 2 factors, leaf
+            assert row.f2_id is None, f'internal error: row={row}'
+            ret.append((row.value,row.primality,row.id))
+        else:
+            assert row.f2_id is not None, f'internal error: row={row}'
+            stack.append(row.f2_id)
+            stack.append(row.f1_id)
 
     if DEBUG_EXTRA:
         prod = 1
         for f,_,_ in ret:
             prod *= f
-        assert prod == row.value, f'internal error: row={row}'
+        assert prod == rows[i].value, f'internal error: row={rows[i]}'
 
     return ret
 
-def _getNumberFactorizationHelper(n_row:NumberRow|None,
+def _getFactorFactorizationHelper(row:FactorRow,
                                   con:psycopg.Connection,/) \
-        -> None|list[tuple[int,int,None|int]]:
-    # helper function to get factorization of a number
-    if n_row is None:
-        return None
+        -> list[tuple[int,int,int]]:
+    # helper function to get factorization of a factor
+    if row.f1_id is None: # does not split into 2 factors, return itself
+        assert row.f2_id is None, f'internal error: row={row}'
+        return [(row.value,row.primality,row.id)]
+
+    assert row.f2_id is not None, f'internal error: row={row}'
+    return _factorizationFromTreeRows(row.id,_getFactorTreeRows([row.id],con))
+
+def _numberFactorizationFromTreeRows(n_row:NumberRow,
+                                     rows:dict[int,FactorRow],/) \
+        -> list[tuple[int,int,None|int]]:
+    # build factorization of a number from _getFactorTreeRows() result
+    # (rows must include the tree for the number cofactor if it has one)
 
     # small prime factors
-    ret1: list[tuple[int,int,None|int]] = []
+    ret: list[tuple[int,int,None|int]] = []
     for p in n_row.spfs:
-        ret1.append((p,Primality.PRIME,None))
-    cof_id = n_row.cof_id
+        ret.append((p,Primality.PRIME,None))
 
     # large factors
-    cof_row = None if cof_id is None else _getFactorById(cof_id,con)
-    ret2 = None if cof_row is None else \
-        _getFactorFactorizationHelper(cof_row,con)
-    ret = ret1 if ret2 is None else ret1+ret2
+    if n_row.cof_id is not None:
+        ret += _factorizationFromTreeRows(n_row.cof_id,rows)
 
     if DEBUG_EXTRA:
         prod = 1
@@ -347,6 +419,79 @@ def _getNumberFactorizationHelper(n_row:NumberRow|None,
     # sort by numeric value increasing
     return sorted(ret, key = lambda k: k[0])
 
+def _computeNumberFactorization(n_row:NumberRow,
+                                con:psycopg.Connection,/) \
+        -> list[tuple[int,int,None|int]]:
+    # factorization of a number from the factors table (ignores summary)
+    # (a single query for the whole cofactor tree)
+    rows = {} if n_row.cof_id is None \
+        else _getFactorTreeRows([n_row.cof_id],con)
+    return _numberFactorizationFromTreeRows(n_row,rows)
+
+def _getNumberFactorizationHelper(n_row:NumberRow|None,
+                                  con:psycopg.Connection,/) \
+        -> None|list[tuple[int,int,None|int]]:
+    # helper function to get factorization of a number
+    # uses the stored summary if it has been computed
+    if n_row is None:
+        return None
+    if n_row.summary is not None:
+        return n_row.summary
+    return _computeNumberFactorization(n_row,con)
+
+_PROGRESS_PRIMALITY = (Primality.PROBABLE,Primality.PRIME)
+
+def _factorizationProgress(n:int,factors:list[tuple[int,int,None|int]],/) \
+        -> float:
+    # log(factored part) / log(n), same as factorData.factoringProgress()
+    return sum(math.log(f) for f,p,_ in factors
+               if p in _PROGRESS_PRIMALITY) / math.log(n)
+
+def _updateNumberSummaries(ids:Iterable[int],con:psycopg.Connection,/) \
+        -> int:
+    # recompute summary and progress for numbers (caller must commit)
+    # returns number of rows updated
+    cur = con.execute("select * from numbers where id = any(%s);",(list(ids),))
+    num_rows = [NumberRow(row) for row in cur.fetchall()]
+    if num_rows == []:
+        return 0
+    tree_rows = _getFactorTreeRows((num_row.cof_id for num_row in num_rows
+                                    if num_row.cof_id is not None),con)
+
+    params: list[tuple[Jsonb,float,int]] = []
+    for num_row in num_rows:
+        factors = _numberFactorizationFromTreeRows(num_row,tree_rows)
+        summary = [(f'{f:x}',p,i) for f,p,i in factors]
+        progress = _factorizationProgress(num_row.value,factors)
+        params.append((Jsonb(summary),progress,num_row.id))
+
+    con.cursor().executemany("update numbers set summary = %s, progress = %s "
+                             "where id = %s;",params)
+    return len(params)
+
+def rebuildNumberSummaries(batch_size:int=1000,/) -> int:
+    '''
+    recompute stored factorization summaries for all numbers
+    (for existing data or after manual changes to the factors table)
+    commits after each batch, returns the number of rows updated
+    '''
+    assert batch_size > 0
+    total = 0
+    last_id = -1
+    with FdbConnection() as con:
+        while True:
+            cur = con.execute("select id from numbers where id > %s "
+                              "order by id limit %s;",(last_id,batch_size))
+            ids = [row[0] for row in cur.fetchall()]
+            if ids == []:
+                break
+            total += _updateNumberSummaries(ids,con)
+            con.commit()
+            last_id = ids[-1]
+    clearTableCache()
+    logDatabaseInfoMessage(f'rebuilt summaries for {total} numbers')
+    return total
+
 def getNumberFactorizationByValue(n:int,/) \
         -> None|list[tuple[int,int,None|int]]:
     '''
@@ -370,8 +515,9 @@ def getNumberFactorizationById(i:int,/) -> None|list[tuple[int,int,None|int]]:
     with FdbConnection() as con:
         return _getNumberFactorizationHelper(_getNumberById(i,con),con)
 
-def _addFactor(f:int,/) -> FactorRow:
+def _addFactor(f:int,f_p:int|None=None,/) -> FactorRow:
     # return factor row, inserting factor if it is not in database
+    # f_p is the fdbPrimality() result if it was already computed
     assert f > 1, 'internal error'
     f_b = intToFdbNumber(f)
     with FdbConnection() as con:
@@ -381,7 +527,8 @@ def _addFactor(f:int,/) -> FactorRow:
             return FactorRow(f_row)
 
         # does not exist, insert new factor
-        f_p = fdbPrimality(f)
+        if f_p is None:
+            f_p = fdbPrimality(f)
         cur = con.execute("insert into factors (value,primality) "
                           "values (%s,%s) returning *;",(f_b,f_p))
         row = cur.fetchone()
@@ -399,43 +546,47 @@ def _addFactor(f:int,/) -> FactorRow:
 def _tryFactorFactorById(i:int,fs:Iterable[int],/):
     # try provided factors to make progress on a factor
     with FdbConnection() as con:
-        for f in sorted(fs):
-
-            # get the composite factors
-            row = _getFactorById(i,con)
-            assert row is not None, 'internal error'
-            factors = _getFactorFactorizationHelper(row,con)
-            factors = [g for g,p,_ in factors
-                       if p == Primality.UNKNOWN or p == Primality.COMPOSITE]
-
-            # try to factor any composite
-            for g in factors:
-                try:
-                    addFactor(g,f)
-                except FdbException:
-                    pass
+        cascade = _FactorCascade(con)
+        cascade.tryFactors(i,fs)
+        num_ids = cascade.write()
+        con.commit()
+    _completeNumbers(num_ids)
 
 def _tryFactorNumberById(i:int,fs:Iterable[int],/):
     # try provided factors to make progress on cofactor of number id i
     with FdbConnection() as con:
-        for f in sorted(fs):
-
-            # get the composite factors
-            row = _getNumberById(i,con)
-            assert row is not None, 'internal error'
-            if row.cof_id is None:
-                break
-            factors = _getNumberFactorizationHelper(row,con)
-            assert factors is not None, 'internal error'
-            factors = [g for g,p,_ in factors
-                       if p == Primality.UNKNOWN or p == Primality.COMPOSITE]
+        row = _getNumberById(i,con)
+        assert row is not None, 'internal error'
+        if row.cof_id is None:
+            return
+        cascade = _FactorCascade(con)
+        cascade.tryFactors(row.cof_id,fs)
+        num_ids = cascade.write()
+        con.commit()
+    _completeNumbers(num_ids)
 
-            # try to factor any composite
-            for g in factors:
-                try:
-                    addFactor(g,f)
-                except FdbException:
-                    pass
+def tryFactorsMany(items:Iterable[tuple[int,Iterable[int]]],/) \
+        -> dict[int,int]:
+    '''
+    try lists of factors on many factors (by id) in a single transaction
+    returns factor id -> count of factors given a new factorization
+    (ids which are not in the database are left out)
+    '''
+    items = [(i,list(fs)) for i,fs in items]
+    ret: dict[int,int] = {}
+    with FdbConnection() as con:
+        cascade = _FactorCascade(con)
+        cascade._load((),[i for i,_ in items])
+        for i,fs in items:
+            if i not in cascade.values:
+                continue
+            count = len(cascade.factored)
+            cascade.tryFactors(i,fs)
+            ret[i] = ret.get(i,0) + len(cascade.factored) - count
+        num_ids = cascade.write()
+        con.commit()
+    _completeNumbers(num_ids)
+    return ret
 
 def addNumber(n:int,fs:Iterable[int]=[],/) -> tuple[bool,NumberRow]:
     '''
@@ -479,6 +630,10 @@ def addNumber(n:int,fs:Iterable[int]=[],/) -> tuple[bool,NumberRow]:
             else: # factors bigger than 64 bit
                 fs_large.append(f)
 
+        # small primes that were not provided
+        tdiv_fs,cof = smallFactors(cof)
+        spfs += tdiv_fs
+
         # prepare factor values to store in database
         spf2b,spf4b,spf8b = spfsToFdbFormat(spfs)
 
@@ -493,6 +648,7 @@ def addNumber(n:int,fs:Iterable[int]=[],/) -> tuple[bool,NumberRow]:
                           "values (%s,%s,%s,%s,%s) returning *;",
                           (intToFdbNumber(n),spf2b,spf4b,spf8b,cof_id))
         row = NumberRow(cur.fetchone())
+        _logChanges([(ChangeType.NUMBER_ADDED,None,row.id)],con)
         con.commit()
         logDatabaseInfoMessage(
             f'number id {row.id} added with cofactor id {cof_id}')
@@ -518,6 +674,7 @@ def deleteNumberById(i:int,/) -> bool:
             row = cur.fetchone()
             con.commit()
             if row is not None:
+                invalidateTableNumbers((row[0],))
                 logDatabaseInfoMessage(f'deleted number id {row[0]}')
             return True
         except:
@@ -535,44 +692,12 @@ def deleteNumberByValue(n:int,/) -> bool:
             row = cur.fetchone()
             con.commit()
             if row is not None:
+                invalidateTableNumbers((row[0],))
                 logDatabaseInfoMessage(f'deleted number id {row[0]}')
             return True
         except:
             return False
 
-def _tryFactorByValue(n:int,fs:Iterable[int],/):
-    # try adding factor from a list, ignoring exceptions (for recursive calls)
-    for f in sorted(fs):
-        try:
-            addFactor(n,f)
-            # if successful, take the same list and try on the cofactor
-            _tryFactorByValue(n//f,fs)
-            break
-        except FdbException:
-            pass
-
-def _getMultiplesOfFactorById(mults:dict[int,int],i:int|None,
-                              con:psycopg.Connection,/):
-    # recursively find all factors starting with a divisor
-    if i is None or i in mults:
-        return
-
-    row = _getFactorById(i,con)
-    assert row is not None, 'internal error'
-    mults[i] = row.value
-
-    # numbers with i in its primary factorization
-    cur = con.execute("select id from factors where f1_id = %s or f2_id = %s;",
-                      (i,i))
-    for row in cur.fetchall():
-        _getMultiplesOfFactorById(mults,row[0],con)
-
-    # numbers with i in a secondary factorization
-    cur = con.execute("select fac_id from factors_old "
-                      "where f1_id = %s or f2_id = %s;",(i,i))
-    for row in cur.fetchall():
-        _getMultiplesOfFactorById(mults,row[0],con)
-
 def _getOldFactorizations(i:int,con:psycopg.Connection,/) \
         -> list[tuple[int,int]]:
     # returns old factor pairs for factor id i, empty list if no factor id i
@@ -580,151 +705,461 @@ def _getOldFactorizations(i:int,con:psycopg.Connection,/) \
                       "where fac_id = %s;",(i,))
     return cur.fetchall()
 
-def addFactor(n:int,f:int,/):
+# (parent,child) for every primary and old factorization reference
+# (join conditions are pushed into each branch so the indexes are used)
+_FACTOR_EDGES_SQL = \
+    "select id as parent,f1_id as child from factors where f1_id is not null " \
+    "union all select id,f2_id from factors where f2_id is not null " \
+    "union all select fac_id,f1_id from factors_old " \
+    "union all select fac_id,f2_id from factors_old"
+
+# seed factors (by value or id) and everything they split into
+_CASCADE_TREE_SQL = \
+    "with recursive tree (id) as (" \
+    "select id from factors where value = any(%s) or id = any(%s) " \
+    "union select edges.child from tree " \
+    f"join ({_FACTOR_EDGES_SQL}) edges on edges.parent = tree.id) " \
+    "select factors.*,false from factors " \
+    "join tree on factors.id = tree.id;"
+
+# same with all multiples of the seed factors (last column marks these)
+_CASCADE_MULTIPLES_SQL = \
+    "with recursive up (id) as (" \
+    "select id from factors where value = any(%s) or id = any(%s) " \
+    "union select edges.parent from up " \
+    f"join ({_FACTOR_EDGES_SQL}) edges on edges.child = up.id), " \
+    "tree (id) as (select id from up " \
+    "union select edges.child from tree " \
+    f"join ({_FACTOR_EDGES_SQL}) edges on edges.parent = tree.id) " \
+    "select factors.*,factors.id in (select id from up) from factors " \
+    "join tree on factors.id = tree.id;"
+
+# primality of factors that may be split (none if not tested yet)
+_COMPOSITE_PRIMALITY = (None,Primality.UNKNOWN,Primality.COMPOSITE)
+
+class _CascadeNode:
     '''
-    factors a number n in the factor database with a factor f
-    exception if n not in database, invalid factor, or not a new factor
+    factor state used by _FactorCascade (factors are referenced by value)
+    id and primality are none for factors not inserted yet
     '''
-    if not (1 < f < n) or n % f != 0:
-        raise FdbException('invalid factorization')
 
-    # n = f * g with f <= g
-    g = n // f
-    if f > g:
-        f,g = g,f
-    if DEBUG_EXTRA:
-        assert f <= g, f'internal error: n={n},f={f}'
-        assert f*g == n, f'internal error: n={n},f={f}'
-        logDatabaseDebugMessage(f'calling addFactor n={n} f={f}')
+    def __init__(self,i:int|None,primality:int|None,up_loaded:bool):
+        self.id = i
+        self.primality = primality
+        self.split: tuple[int,int]|None = None
+        self.old: list[tuple[int,int]] = []
+        # factors referencing this one (primary or old factorization)
+        # only complete when up_loaded is true
+        self.parents: set[int] = set()
+        self.up_loaded = up_loaded
+
+class _FactorCascade:
+    '''
+    applies factorizations along with everything they lead to (old
+    factorizations, higher multiplicity, multiples of the factored number)
+    the affected part of the factors table is loaded with a few recursive
+    queries and changed in memory, write() stores all changes with batched
+    statements so the caller can commit them as a single transaction
+
+    the rules are the same as before (do not guarantee best factor results
+    until running completeNumber() with the full prime factorization)
+    - top priority is that the factorization sequence goes from small to
+      large and the full known factorization can be found from any number
+    - expected ecm scenario: larger factor found before a smaller one, which
+      replaces it rarely, and factors are almost certainly prime
+    - many related numbers sharing factors (such as repunits) are better
+      handled with gcd in a separate program
+    '''
 
-    # check if new factorization should be stored
-    with FdbConnection() as con:
+    def __init__(self,con:psycopg.Connection):
+        self.con = con
+        self.nodes: dict[int,_CascadeNode] = {} # value -> node
+        self.values: dict[int,int] = {} # id -> value (loaded factors)
+        self.absent: set[int] = set() # values known to not be in database
+        self.factored: list[int] = [] # values given a new factorization
+        self.splits: list[tuple[int,int,int]] = [] # (value,f,g) in order
+        self.old_added: list[tuple[int,int,int]] = [] # (value,f1,f2)
+
+    def _load(self,values:Iterable[int],ids:Iterable[int]=(),
+              multiples:bool=False,/):
+        # load factors (with their trees) not yet known, one query for all
+        values = [v for v in set(values)
+                  if v not in self.nodes and v not in self.absent]
+        ids = [i for i in set(ids) if i not in self.values or multiples]
+        if values == [] and ids == []:
+            return
+        cur = self.con.execute(
+            _CASCADE_MULTIPLES_SQL if multiples else _CASCADE_TREE_SQL,
+            ([intToFdbNumber(v) for v in values],ids))
+
+        loaded: list[tuple[_CascadeNode,FactorRow]] = []
+        for row in cur.fetchall():
+            f_row = FactorRow(row[:5])
+            node = self.nodes.get(f_row.value)
+            if node is None:
+                node = _CascadeNode(f_row.id,f_row.primality,False)
+                self.nodes[f_row.value] = node
+                self.values[f_row.id] = f_row.value
+                loaded.append((node,f_row))
+            if row[5]:
+                node.up_loaded = True
+        self.absent.update(v for v in values if v not in self.nodes)
+        if loaded == []:
+            return
+
+        cur = self.con.execute("select fac_id,f1_id,f2_id from factors_old "
+                               "where fac_id = any(%s);",
+                               ([f_row.id for _,f_row in loaded],))
+        old_rows = cur.fetchall()
+        for node,f_row in loaded:
+            if f_row.f1_id is not None:
+                assert f_row.f2_id is not None, f'internal error: row={f_row}'
+                node.split = (self.values[f_row.f1_id],
+                              self.values[f_row.f2_id])
+        for fac_id,f1_id,f2_id in old_rows:
+            self.nodes[self.values[fac_id]].old.append(
+                (self.values[f1_id],self.values[f2_id]))
+        for node,f_row in loaded:
+            for pair in ([node.split] if node.split else []) + node.old:
+                for h in pair:
+                    self.nodes[h].parents.add(self.values[f_row.id])
+
+    def _addNode(self,v:int,/) -> _CascadeNode:
+        # node for a value (must be loaded first), created if new
+        node = self.nodes.get(v)
+        if node is None:
+            assert v in self.absent, 'internal error'
+            self.absent.discard(v)
+            node = _CascadeNode(None,None,True)
+            self.nodes[v] = node
+        return node
+
+    def _multiples(self,v:int,/) -> set[int]:
+        # values of all factors with v as a divisor (including v)
+        ret: set[int] = set()
+        level = [v]
+        while level:
+            # (new factors are up_loaded so these all have ids)
+            pending = [self.nodes[h].id or 0 for h in level
+                       if not self.nodes[h].up_loaded]
+            if pending:
+                self._load((),pending,True)
+            next_level: list[int] = []
+            for h in level:
+                if h not in ret:
+                    ret.add(h)
+                    next_level += self.nodes[h].parents
+            level = next_level
+        return ret
 
-        # factor details for n
-        n_row = _getFactorByValue(n,con)
-        if n_row is None:
-            raise FdbException('n not in database')
+    def _leaves(self,v:int,/) -> list[int]:
+        # values in the current factorization of v
+        ret: list[int] = []
+        stack = [v]
+        while stack:
+            h = stack.pop()
+            node = self.nodes[h]
+            if node.split is None:
+                ret.append(h)
+            else:
+                stack += node.split
+        return ret
 
-        assert n_row.primality != Primality.PRIME, 'cannot factor a prime'
-        assert n_row.primality != Primality.PROBABLE, 'bpsw pseudoprime found?'
+    def addFactor(self,n:int,f:int,/):
+        '''
+        same as addFactor() but only changes the loaded state
+        '''
+        if not (1 < f < n) or n % f != 0:
+            raise FdbException('invalid factorization')
+
+        # n = f * g with f <= g
+        g = n // f
+        if f > g:
+            f,g = g,f
+        if DEBUG_EXTRA:
+            assert f <= g, f'internal error: n={n},f={f}'
+            assert f*g == n, f'internal error: n={n},f={f}'
 
-        # no factor of n stored yet
-        if n_row.f1_id is None:
-            assert n_row.f2_id is None, 'internal error'
-            better = True
-            nf1 = None
-            nf2 = None
+        self._load((n,f,g))
+        n_node = self.nodes.get(n)
+        if n_node is None:
+            raise FdbException('n not in database')
 
-        # get factors, check for f < nf1 (better than existing)
-        else:
-            # get existing factors nf1*nf2 == n
-            cur = con.execute("select value from factors where id = %s;",
-                              (n_row.f1_id,))
-            nf1 = fdbNumberToInt(cur.fetchone()[0]) # type:ignore
-            cur = con.execute("select value from factors where id = %s;",
-                              (n_row.f2_id,))
-            nf2 = fdbNumberToInt(cur.fetchone()[0]) # type:ignore
+        assert n_node.primality != Primality.PRIME, 'cannot factor a prime'
+        assert n_node.primality != Primality.PROBABLE, \
+            'bpsw pseudoprime found?'
 
+        # check for f < nf1 (better than existing)
+        if n_node.split is not None:
+            nf1,nf2 = n_node.split
             if DEBUG_EXTRA:
                 assert nf1 * nf2 == n, 'internal error'
+            if f >= nf1:
+                raise FdbException('not a new factor result')
+            # keep old factorization (for factors_old table)
+            n_node.old.append(n_node.split)
+            self.old_added.append((n,nf1,nf2))
+
+        self._addNode(f).parents.add(n)
+        self._addNode(g).parents.add(n)
+        n_node.split = (f,g)
+        n_node.primality = Primality.COMPOSITE
+        self.factored.append(n)
+        self.splits.append((n,f,g))
+
+        # try using old factor results to factor the new cofactor
+        self._tryFactor(g,[nf1 for nf1,_ in n_node.old])
+
+        # try old factor pairs with new factor pair to find factors
+        for nf1,nf2 in list(n_node.old):
+            if DEBUG_EXTRA:
+                assert nf1 * nf2 == n, 'internal error'
+                assert f < nf1 <= nf2 < g, 'internal error'
+            self._tryFactor(nf1,[f])
+            self._tryFactor(nf2,[f])
+            self._tryFactor(g,[nf1])
+            self._tryFactor(g,[nf2])
+
+        # check for higher multiplicity
+        while f < g and g % f == 0:
+            self._tryFactor(g,[f])
+            g //= f
+
+        # apply factorization to numbers with n as a factor
+        mults = sorted(self._multiples(n) - {n})
+        self._load(m // f for m in mults)
+        for m in mults:
+            self._tryFactor(m,[f])
+
+    def _tryFactor(self,n:int,fs:Iterable[int],/):
+        # try factors from a list, ignoring exceptions (for recursive calls)
+        fs = sorted(fs)
+        self._load(n // f for f in fs if 1 < f < n and n % f == 0)
+        for f in fs:
+            try:
+                self.addFactor(n,f)
+                # if successful, take the same list and try on the cofactor
+                self._tryFactor(n//f,fs)
+                break
+            except FdbException:
+                pass
 
-            if f < nf1: # will replace factorization
-                better = True
-                # store old factorization in factors_old table
-                con.execute("insert into factors_old (fac_id,f1_id,f2_id) "
-                            "values (%s,%s,%s);",
-                            (n_row.id,n_row.f1_id,n_row.f2_id))
+    def tryFactors(self,i:int,fs:Iterable[int],/):
+        '''
+        try provided factors on the composites in the factorization of
+        factor id i (all loaded factors stay in memory between attempts)
+        '''
+        self._load((),(i,))
+        v = self.values[i]
+        for f in sorted(fs):
+            factors = [g for g in self._leaves(v)
+                       if self.nodes[g].primality in _COMPOSITE_PRIMALITY]
+            self._load(g // f for g in factors if 1 < f < g and g % f == 0)
+            for g in factors:
+                try:
+                    self.addFactor(g,f)
+                except FdbException:
+                    pass
+
+    def write(self) -> list[int]:
+        '''
+        store all changes (caller must commit right after, see changes.py)
+        returns ids of numbers containing a newly factored factor
+        '''
+        if self.factored == []:
+            return []
+        con = self.con
+
+        # insert new factors, only those still unfactored need testing
+        new_values = [v for v,node in self.nodes.items() if node.id is None]
+        untested = [v for v in new_values if self.nodes[v].split is None]
+        for v,v_p in zip(untested,fdbPrimalityMany(untested)):
+            self.nodes[v].primality = v_p
+        if new_values:
+            cur = con.execute("insert into factors (value,primality) "
+                              "select * from unnest(%s::bytea[],%s::int[]) "
+                              "returning id,value;",
+                              ([intToFdbNumber(v) for v in new_values],
+                               [self.nodes[v].primality for v in new_values]))
+            for f_id,f_b in cur.fetchall():
+                self.nodes[fdbNumberToInt(f_b)].id = f_id
+            for v in new_values:
+                logDatabaseInfoMessage(f'added factor id {self.nodes[v].id}')
+                if DEBUG_EXTRA:
+                    logDatabaseDebugMessage(f'added factor {v}')
+                if v.bit_length() <= 64:
+                    logDatabaseWarnMessage(f'inserted small factor {v} '
+                                           f'({v.bit_length()} bits)')
+
+        def _id(v:int,/) -> int:
+            ret = self.nodes[v].id
+            assert ret is not None, 'internal error'
+            return ret
+
+        # old factorizations
+        if self.old_added:
+            con.execute("insert into factors_old (fac_id,f1_id,f2_id) "
+                        "select * from unnest(%s::bigint[],%s::bigint[],"
+                        "%s::bigint[]);",
+                        tuple(list(map(_id,col))
+                              for col in zip(*self.old_added)))
+            for n,nf1,nf2 in self.old_added:
                 logDatabaseInfoMessage(
-                    f'replacing factorization of id {n_row.id} '
-                    f'to {n_row.f1_id} and {n_row.f2_id}')
+                    f'replacing factorization of id {_id(n)} '
+                    f'to {_id(nf1)} and {_id(nf2)}')
                 if DEBUG_EXTRA:
                     logDatabaseDebugMessage(f'replacing {n} = {nf1} * {nf2}')
-            else:
-                better = False
 
-        if not better:
-            raise FdbException('not a new factor result')
+        # new factorizations (only the last one for each factor)
+        factored = list(dict.fromkeys(self.factored))
+        splits = [(n,)+self.nodes[n].split for n in factored] # type:ignore
+        con.execute("update factors set f1_id = u.f1_id, f2_id = u.f2_id, "
+                    "primality = %s from unnest(%s::bigint[],%s::bigint[],"
+                    "%s::bigint[]) as u(id,f1_id,f2_id) "
+                    "where factors.id = u.id;",
+                    (Primality.COMPOSITE,)
+                    + tuple(list(map(_id,col)) for col in zip(*splits)))
+        for n,f,g in splits:
+            logDatabaseInfoMessage(
+                f'factored id {_id(n)} to {_id(f)} and {_id(g)}')
+            if DEBUG_EXTRA:
+                logDatabaseDebugMessage(f'factored {n} = {f} * {g}')
+
+        # factors of split factors inherit their ecm curves
+        _inheritEcmEffort([(_id(n),_id(f),_id(g)) for n,f,g in self.splits],
+                          con)
+
+        # numbers containing the factored factors may be completed
+        mults: set[int] = set()
+        for n in factored:
+            mults |= self._multiples(n)
+        cur = con.execute("select id from numbers where cof_id = any(%s) "
+                          "order by id;",([_id(v) for v in mults],))
+        num_ids = [row[0] for row in cur.fetchall()]
+        _logChanges(((ChangeType.FACTOR_SPLIT,_id(n),None)
+                     for n in factored),con)
+        return num_ids
+
+def _getEcmEffortMany(ids:Iterable[int],con:psycopg.Connection,/) \
+        -> dict[int,dict[int,int]]:
+    # factor id -> (b1 -> curves) for factors with recorded ecm curves
+    cur = con.execute("select fac_id,b1,curves from ecm_effort "
+                      "where fac_id = any(%s);",(list(ids),))
+    ret: dict[int,dict[int,int]] = {}
+    for fac_id,b1,curves in cur.fetchall():
+        ret.setdefault(fac_id,{})[b1] = curves
+    return ret
 
-        # store factors in database
-        f_row = _addFactor(f)
-        g_row = _addFactor(g)
+def _inheritEcmEffort(splits:list[tuple[int,int,int]],
+                      con:psycopg.Connection,/):
+    # (factor id,f1 id,f2 id) in the order factored (caller must commit)
+    # each factor keeps the most curves for a b1 from itself or a multiple
+    if splits == []:
+        return
+    effort = _getEcmEffortMany(set(i for split in splits for i in split),con)
+    if effort == {}:
+        return
+    changed: dict[tuple[int,int],int] = {}
+    for n_id,f1_id,f2_id in splits:
+        for b1,curves in effort.get(n_id,{}).items():
+            for f_id in (f1_id,f2_id):
+                f_effort = effort.setdefault(f_id,{})
+                if f_effort.get(b1,0) < curves:
+                    f_effort[b1] = curves
+                    changed[(f_id,b1)] = curves
+    if changed:
+        con.execute("insert into ecm_effort (fac_id,b1,curves) "
+                    "select * from unnest(%s::bigint[],%s::bigint[],"
+                    "%s::bigint[]) on conflict (fac_id,b1) do update "
+                    "set curves = greatest(ecm_effort.curves,excluded.curves);",
+                    ([f_id for f_id,_ in changed],[b1 for _,b1 in changed],
+                     list(changed.values())))
+
+def getEcmEffort(i:int,/) -> dict[int,int]:
+    '''
+    ecm curves run on a factor (by id) as a dict of b1 -> curves
+    (includes curves inherited from numbers it divides)
+    '''
+    with FdbConnection() as con:
+        return _getEcmEffortMany((i,),con).get(i,{})
 
-        # update factorization for n
-        con.execute("update factors set f1_id = %s, f2_id = %s, "
-                    "primality = %s where id = %s;",
-                    (f_row.id,g_row.id,Primality.COMPOSITE,n_row.id))
+def getNumberEcmEffort(n:int,/) -> dict[int,dict[int,int]]:
+    '''
+    ecm curves run on the composite factors of a number (by value) as
+    factor value -> (b1 -> curves), empty if the number is not stored
+    (for prefactoring to skip the curves already run)
+    '''
+    with FdbConnection() as con:
+        factors = _getNumberFactorizationHelper(_getNumberByValue(n,con),con)
+        if factors is None:
+            return {}
+        values = {f_id: f for f,p,f_id in factors
+                  if f_id is not None
+                  and p in (Primality.COMPOSITE,Primality.UNKNOWN)}
+        return {values[f_id]: effort for f_id,effort
+                in _getEcmEffortMany(values,con).items()}
+
+def addEcmEffort(effort:Iterable[tuple[int,int,int]],/) -> int:
+    '''
+    record ecm curves run as (factor value,b1,curves)
+    curves are added to those already recorded, factors not in the database
+    are skipped, returns the number of entries recorded
+    '''
+    totals: dict[tuple[int,int],int] = {}
+    for v,b1,curves in effort:
+        if b1 <= 0 or curves <= 0:
+            raise FdbException(f'invalid ecm effort b1={b1} curves={curves}')
+        totals[(v,b1)] = totals.get((v,b1),0) + curves
+    if totals == {}:
+        return 0
 
+    with FdbConnection() as con:
+        cur = con.execute("select id,value from factors where value = any(%s);",
+                          ([intToFdbNumber(v) for v in set(v for v,_ in totals)],))
+        ids = {fdbNumberToInt(f_b):f_id for f_id,f_b in cur.fetchall()}
+        rows = [(ids[v],b1,curves) for (v,b1),curves in totals.items()
+                if v in ids]
+        if rows:
+            con.execute("insert into ecm_effort (fac_id,b1,curves) "
+                        "select * from unnest(%s::bigint[],%s::bigint[],"
+                        "%s::bigint[]) on conflict (fac_id,b1) do update "
+                        "set curves = ecm_effort.curves + excluded.curves;",
+                        tuple(map(list,zip(*rows))))
+
+            # factors already split pass the curves on to their factors
+            tree_rows = _getFactorTreeRows((f_id for f_id,_,_ in rows),con)
+            splits: list[tuple[int,int,int]] = []
+            stack = list(set(f_id for f_id,_,_ in rows))
+            while stack:
+                row = tree_rows[stack.pop(0)]
+                if row.f1_id is not None:
+                    assert row.f2_id is not None, f'internal error: row={row}'
+                    splits.append((row.id,row.f1_id,row.f2_id))
+                    stack += (row.f1_id,row.f2_id)
+            _inheritEcmEffort(splits,con)
         con.commit()
-        logDatabaseInfoMessage(
-            f'factored id {n_row.id} to {f_row.id} and {g_row.id}')
-        if DEBUG_EXTRA:
-            logDatabaseDebugMessage(f'factored {n_row.value} = {f} * {g}')
-
-        # numbers containing this factor may be completed
-        num_rows: list[NumberRow] = []
-        _getNumbersWithFactor(num_rows,n_row,con)
-
-    # (database connection released to avoid multiple connections in recursion)
-
-    # TODO find a better way to update factors with few operations
-    # the few rules below do not guarantee best factor results on all
-    # until running completeFactor() with full prime factorization
-    # a few rules should cover most expected cases that occur in production
-    # top priority is to ensure the factorization sequence goes from small to
-    # large and the full known factorization can be found from any number
-
-    # it should work fine in the expected ecm scenario
-    # - ecm finds larger factor then a smaller one later
-    # - factors will almost certainly be prime
-    # - smaller factor replaces a larger one rarely (maybe only once or twice)
+    return len(rows)
 
-    # many related numbers sharing factors (such as repunits) is possible
-    # - for something like this, better to use gcd in separate program
+def _completeNumbers(num_ids:list[int],/):
+    # attempt completion of numbers after their factors changed
+    invalidateTableNumbers(num_ids)
+    for num_id in num_ids:
+        completeNumber(num_id)
 
-    # maybe it is not appropriate to design the database application to handle
-    # the complexities of all various situations that could happen
-    # - instead use specialized programs for analysis of particular numbers
-
-    # try using old factor results to factor the new cofactor
-    with FdbConnection() as con:
-        old_pairs_id = _getOldFactorizations(n_row.id,con)
-        old_pairs_value: list[tuple[int,int]] = []
-        old_facs: list[int] = []
-        for i,j in old_pairs_id:
-            row = _getFactorById(i,con)
-            assert row is not None, 'internal error'
-            old_facs.append(row.value)
-            row2 = _getFactorById(j,con)
-            assert row2 is not None, 'internal error'
-            old_pairs_value.append((row.value,row2.value))
-    _tryFactorByValue(g,old_facs)
-
-    # try old factor pairs with new factor pair to find factors
-    for nf1,nf2 in old_pairs_value:
-        if DEBUG_EXTRA:
-            assert nf1 * nf2 == n, 'internal error'
-            assert f < nf1 <= nf2 < g, 'internal error'
-        _tryFactorByValue(nf1,[f])
-        _tryFactorByValue(nf2,[f])
-        _tryFactorByValue(g,[nf1])
-        _tryFactorByValue(g,[nf2])
-
-    # check for higher multiplicity
-    while f < g and g % f == 0:
-        _tryFactorByValue(g,[f])
-        g //= f
-
-    # recursively apply factorization to numbers with n as a factor
+def addFactor(n:int,f:int,/):
+    '''
+    factors a number n in the factor database with a factor f
+    exception if n not in database, invalid factor, or not a new factor
+    all resulting factorizations are stored in a single transaction
+    '''
+    if DEBUG_EXTRA:
+        logDatabaseDebugMessage(f'calling addFactor n={n} f={f}')
     with FdbConnection() as con:
-        dbf: dict[int,int] = {}
-        _getMultiplesOfFactorById(dbf,n_row.id,con)
-    for i in dbf:
-        if i != n_row.id:
-            _tryFactorByValue(dbf[i],[f])
-
-    # attempt completion of the numbers found previously
-    for num_row in num_rows:
-        completeNumber(num_row.id)
+        cascade = _FactorCascade(con)
+        cascade.addFactor(n,f)
+        num_ids = cascade.write()
+        con.commit()
+    _completeNumbers(num_ids)
 
 def deleteFactorById(i:int,/) -> bool:
     '''
@@ -802,8 +1237,7 @@ def completeNumber(i:int,/) -> bool:
             raise FdbException(f'no number with id {i}')
         if n_row.complete:
             return True
-        factors = _getNumberFactorizationHelper(n_row,con)
-        assert factors is not None, 'internal error'
+        factors = _computeNumberFactorization(n_row,con)
 
     if DEBUG_EXTRA:
         prod = 1
@@ -833,12 +1267,23 @@ def completeNumber(i:int,/) -> bool:
             cof_id = _addFactor(cof).id
             _tryFactorFactorById(cof_id,[f for f,_,_ in factors])
 
+        # lock the row so only one caller counts the completion
+        cur = con.execute("select complete from numbers where id = %s "
+                          "for update;",(i,))
+        row = cur.fetchone()
+        was_complete = row is not None and row[0]
+
         spf2b,spf4b,spf8b = spfsToFdbFormat(spfs)
         con.execute("update numbers set spf2 = %s, spf4 = %s, spf8 = %s, "
                     "cof_id = %s, complete = %s where id = %s;",
                     (spf2b,spf4b,spf8b,cof_id,completed,i))
+        _updateNumberSummaries((i,),con)
+        if completed and not was_complete:
+            _changeCategoryStatsComplete((i,),1,con)
+            _logChanges([(ChangeType.NUMBER_COMPLETED,None,i)],con)
         con.commit()
 
+    invalidateTableNumbers((i,))
     if completed:
         logDatabaseInfoMessage(f'completed factorization of number id {i}')
     return completed
@@ -897,48 +1342,65 @@ def factorNumberByValueWithFactors(n:int,fs:Iterable[int],/):
     if not row.complete:
         _tryFactorNumberById(row.id,fs)
 
-def _maxBitParams(bitlen:int|None,/) -> tuple[int,bytes]:
-    # return byte length and largest first byte value
-    # used for filtering database queries of numbers by value
+def _sortKey(n:int,/) -> tuple[int,bytes]:
+    # (length(value),value) which orders stored values numerically
+    # used for ranges and keyset pagination on the factors_incomplete index
+    b = intToFdbNumber(n)
+    return len(b),b
+
+def _maxBitsKey(bitlen:int|None,/) -> tuple[int,bytes]:
+    # sort key of the largest value with at most bitlen bits
     if bitlen is None:
         bitlen = NUM_BIT_LIM
-    bytelen = (bitlen+7)//8
-    extrabits = bitlen % 8
-    firstbytemax = bytes([255 if extrabits == 0 else 2**(extrabits+1)-1])
-    return bytelen,firstbytemax
+    assert bitlen > 0
+    return _sortKey(2**bitlen-1)
 
-def _smallestNumbersOfType(maxcount:int|None,maxbits:int|None,status:int) \
+def _smallestNumbersOfType(maxcount:int|None,maxbits:int|None,status:int,
+                           after:int|None) \
         -> Generator[FactorRow,None,None]:
     # find smallest factors of a given incomplete status
-    maxbytes,firstbytemax = _maxBitParams(maxbits)
+    # (the partial index on (primality,length(value),value) where f1_id is null
+    # covers the filter and order so the cost does not grow with the offset)
+    maxlen,maxval = _maxBitsKey(maxbits)
+    afterlen,afterval = (0,b'') if after is None else _sortKey(after)
     with FdbConnection() as con:
         # f1_id null applies for probable and unknown
         # composites should only be selected if not factored yet
         cur = con.execute("select * from factors where primality = %s "
-                          "and length(value) <= %s and substr(value,1,1) <= %s "
                           "and f1_id is null "
+                          "and (length(value),value) > (%s,%s) "
+                          "and (length(value),value) <= (%s,%s) "
                           "order by length(value), value limit %s;",
-                          (status,maxbytes,firstbytemax,maxcount))
+                          (status,afterlen,afterval,maxlen,maxval,maxcount))
         for row in cur:
             yield FactorRow(row)
 
-def smallestUnknowns(maxcount:int|None=None,maxbits:int|None=None) \
+def smallestUnknowns(maxcount:int|None=None,maxbits:int|None=None,
+                     after:int|None=None) \
             -> Generator[FactorRow,None,None]:
     '''
     find smallest factors which are not known to be either prime or composite
+    after is the last value of a previous page to continue from
     '''
-    yield from _smallestNumbersOfType(maxcount,maxbits,Primality.UNKNOWN)
+    yield from _smallestNumbersOfType(maxcount,maxbits,Primality.UNKNOWN,
+                                      after)
 
-def smallestComposites(maxcount:int|None=None,maxbits:int|None=None) \
+def smallestComposites(maxcount:int|None=None,maxbits:int|None=None,
+                       after:int|None=None) \
             -> Generator[FactorRow,None,None]:
     '''
     find smallest factors which are known to be composite and are not factored
+    after is the last value of a previous page to continue from
     '''
-    yield from _smallestNumbersOfType(maxcount,maxbits,Primality.COMPOSITE)
+    yield from _smallestNumbersOfType(maxcount,maxbits,Primality.COMPOSITE,
+                                      after)
 
-def smallestProbablePrimes(maxcount:int|None=None,maxbits:int|None=None) \
+def smallestProbablePrimes(maxcount:int|None=None,maxbits:int|None=None,
+                           after:int|None=None) \
             -> Generator[FactorRow,None,None]:
     '''
     find smallest factors which are probably prime but not proven yet
+    after is the last value of a previous page to continue from
     '''
-    yield from _smallestNumbersOfType(maxcount,maxbits,Primality.PROBABLE)
+    yield from _smallestNumbersOfType(maxcount,maxbits,Primality.PROBABLE,
+                                      after)
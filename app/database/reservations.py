@@ -0,0 +1,190 @@
+'''
+reserving factors for users to work on
+- claiming picks the smallest factors needing the work which are not reserved
+  (rows locked with skip locked so concurrent claims get disjoint factors)
+- reservations are leases which expire unless renewed before then
+- each user can hold a limited number of reservations
+'''
+
+from datetime import datetime, timedelta
+import psycopg
+from typing import Iterable
+
+from app.database.connectionPool import FdbConnection
+from app.database.helpers import \
+    FdbException, \
+    currentTimeUtc
+from app.database.constants import Primality
+from app.database.numbers import \
+    FactorRow, \
+    _maxBitsKey
+
+from app.config import \
+    DEBUG_EXTRA, \
+    RESERVATION_LIMIT, \
+    RESERVATION_LEASE_SECS
+
+class WorkType:
+    ''' work types for reservations '''
+    PRP = 0 # primality unknown, run a probable prime test
+    FACTOR = 1 # composite without known factors, find a factor
+    PROVE = 2 # probable prime, prove primality
+
+# factor primality which needs each type of work
+_WORK_PRIMALITY = {
+    WorkType.PRP: Primality.UNKNOWN,
+    WorkType.FACTOR: Primality.COMPOSITE,
+    WorkType.PROVE: Primality.PROBABLE,
+}
+
+class ReservationRow:
+    '''
+    object representation for row in reservations table
+    '''
+
+    def __init__(self,row):
+        if DEBUG_EXTRA:
+            assert isinstance(row,tuple)
+            assert len(row) == 5
+            assert isinstance(row[0],int)
+            assert isinstance(row[1],int)
+            assert isinstance(row[2],int)
+            assert isinstance(row[3],datetime)
+            assert isinstance(row[4],datetime)
+        self.fac_id: int = row[0]
+        self.user_id: int = row[1]
+        self.work: int = row[2]
+        self.created: datetime = row[3]
+        self.expires: datetime = row[4]
+
+    def __repr__(self) -> str:
+        return f'<ReservationRow(' \
+            f'fac_id={self.fac_id},' \
+            f'user_id={self.user_id},' \
+            f'work={self.work},' \
+            f'created={repr(self.created)},' \
+            f'expires={repr(self.expires)})>'
+
+def _leaseEnd(lease:float|None,/) -> datetime:
+    # expiration time for a lease starting now
+    if lease is None:
+        lease = RESERVATION_LEASE_SECS
+    if not 0 < lease <= RESERVATION_LEASE_SECS:
+        raise FdbException(f'lease must be positive and at most '
+                           f'{RESERVATION_LEASE_SECS} seconds')
+    return currentTimeUtc() + timedelta(seconds=lease)
+
+def _expireReservations(con:psycopg.Connection,/) -> int:
+    cur = con.execute("delete from reservations where expires <= %s;",
+                      (currentTimeUtc(),))
+    return cur.rowcount
+
+def expireReservations() -> int:
+    '''
+    delete reservations with an expired lease, returns how many
+    '''
+    with FdbConnection() as con:
+        count = _expireReservations(con)
+        con.commit()
+        return count
+
+def claimWork(user_id:int,work:int,count:int,
+              maxbits:int|None=None,lease:float|None=None) \
+        -> tuple[list[FactorRow],datetime]:
+    '''
+    reserve up to count of the smallest factors needing a type of work
+    (fewer if not enough are available or the user reaches their limit)
+    returns the reserved factors and the lease expiration time
+    '''
+    if work not in _WORK_PRIMALITY:
+        raise FdbException(f'invalid work type {work}')
+    if count <= 0:
+        raise FdbException('count must be positive')
+    expires = _leaseEnd(lease)
+    maxlen,maxval = _maxBitsKey(maxbits)
+
+    with FdbConnection() as con:
+        # lock the user so claims by the same user see each others counts
+        cur = con.execute("select id from users where id = %s "
+                          "and not is_disabled for update;",(user_id,))
+        if cur.fetchone() is None:
+            raise FdbException('user does not exist or is disabled')
+        _expireReservations(con)
+        cur = con.execute("select count(*) from reservations "
+                          "where user_id = %s;",(user_id,))
+        held = cur.fetchone()[0] # type:ignore
+        count = min(count,RESERVATION_LIMIT-held)
+        if count <= 0:
+            con.commit()
+            return [],expires
+
+        # claims running at the same time skip the rows locked by others
+        # (committed reservations are excluded by the not exists)
+        cur = con.execute("select * from factors where primality = %s "
+                          "and f1_id is null "
+                          "and (length(value),value) <= (%s,%s) "
+                          "and not exists (select 1 from reservations "
+                          "where reservations.fac_id = factors.id "
+                          "and reservations.work = %s) "
+                          "order by length(value), value limit %s "
+                          "for update skip locked;",
+                          (_WORK_PRIMALITY[work],maxlen,maxval,
+                           work,count))
+        rows = [FactorRow(row) for row in cur.fetchall()]
+        if rows != []:
+            con.execute("insert into reservations "
+                        "(fac_id,user_id,work,expires) "
+                        "select fac_id,%s,%s,%s from unnest(%s::bigint[]) "
+                        "as t (fac_id);",
+                        (user_id,work,expires,[row.id for row in rows]))
+        con.commit()
+        return rows,expires
+
+def renewReservations(user_id:int,fac_ids:Iterable[int]|None=None,
+                      lease:float|None=None) -> int:
+    '''
+    heartbeat extending unexpired reservations of a user (all if ids are none)
+    returns how many were renewed (expired ones may be claimed by others)
+    '''
+    expires = _leaseEnd(lease)
+    with FdbConnection() as con:
+        if fac_ids is None:
+            cur = con.execute("update reservations set expires = %s "
+                              "where user_id = %s and expires > %s;",
+                              (expires,user_id,currentTimeUtc()))
+        else:
+            cur = con.execute("update reservations set expires = %s "
+                              "where user_id = %s and expires > %s "
+                              "and fac_id = any(%s);",
+                              (expires,user_id,currentTimeUtc(),
+                               list(fac_ids)))
+        con.commit()
+        return cur.rowcount
+
+def releaseReservations(user_id:int,fac_ids:Iterable[int]|None=None) -> int:
+    '''
+    remove reservations of a user (all if ids are none) when work is done
+    returns how many were removed
+    '''
+    with FdbConnection() as con:
+        if fac_ids is None:
+            cur = con.execute("delete from reservations where user_id = %s;",
+                              (user_id,))
+        else:
+            cur = con.execute("delete from reservations where user_id = %s "
+                              "and fac_id = any(%s);",
+                              (user_id,list(fac_ids)))
+        con.commit()
+        return cur.rowcount
+
+def getReservations(user_id:int,/) -> list[ReservationRow]:
+    '''
+    unexpired reservations of a user, soonest expiring first
+    '''
+    with FdbConnection() as con:
+        cur = con.execute("select fac_id,user_id,work,created,expires "
+                          "from reservations "
+                          "where user_id = %s and expires > %s "
+                          "order by expires, fac_id;",
+                          (user_id,currentTimeUtc()))
+        return [ReservationRow(row) for row in cur.fetchall()]
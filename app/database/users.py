@@ -379,6 +379,7 @@ def makeApiKey(user:str|int) -> bytes:
             raise FdbException('user does not exist')
         con.execute("update users set api_key = %s where id = %s;",
                     (_hashToken(key),user_row.id))
+        con.commit()
     return key
 
 def findApiKey(key:bytes) -> None|UserRow:
@@ -1,10 +1,36 @@
+import asyncio
 import json
 import quart
+from quart.utils import run_sync
+
+import app.database.numbers as dbNum
+import app.database.asyncNumbers as dbNumAsync
+import app.database.asyncCategories as dbCatAsync
+import app.database.export as dbExport
+import app.database.asyncChanges as dbChangesAsync
+from app.database.categories import CategoryRow
+from app.database.helpers import \
+    FdbException, \
+    pathToString
 
 from app.utils.pageData import basePageData
+from app.utils.factorData import factoringProgress
+from app.utils.session import getApiUser
+from app.config import \
+    API_BATCH_LIMIT, \
+    API_EXPORT_LIMIT
 
 bp = quart.Blueprint('api',__name__)
 
+# longest wait (seconds) for /api/changes and how often it checks for changes
+_CHANGES_MAX_WAIT = 30
+_CHANGES_POLL_INTERVAL = 1.0
+
+# exports running at once (they hold a sync pool connection while streaming)
+# and the longest an export response may take (seconds)
+_EXPORT_SEMAPHORE = asyncio.Semaphore(API_EXPORT_LIMIT)
+_EXPORT_TIMEOUT = 3600
+
 def toJson(obj,/) -> str:
     return json.dumps(obj,separators=(',',':'))
 
@@ -14,6 +40,58 @@ def toJson(obj,/) -> str:
 def jsonResponse(obj,code=200,/) -> quart.Response:
     return quart.Response(toJson(obj),code,mimetype='application/json')
 
+class _ApiError(Exception):
+    ''' request error returned as {"message":...} with a status code '''
+
+    def __init__(self,msg:str,code:int=400):
+        super().__init__(msg)
+        self.code = code
+
+def _toInt(x,/) -> int:
+    # nonnegative integer from a json number or decimal string
+    # (large values should be strings since json numbers may lose precision)
+    if isinstance(x,int) and not isinstance(x,bool) and x >= 0:
+        return x
+    if isinstance(x,str) and x.isascii() and x.isdigit():
+        try:
+            return int(x)
+        except ValueError: # longer than the digit limit
+            pass
+    raise _ApiError(f'invalid integer: {str(x)[:32]}')
+
+def _toIntList(x,name:str,/) -> list[int]:
+    if not isinstance(x,list):
+        raise _ApiError(f'{name} must be a list')
+    return [_toInt(v) for v in x]
+
+async def _lookupArgs() -> tuple[list[int],list[int]]:
+    # ids and values from the query string (comma separated lists "id" and
+    # "value") for get requests or a json object {"ids":[],"values":[]}
+    if quart.request.method == 'GET':
+        args = quart.request.args
+        ids = [_toInt(s) for s in args.get('id','').split(',') if s]
+        values = [_toInt(s) for s in args.get('value','').split(',') if s]
+    else:
+        data = await quart.request.get_json(silent=True)
+        if not isinstance(data,dict):
+            raise _ApiError('expected a json object')
+        ids = _toIntList(data.get('ids',[]),'ids')
+        values = _toIntList(data.get('values',[]),'values')
+    if len(ids) + len(values) > API_BATCH_LIMIT:
+        raise _ApiError(f'at most {API_BATCH_LIMIT} ids and values allowed')
+    return ids,values
+
+def _missing(ids:list[int],values:list[int],rows,/) -> dict:
+    # requested ids and values which were not found
+    found_ids = {row.id for row in rows}
+    found_values = {row.value for row in rows}
+    return {'ids': [i for i in ids if i not in found_ids],
+            'values': [str(v) for v in values if v not in found_values]}
+
+def _categoryJson(row:CategoryRow,/) -> dict:
+    return {'id': row.id, 'name': row.name, 'title': row.title,
+            'is_table': row.is_table}
+
 @bp.get('/api')
 async def apiGet():
     '''
@@ -21,6 +99,7 @@ async def apiGet():
     '''
     return await quart.render_template('api.jinja',
                                        page='api',
+                                       api_batch_limit=API_BATCH_LIMIT,
                                        **basePageData())
 
 @bp.post('/api')
@@ -29,3 +108,191 @@ async def apiPost():
     api usage
     '''
     return jsonResponse({'message':'not implemented'},501)
+
+@bp.route('/api/get_number',methods=['GET','POST'])
+async def apiGetNumber():
+    '''
+    numbers with their factorizations by ids and values
+    '''
+    try:
+        ids,values = await _lookupArgs()
+    except _ApiError as e:
+        return jsonResponse({'message':str(e)},e.code)
+
+    rows = await dbNumAsync.getNumbersMany(ids,values)
+    factorizations = await dbNumAsync.getNumberFactorizationsMany(rows)
+    numbers = []
+    for row in rows:
+        factors = factorizations[row.id]
+        numbers.append({
+            'id': row.id,
+            'value': str(row.value),
+            'complete': row.complete,
+            'progress': row.progress if row.progress is not None
+                else factoringProgress(row.value,factors),
+            'cofactor_id': row.cof_id,
+            'factors': [[str(f),p,i] for f,p,i in factors]
+        })
+    return jsonResponse({'numbers': numbers,
+                         'missing': _missing(ids,values,rows)})
+
+@bp.route('/api/get_factor',methods=['GET','POST'])
+async def apiGetFactor():
+    '''
+    factors by ids and values
+    '''
+    try:
+        ids,values = await _lookupArgs()
+    except _ApiError as e:
+        return jsonResponse({'message':str(e)},e.code)
+
+    rows = await dbNumAsync.getFactorsMany(ids,values)
+    factors = [{'id': row.id,
+                'value': str(row.value),
+                'primality': row.primality,
+                'f1_id': row.f1_id,
+                'f2_id': row.f2_id} for row in rows]
+    return jsonResponse({'factors': factors,
+                         'missing': _missing(ids,values,rows)})
+
+@bp.get('/api/list_category')
+async def apiListCategory():
+    '''
+    category with its subcategories by path (or id)
+    '''
+    args = quart.request.args
+    try:
+        path_or_id = _toInt(args['id']) if 'id' in args \
+            else args.get('path','')
+    except _ApiError as e:
+        return jsonResponse({'message':str(e)},e.code)
+
+    try:
+        path = await dbCatAsync.getCategoryFullPath(path_or_id)
+    except FdbException as e:
+        return jsonResponse({'message':str(e)},400)
+    if path is None:
+        return jsonResponse({'message':'category does not exist'},404)
+    children = await dbCatAsync.listCategory(path[-1].id)
+    assert children is not None, 'internal error'
+    return jsonResponse({'path': pathToString(tuple(row.name
+                                                    for row in path[1:])),
+                         'category': _categoryJson(path[-1]),
+                         'children': [_categoryJson(row) for row in children]})
+
+@bp.post('/api/submit_factors')
+async def apiSubmitFactors():
+    '''
+    try factors on many factor ids in one transaction (requires api key)
+    body is {"factors":[[id,[factor,...]],...]}
+    '''
+    user = await getApiUser()
+    if user is None:
+        return jsonResponse({'message':'missing or invalid api key'},401)
+
+    try:
+        data = await quart.request.get_json(silent=True)
+        if not isinstance(data,dict) \
+                or not isinstance(data.get('factors'),list):
+            raise _ApiError('expected a json object with a factors list')
+        if len(data['factors']) > API_BATCH_LIMIT:
+            raise _ApiError(f'at most {API_BATCH_LIMIT} factor ids allowed')
+        items: list[tuple[int,list[int]]] = []
+        for item in data['factors']:
+            if not isinstance(item,list) or len(item) != 2:
+                raise _ApiError('factors items must be [id,[factor,...]]')
+            items.append((_toInt(item[0]),_toIntList(item[1],'factors')))
+        if sum(len(fs) for _,fs in items) > API_BATCH_LIMIT:
+            raise _ApiError(f'at most {API_BATCH_LIMIT} factors allowed')
+    except _ApiError as e:
+        return jsonResponse({'message':str(e)},e.code)
+
+    # factor engine and database updates run outside the event loop
+    try:
+        found = await run_sync(dbNum.tryFactorsMany)(
+            [(i,[f for f in fs if f > 1]) for i,fs in items])
+    except FdbException as e:
+        return jsonResponse({'message':str(e)},400)
+    return jsonResponse({'factored': [[i,n] for i,n in found.items()],
+                         'missing': [i for i,_ in items if i not in found]})
+
+@bp.get('/api/export')
+async def apiExport():
+    '''
+    stream categories below path and their sequences (and factors) as ndjson
+    query is path, factors=1 to include all factors, compression=gzip|zstd
+    (requires api key)
+    '''
+    user = await getApiUser()
+    if user is None:
+        return jsonResponse({'message':'missing or invalid api key'},401)
+    if _EXPORT_SEMAPHORE.locked():
+        return jsonResponse({'message':'too many exports running, '
+                                       'try again later'},429)
+
+    args = quart.request.args
+    path = args.get('path','')
+    factors = args.get('factors') == '1'
+    compression = args.get('compression') or None
+    if compression not in dbExport.EXPORT_COMPRESSION:
+        return jsonResponse({'message':'compression must be gzip or zstd'},400)
+    if compression == 'zstd' and dbExport.zstandard is None:
+        return jsonResponse({'message':'zstd is not available'},400)
+    try:
+        if await dbCatAsync.getCategoryFullPath(path) is None:
+            return jsonResponse({'message':'category does not exist'},404)
+    except FdbException as e:
+        return jsonResponse({'message':str(e)},400)
+
+    # the export reads the database in a thread, one chunk at a time
+    # (the connection is taken on the first chunk, inside the semaphore)
+    gen = dbExport.exportNdjson(path,factors=factors,compression=compression)
+    async def stream():
+        async with _EXPORT_SEMAPHORE:
+            try:
+                while (chunk := await run_sync(next)(gen,None)) is not None:
+                    yield chunk
+            finally:
+                await run_sync(gen.close)()
+
+    headers = {} if compression is None else {'Content-Encoding':compression}
+    response = quart.Response(stream(),200,headers,
+                              mimetype='application/x-ndjson')
+    response.timeout = _EXPORT_TIMEOUT # large exports take longer
+    return response
+
+@bp.get('/api/changes')
+async def apiChanges():
+    '''
+    change log entries after a cursor (since), waiting up to wait seconds
+    for new ones if there are none yet (long poll)
+    without since only the current cursor is returned (to start syncing)
+    '''
+    args = quart.request.args
+    try:
+        if 'since' not in args:
+            return jsonResponse({'changes': [],
+                                 'cursor': await dbChangesAsync
+                                    .getChangesCursor()})
+        since = _toInt(args['since'])
+        limit = min(_toInt(args.get('limit',API_BATCH_LIMIT)),API_BATCH_LIMIT)
+        wait = min(_toInt(args.get('wait',0)),_CHANGES_MAX_WAIT)
+    except _ApiError as e:
+        return jsonResponse({'message':str(e)},e.code)
+
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + wait
+    while True:
+        rows = await dbChangesAsync.getChangesSince(since,limit=limit)
+        if rows != [] or loop.time() >= deadline:
+            break
+        await asyncio.sleep(min(_CHANGES_POLL_INTERVAL,
+                                deadline-loop.time()))
+
+    changes = [{'id': row.id,
+                'kind': row.kind,
+                'factor_id': row.fac_id,
+                'number_id': row.num_id,
+                'time': row.time.isoformat()} for row in rows]
+    return jsonResponse({'changes': changes,
+                         'cursor': rows[-1].id if rows else since})
@@ -1,6 +1,8 @@
 import quart
+from quart.utils import run_sync
 
 import app.database.numbers as dbNum
+import app.database.asyncNumbers as dbNumAsync
 import app.database.users as dbUser
 from app.database.helpers import FdbException
 
@@ -14,11 +16,11 @@ from app.config import \
 
 bp = quart.Blueprint('factor',__name__)
 
-def factorInfo(i:int):
+async def factorInfo(i:int):
     '''
     gets details for factor.jinja template
     '''
-    row = dbNum.getFactorById(i)
+    row = await dbNumAsync.getFactorById(i)
     if row is None:
         return { 'exists': False, 'factor_id': i }
 
@@ -33,11 +35,11 @@ def factorInfo(i:int):
     ret['factor2_exists'] = row.f2_id is not None
     ret['factor1_id'] = row.f1_id
     ret['factor2_id'] = row.f2_id
-    ret['factors_old'] = dbNum.getOldFactors(i)
+    ret['factors_old'] = await dbNumAsync.getOldFactors(i)
 
     if row.f1_id is not None and row.f2_id is not None:
-        frow1 = dbNum.getFactorById(row.f1_id)
-        frow2 = dbNum.getFactorById(row.f2_id)
+        frow1 = await dbNumAsync.getFactorById(row.f1_id)
+        frow2 = await dbNumAsync.getFactorById(row.f2_id)
         assert frow1 is not None and frow2 is not None, 'internal error'
 
         ret['factor1_value'] = frow1.value
@@ -49,7 +51,7 @@ def factorInfo(i:int):
 
 @bp.get('/factor/<int:i>')
 async def factorGet(i:int):
-    factor_info = factorInfo(i)
+    factor_info = await factorInfo(i)
     code = 200 if factor_info['exists'] else 404
     return quart.Response(
         await quart.render_template('factor.jinja',page='factor',
@@ -152,10 +154,12 @@ async def factorPost(i:int):
         if not user.is_admin:
             return await basicErrorPage(f'/factor/{i}',403)
 
-        msg,code,ok = updatePrimality(i,data['primality'],data['run_prp'])
+        # primality tests and database updates run outside the event loop
+        msg,code,ok = await run_sync(updatePrimality)(i,data['primality'],
+                                                       data['run_prp'])
 
     elif 'factors' in data:
-        msg,code,ok = insertFactors(i,user,data['factors'])
+        msg,code,ok = await run_sync(insertFactors)(i,user,data['factors'])
 
     else:
         return await basicErrorPage(f'/factor/{i}',400)
@@ -166,5 +170,5 @@ async def factorPost(i:int):
                                     post_ok=ok,
                                     post_msg=msg,
                                     **basePageData(),
-                                    **factorInfo(i)),
+                                    **(await factorInfo(i))),
         code)
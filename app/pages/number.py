@@ -1,7 +1,8 @@
 import quart
 
 import app.database.numbers as dbNum
-import app.database.categories as dbCat
+import app.database.asyncNumbers as dbNumAsync
+import app.database.asyncCategories as dbCatAsync
 from app.database.numbers import Primality
 
 from app.utils.pageData import basePageData
@@ -14,26 +15,27 @@ from app.utils.errorPage import basicErrorPage
 
 bp = quart.Blueprint('numbers',__name__)
 
-def numberInfo(i:int):
+async def numberInfo(i:int):
     '''
     gets details for number.jinja template
     '''
-    row = dbNum.getNumberById(i)
+    row = await dbNumAsync.getNumberById(i)
     if row is None:
         return { 'exists': False, 'number_id': i }
 
     cof_row = None if row.cof_id is None \
-        else dbNum.getFactorById(row.cof_id)
+        else await dbNumAsync.getFactorById(row.cof_id)
     number_value = str(row.value)
-    factors_list = dbNum.getNumberFactorizationById(i)
+    factors_list = await dbNumAsync.getNumberFactorizationById(i)
     assert factors_list is not None, 'internal error'
-    cats = dbCat.findCategoriesWithNumber(i)
+    cats = await dbCatAsync.findCategoriesWithNumber(i)
     cats_list = [
         (row.title if row.title else row.name,
         index,'/'.join(path))
         for row,index,path in cats
     ]
-    factors_prog = factoringProgress(row.value,factors_list)
+    factors_prog = row.progress if row.progress is not None \
+        else factoringProgress(row.value,factors_list)
 
     return {
         'exists': True,
@@ -57,7 +59,7 @@ def numberInfo(i:int):
 
 @bp.get('/number/<int:i>')
 async def numberGet(i:int):
-    number_info = numberInfo(i)
+    number_info = await numberInfo(i)
     code = 200 if number_info['exists'] else 404
     return quart.Response(
         await quart.render_template('number.jinja',
@@ -104,5 +106,5 @@ async def numberPost(i:int):
                                     post_ok=ok,
                                     post_msg=msg,
                                     **basePageData(),
-                                    **numberInfo(i)),
+                                    **(await numberInfo(i))),
         code)
@@ -1,5 +1,10 @@
 import quart
 
+import app.database.asyncCategories as dbCatAsync
+import app.database.asyncChanges as dbChangesAsync
+from app.database.constants import ChangeType
+from app.database.helpers import timestampToString
+
 from app.utils.pageData import basePageData
 
 bp = quart.Blueprint('root',__name__)
@@ -34,14 +39,28 @@ async def privacy():
 
 @bp.route('/stats')
 async def stats():
+    totals = await dbCatAsync.getCategoryStatsTotals()
     return await quart.render_template('stats.jinja',
                                        page='stats',
+                                       totals=totals,
                                        **basePageData())
 
+_CHANGE_NAMES = {
+    ChangeType.NUMBER_ADDED: 'number added',
+    ChangeType.FACTOR_SPLIT: 'factor split',
+    ChangeType.FACTOR_PRIMALITY: 'primality updated',
+    ChangeType.NUMBER_COMPLETED: 'number completed',
+    ChangeType.NUMBER_UNCOMPLETED: 'number no longer complete',
+}
+
 @bp.route('/recent')
 async def recent():
+    rows = await dbChangesAsync.getRecentChanges(100)
+    changes = [(timestampToString(row.time),_CHANGE_NAMES.get(row.kind,''),
+                row.fac_id,row.num_id) for row in rows]
     return await quart.render_template('recent.jinja',
                                        page='recent',
+                                       changes=changes,
                                        **basePageData())
 
 @bp.route('/robots.txt')
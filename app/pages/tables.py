@@ -1,11 +1,16 @@
 import quart
 
 import app.database.categories as dbCat
+import app.database.asyncCategories as dbCatAsync
 
 from app.utils.session import getUser
 from app.utils.errorPage import basicErrorPage
 from app.utils.factorData import factorsHtml
 from app.utils.pageData import basePageData
+from app.utils.tableCache import \
+    getTableRows, \
+    getTableGeneration, \
+    putTableRows
 from app.config import \
     DEBUG_EXTRA, \
     TABLE_PER_PAGE_DEFAULT, \
@@ -13,7 +18,7 @@ from app.config import \
 
 bp = quart.Blueprint('tables',__name__)
 
-def tableInfo(path_str:str):
+async def tableInfo(path_str:str):
     '''
     generate table information for tables.jinja template
     '''
@@ -34,7 +39,7 @@ def tableInfo(path_str:str):
 
     path = () if path_str == '' else tuple(path_str.split('/'))
     path_str = '/'.join(path)
-    cat_rows = dbCat.getCategoryFullPath(path)
+    cat_rows = await dbCatAsync.getCategoryFullPath(path)
 
     if cat_rows is None:
         return {
@@ -84,28 +89,42 @@ def tableInfo(path_str:str):
     ret['info'] = cat_row.info
 
     if cat_row.is_table:
-        tabledata = dbCat.getCategoryNumberInfo(path,start,count)
-        ret['table'] = [
-            (
-                index,
-                expr,
-                row_or_value if isinstance(row_or_value,str)
-                    else factorsHtml(factors),
-                None if isinstance(row_or_value,str) else row_or_value.id,
-                True if isinstance(row_or_value,str) else row_or_value.complete
-            )
-            for index,expr,row_or_value,factors in tabledata
-        ]
-        ret['index_range'] = dbCat.findCategoryIndexRange(cat_row.id)
+        cached = getTableRows(cat_row.id,start,count)
+        if cached is not None:
+            ret['table'],ret['index_range'] = cached
+        else:
+            generation = getTableGeneration()
+            tabledata = await dbCatAsync.getCategoryNumberInfo(path,start,
+                                                               count)
+            ret['table'] = [
+                (
+                    index,
+                    expr,
+                    row_or_value if isinstance(row_or_value,str)
+                        else factorsHtml(factors),
+                    None if isinstance(row_or_value,str) else row_or_value.id,
+                    True if isinstance(row_or_value,str)
+                        else row_or_value.complete
+                )
+                for index,expr,row_or_value,factors in tabledata
+            ]
+            ret['index_range'] = \
+                await dbCatAsync.findCategoryIndexRange(cat_row.id)
+            putTableRows(cat_row.id,start,count,
+                         ret['table'],ret['index_range'],generation)
 
     else:
-        child_rows = dbCat.listCategory(cat_row.id)
+        child_rows = await dbCatAsync.listCategory(cat_row.id)
         assert child_rows is not None, 'internal error'
 
         child_titles = []
         child_links = []
         child_is_table = []
-        child_index_ranges = []
+        child_stats = []
+
+        # stats of all the child tables in one lookup
+        stats = await dbCatAsync.getCategoryStatsMany(
+            child_row.id for child_row in child_rows if child_row.is_table)
 
         for child_row in child_rows:
             child_titles.append(child_row.name if child_row.title == ''
@@ -115,11 +134,10 @@ def tableInfo(path_str:str):
             else:
                 child_links.append(f'/tables/{path_str}/{child_row.name}')
             child_is_table.append(child_row.is_table)
-            child_index_ranges.append(
-                dbCat.findCategoryIndexRange(child_row.id))
+            child_stats.append(stats.get(child_row.id))
 
         ret['children'] = zip(child_titles,child_links,
-                              child_is_table,child_index_ranges)
+                              child_is_table,child_stats)
         ret['children_len'] = len(child_rows)
         children_names = [cr.name for cr in child_rows]
         ret['children_names'] = children_names
@@ -145,7 +163,7 @@ async def tablesGet(path:str):
     return await quart.render_template('tables.jinja',
                                        page='tables',
                                        **basePageData(),
-                                       **tableInfo(path))
+                                       **(await tableInfo(path)))
 
 #==============
 # post requests
@@ -288,7 +306,7 @@ async def tablesPost(path:str):
     page_args = dict()
 
     # logged in as admin so actions are safe to perform from here
-    table_info = tableInfo(path)
+    table_info = await tableInfo(path)
     if table_info['exists']:
         cat_rows = table_info['cat_rows']
         assert isinstance(cat_rows,list), 'internal error'
@@ -341,5 +359,5 @@ async def tablesPost(path:str):
         await quart.render_template('tables.jinja',page='tables',
                                     post_ok=ok,post_msg=msg,
                                     **basePageData(),
-                                    **tableInfo(path),**page_args),
+                                    **(await tableInfo(path)),**page_args),
                                     code)
@@ -0,0 +1,89 @@
+'''
+least recently used cache with a size limit and optional expiration
+'''
+
+from collections import OrderedDict
+import threading
+import time
+from typing import Any, Callable, Hashable
+
+class LruCache:
+    '''
+    thread safe lru cache mapping keys to values
+    each entry has a size (provided on insert), total is kept <= max_size
+    entries older than ttl seconds are dropped on lookup (none = no expiry)
+    on_evict(key) is called for every entry removed from the cache
+    '''
+
+    def __init__(self,max_size:int,ttl:float|None=None,
+                 on_evict:Callable[[Hashable],None]|None=None):
+        assert max_size >= 0
+        assert ttl is None or ttl > 0
+        self.max_size = max_size
+        self.ttl = ttl
+        self.on_evict = on_evict
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        # key -> (value,size,insert time)
+        self._data: OrderedDict[Hashable,tuple[Any,int,float]] = OrderedDict()
+        self._lock = threading.RLock()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def _remove(self,key:Hashable,/):
+        # remove an entry (must hold lock)
+        _,size,_ = self._data.pop(key)
+        self.size -= size
+        if self.on_evict is not None:
+            self.on_evict(key)
+
+    def get(self,key:Hashable,default=None,/):
+        '''
+        lookup a value, marking it as recently used
+        '''
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None and self.ttl is not None \
+                    and time.monotonic() - entry[2] > self.ttl:
+                self._remove(key)
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return default
+            self._data.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self,key:Hashable,value,size:int=1,/):
+        '''
+        insert or replace a value, evicting least recently used entries
+        values larger than the whole cache are not stored
+        '''
+        assert size >= 0
+        with self._lock:
+            if key in self._data:
+                self._remove(key)
+            if size > self.max_size:
+                return
+            while self.size + size > self.max_size:
+                self._remove(next(iter(self._data)))
+            self._data[key] = (value,size,time.monotonic())
+            self.size += size
+
+    def remove(self,key:Hashable,/):
+        '''
+        remove a value if it is stored
+        '''
+        with self._lock:
+            if key in self._data:
+                self._remove(key)
+
+    def clear(self):
+        '''
+        remove all values
+        '''
+        with self._lock:
+            for key in list(self._data):
+                self._remove(key)
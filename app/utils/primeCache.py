@@ -0,0 +1,133 @@
+'''
+memoized primality test results
+- results are keyed by (test,sha256 digest of the value) so memory use does
+  not depend on the size of the numbers tested
+- least recently used results are dropped above PRIME_CACHE_SIZE entries
+- if PRIME_CACHE_FILE is set, results are also saved in a sqlite3 file and
+  found there after restarting (only by the process that opened it, forked
+  workers use the memory copy only)
+- values below 2**64 are not cached since testing them is cheaper
+'''
+
+import hashlib
+import os
+import sqlite3
+import threading
+
+from app.config import \
+    PRIME_CACHE_SIZE, \
+    PRIME_CACHE_FILE
+
+from app.utils.lruCache import LruCache
+from app.utils.primeTest import prpTest, primeTest
+
+# smaller values are tested every time
+_MIN_BITS = 65
+
+_CACHE = LruCache(PRIME_CACHE_SIZE)
+
+_DB: sqlite3.Connection|None = None
+_DB_PID: int|None = None # process that opened _DB
+_DB_LOCK = threading.Lock()
+
+def _digest(n:int,/) -> bytes:
+    # hash of the integer bytes (big endian)
+    return hashlib.sha256(n.to_bytes((n.bit_length()+7)//8,'big')).digest()
+
+def _getDb() -> sqlite3.Connection|None:
+    # sqlite3 connection for persistent results (must hold _DB_LOCK)
+    global _DB, _DB_PID
+    if PRIME_CACHE_FILE is None:
+        return None
+    if _DB_PID is not None and _DB_PID != os.getpid():
+        return None # forked from the process using the file
+    if _DB is None:
+        _DB = sqlite3.connect(PRIME_CACHE_FILE,isolation_level=None,
+                              check_same_thread=False)
+        _DB.execute("create table if not exists results ("
+                    "digest blob not null, test text not null, "
+                    "result integer not null, primary key (digest,test));")
+        _DB_PID = os.getpid()
+    return _DB
+
+def getCachedResult(test:str,n:int,/) -> None|bool:
+    '''
+    stored result of a test ('prime' or 'prp<k>') on n, none if unknown
+    '''
+    if n.bit_length() < _MIN_BITS or PRIME_CACHE_SIZE == 0:
+        return None
+    key = (test,_digest(n))
+    ret = _CACHE.get(key)
+    if ret is not None:
+        return ret
+    with _DB_LOCK:
+        db = _getDb()
+        if db is None:
+            return None
+        row = db.execute("select result from results "
+                         "where digest = ? and test = ?;",
+                         (key[1],test)).fetchone()
+    if row is None:
+        return None
+    _CACHE.put(key,bool(row[0]))
+    return bool(row[0])
+
+def putCachedResult(test:str,n:int,result:bool,/):
+    '''
+    store the result of a test on n
+    '''
+    if n.bit_length() < _MIN_BITS or PRIME_CACHE_SIZE == 0:
+        return
+    key = (test,_digest(n))
+    _CACHE.put(key,result)
+    with _DB_LOCK:
+        db = _getDb()
+        if db is not None:
+            db.execute("insert or replace into results (digest,test,result) "
+                       "values (?,?,?);",(key[1],test,int(result)))
+
+def lookupPrpTest(n:int,k:int=0,/) -> None|bool:
+    '''
+    known result of prpTest(n,k), none if it has to be run
+    (a proven result from primeTest() is also used)
+    '''
+    ret = getCachedResult('prime',n)
+    if ret is None:
+        ret = getCachedResult(f'prp{k}',n)
+    return ret
+
+def lookupPrimeTest(n:int,/) -> None|bool:
+    '''
+    known result of primeTest(n), none if it has to be run
+    (a composite result from prpTest() is also used)
+    '''
+    ret = getCachedResult('prime',n)
+    if ret is None and getCachedResult('prp0',n) is False:
+        ret = False
+    return ret
+
+def prpTestCached(n:int,k:int=0,/) -> bool:
+    '''
+    prpTest() with memoized results
+    '''
+    ret = lookupPrpTest(n,k)
+    if ret is None:
+        ret = prpTest(n,k)
+        putCachedResult(f'prp{k}',n,ret)
+    return ret
+
+def primeTestCached(n:int,/) -> bool:
+    '''
+    primeTest() with memoized results
+    '''
+    ret = lookupPrimeTest(n)
+    if ret is None:
+        ret = primeTest(n)
+        putCachedResult('prime',n,ret)
+    return ret
+
+def clearPrimeCache():
+    '''
+    remove results kept in memory (the file is not changed)
+    '''
+    _CACHE.clear()
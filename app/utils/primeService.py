@@ -0,0 +1,151 @@
+'''
+runs primality tests in a pool of worker processes
+- tests return futures so several can run in parallel across cores
+- the pool is forked by startPrimeService() before the process has other
+  threads (forking a multithreaded process can deadlock in the children),
+  main.py and the scripts using it call it at startup
+- otherwise it is started on first use if no other threads exist yet, and
+  tests run in the calling thread if they do
+- with PRIME_WORKERS == 0 tests run in the calling thread
+- results are looked up in and saved to primeCache by the calling process
+'''
+
+from concurrent.futures import \
+    Future, \
+    ProcessPoolExecutor
+import multiprocessing
+import sys
+import threading
+from typing import Callable, Iterable
+
+from app.config import \
+    PRIME_WORKERS, \
+    PRP_BIT_LIM, \
+    PROVE_BIT_LIM
+from app.database.constants import Primality
+from app.utils.primeCache import \
+    lookupPrpTest, \
+    lookupPrimeTest, \
+    putCachedResult
+from app.utils.primeTest import prpTest, primeTest
+
+# values this small are tested inline (cheaper than sending to a process)
+_INLINE_BITS = 64
+
+_EXECUTOR: ProcessPoolExecutor|None = None
+_EXECUTOR_LOCK = threading.Lock()
+
+def _startExecutor() -> ProcessPoolExecutor|None:
+    # fork all worker processes now (must hold _EXECUTOR_LOCK)
+    # none if other threads exist since their locks could be held in the
+    # children (forkserver/spawn would rerun scripts without a __main__ check)
+    if threading.active_count() > 1:
+        return None
+    executor = ProcessPoolExecutor(PRIME_WORKERS,
+                                   multiprocessing.get_context('fork'))
+    # with fork the first submit starts all the workers at once, before the
+    # executor starts its management thread
+    executor.submit(int).result()
+    return executor
+
+def _getExecutor() -> ProcessPoolExecutor|None:
+    # process pool, none if disabled or it cannot be started safely
+    global _EXECUTOR
+    if PRIME_WORKERS == 0:
+        return None
+    with _EXECUTOR_LOCK:
+        if _EXECUTOR is None:
+            _EXECUTOR = _startExecutor()
+        return _EXECUTOR
+
+def startPrimeService():
+    '''
+    start the worker processes, call at startup before any threads are
+    created (logging, connection pools, web server) so tests run in parallel
+    '''
+    if _getExecutor() is None and PRIME_WORKERS != 0:
+        sys.stderr.write('warning: prime test workers not started '
+                         '(other threads exist), tests run inline\n')
+
+def _doneFuture(result,/) -> Future:
+    # future that already has its result
+    future: Future = Future()
+    future.set_result(result)
+    return future
+
+def _submit(test:str,func:Callable,n:int,*args) -> Future:
+    # run func(n,*args) in the pool, or inline for small values
+    # the result is saved in the cache under the test name
+    executor = None if n.bit_length() <= _INLINE_BITS else _getExecutor()
+    if executor is None:
+        future: Future = Future()
+        try:
+            future.set_result(func(n,*args))
+        except Exception as e:
+            future.set_exception(e)
+    else:
+        future = executor.submit(func,n,*args)
+    future.add_done_callback(lambda f: f.cancelled() or f.exception()
+                             or putCachedResult(test,n,f.result()))
+    return future
+
+def _mapFuture(future:Future,func:Callable,/) -> Future:
+    # future for func(result of future)
+    ret: Future = Future()
+    def callback(f:Future):
+        try:
+            ret.set_result(func(f.result()))
+        except BaseException as e:
+            ret.set_exception(e)
+    future.add_done_callback(callback)
+    return ret
+
+def submitPrpTest(n:int,k:int=0,/) -> Future[bool]:
+    '''
+    run prpTest(n,k) in the process pool
+    '''
+    known = lookupPrpTest(n,k)
+    if known is not None:
+        return _doneFuture(known)
+    return _submit(f'prp{k}',prpTest,n,k)
+
+def submitPrimeTest(n:int,/) -> Future[bool]:
+    '''
+    run primeTest(n) in the process pool
+    '''
+    known = lookupPrimeTest(n)
+    if known is not None:
+        return _doneFuture(known)
+    return _submit('prime',primeTest,n)
+
+def submitPrimality(n:int,/) -> Future[int]:
+    '''
+    fdbPrimality(n) with the test run in the process pool
+    '''
+    # same rules as fdbPrimality
+    if n.bit_length() > PRP_BIT_LIM:
+        return _doneFuture(Primality.UNKNOWN)
+    if n.bit_length() <= PROVE_BIT_LIM:
+        return _mapFuture(submitPrimeTest(n),lambda r:
+                          Primality.PRIME if r else Primality.COMPOSITE)
+    return _mapFuture(submitPrpTest(n),lambda r:
+                      Primality.PROBABLE if r else Primality.COMPOSITE)
+
+def fdbPrimalityMany(ns:Iterable[int],/) -> list[int]:
+    '''
+    fdbPrimality() for several values, tested in parallel
+    '''
+    futures = [submitPrimality(n) for n in ns]
+    return [future.result() for future in futures]
+
+def shutdownPrimeService():
+    '''
+    stop the worker processes (tests run inline afterward unless the process
+    has no other threads when they are needed again)
+    '''
+    global _EXECUTOR
+    with _EXECUTOR_LOCK:
+        executor = _EXECUTOR
+        _EXECUTOR = None
+    if executor is not None:
+        executor.shutdown(cancel_futures=True)
@@ -1,4 +1,5 @@
 import quart
+from quart.utils import run_sync
 
 import app.database.users as dbUsers
 
@@ -28,3 +29,21 @@ def getUser(user:str|int|None = None) -> dbUsers.UserRow|None:
             return None
         return dbUsers.getUser(session.user_id)
     return dbUsers.getUser(user)
+
+async def getApiUser() -> dbUsers.UserRow|None:
+    '''
+    returns the user for the api key in the X-Api-Key header (hex)
+    none if missing, invalid, or the user is disabled
+    '''
+    key = quart.request.headers.get('X-Api-Key')
+    if key is None:
+        return None
+    try:
+        key_bytes = bytes.fromhex(key)
+    except:
+        return None # invalid key format
+    # lookup in a thread so the event loop is not blocked
+    user = await run_sync(dbUsers.findApiKey)(key_bytes)
+    if user is None or user.is_disabled:
+        return None
+    return user
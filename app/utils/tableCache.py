@@ -0,0 +1,122 @@
+'''
+cache for rendered factor table pages
+
+entries are keyed by (category id, start, count) and store the rows built by
+tableInfo() for the tables template along with the category index range
+the database functions that change numbers or sequences invalidate entries
+containing the affected number ids or category ids
+
+the cache is per process, changes made by other processes (such as the admin
+scripts or other hypercorn workers) are only seen after TABLE_CACHE_TTL
+'''
+
+import sys
+import threading
+from typing import Hashable, Iterable
+
+from app.config import \
+    TABLE_CACHE_SIZE, \
+    TABLE_CACHE_TTL
+
+from app.utils.lruCache import LruCache
+
+# (index,expr,value or factors html,number id,complete)
+TableRow = tuple[int,str,str,int|None,bool]
+
+_TableKey = tuple[int,int,int]
+
+# lookup of cache keys from the number ids and category ids they contain
+_KEYS_BY_NUMBER: dict[int,set[_TableKey]] = {}
+_KEYS_BY_CATEGORY: dict[int,set[_TableKey]] = {}
+_NUMBERS_BY_KEY: dict[_TableKey,list[int]] = {}
+_LOCK = threading.RLock()
+
+# changes on every invalidation so rows read before one are not stored after
+_GENERATION = 0
+
+def _onEvict(key:Hashable,/):
+    # remove references to an entry leaving the cache (holding _LOCK)
+    assert isinstance(key,tuple)
+    for num_id in _NUMBERS_BY_KEY.pop(key,[]):
+        keys = _KEYS_BY_NUMBER.get(num_id)
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del _KEYS_BY_NUMBER[num_id]
+    keys = _KEYS_BY_CATEGORY.get(key[0])
+    if keys is not None:
+        keys.discard(key)
+        if not keys:
+            del _KEYS_BY_CATEGORY[key[0]]
+
+_CACHE = LruCache(TABLE_CACHE_SIZE,TABLE_CACHE_TTL,_onEvict)
+
+def _rowsSize(rows:list[TableRow],/) -> int:
+    # approximate memory used by the rows of an entry
+    return sum(200 + sys.getsizeof(expr) + sys.getsizeof(html)
+               for _,expr,html,_,_ in rows)
+
+def getTableRows(cat_id:int,start:int,count:int,/) \
+        -> None|tuple[list[TableRow],None|tuple[int,int]]:
+    '''
+    cached (rows,index_range) for a table page, none if not cached
+    '''
+    with _LOCK:
+        return _CACHE.get((cat_id,start,count))
+
+def getTableGeneration() -> int:
+    '''
+    current generation, read before querying the rows for putTableRows
+    '''
+    with _LOCK:
+        return _GENERATION
+
+def putTableRows(cat_id:int,start:int,count:int,rows:list[TableRow],
+                 index_range:None|tuple[int,int],generation:int,/):
+    '''
+    store the rows and index range for a table page
+    (not stored if anything was invalidated since generation was read)
+    '''
+    key = (cat_id,start,count)
+    size = _rowsSize(rows)
+    if size > TABLE_CACHE_SIZE: # also when cache is disabled
+        return
+    num_ids = [num_id for _,_,_,num_id,_ in rows if num_id is not None]
+    with _LOCK:
+        if generation != _GENERATION:
+            return
+        _CACHE.put(key,(rows,index_range),size)
+        _NUMBERS_BY_KEY[key] = num_ids
+        for num_id in num_ids:
+            _KEYS_BY_NUMBER.setdefault(num_id,set()).add(key)
+        _KEYS_BY_CATEGORY.setdefault(cat_id,set()).add(key)
+
+def invalidateTableNumbers(num_ids:Iterable[int],/):
+    '''
+    remove cached table pages that contain any of the numbers
+    '''
+    global _GENERATION
+    with _LOCK:
+        _GENERATION += 1
+        for num_id in num_ids:
+            for key in list(_KEYS_BY_NUMBER.get(num_id,())):
+                _CACHE.remove(key)
+
+def invalidateTableCategory(cat_id:int,/):
+    '''
+    remove cached table pages for a category
+    '''
+    global _GENERATION
+    with _LOCK:
+        _GENERATION += 1
+        for key in list(_KEYS_BY_CATEGORY.get(cat_id,())):
+            _CACHE.remove(key)
+
+def clearTableCache():
+    '''
+    remove all cached table pages
+    '''
+    global _GENERATION
+    with _LOCK:
+        _GENERATION += 1
+        _CACHE.clear()
@@ -0,0 +1,100 @@
+'''
+batch trial division for numbers being added to the database
+- primes below TDIV_BOUND are multiplied in a product tree (built once)
+- the product is reduced modulo many numbers at once with a remainder tree,
+  so gcd(number,product) gives the small primes dividing each number
+- only the primes found are then located by going down the prime tree
+'''
+
+import gmpy2
+import threading
+from typing import Iterable
+
+from app.config import TDIV_BOUND
+
+def _productTree(values:list,/) -> list[list]:
+    # levels of products, first is the values and last is the full product
+    tree = [values]
+    while len(tree[-1]) > 1:
+        level = tree[-1]
+        tree.append([level[i]*level[i+1] for i in range(0,len(level)-1,2)]
+                    + ([level[-1]] if len(level) % 2 else []))
+    return tree
+
+def _primesBelow(n:int,/) -> list[int]:
+    # sieve of eratosthenes
+    if n < 3:
+        return []
+    sieve = bytearray([1])*n
+    sieve[0] = sieve[1] = 0
+    for p in range(2,int(n**0.5)+1):
+        if sieve[p]:
+            sieve[p*p::p] = bytes(len(range(p*p,n,p)))
+    return [p for p in range(n) if sieve[p]]
+
+_PRIME_TREE: list[list]|None = None
+_PRIME_TREE_LOCK = threading.Lock()
+
+def _getPrimeTree() -> list[list]:
+    # product tree of primes below TDIV_BOUND (built when first needed)
+    global _PRIME_TREE
+    with _PRIME_TREE_LOCK:
+        if _PRIME_TREE is None:
+            _PRIME_TREE = _productTree(
+                [gmpy2.mpz(p) for p in _primesBelow(TDIV_BOUND)]) # type:ignore
+        return _PRIME_TREE
+
+def _primesDividing(g,tree:list[list],/) -> list[int]:
+    # primes in the tree dividing g (g is a product of distinct tree primes)
+    ret: list[int] = []
+    stack = [(len(tree)-1,0)]
+    while stack:
+        level,i = stack.pop()
+        if gmpy2.gcd(g,tree[level][i]) == 1: # type:ignore
+            continue
+        if level == 0:
+            ret.append(int(tree[0][i]))
+            continue
+        for j in (2*i,2*i+1):
+            if j < len(tree[level-1]):
+                stack.append((level-1,j))
+    return sorted(ret)
+
+def smallFactorsMany(ns:Iterable[int],/) -> list[tuple[list[int],int]]:
+    '''
+    trial division by primes below TDIV_BOUND for several numbers at once
+    returns (prime factors with multiplicity,cofactor) for each number
+    '''
+    ns = list(ns)
+    assert all(n > 0 for n in ns)
+    if TDIV_BOUND == 0 or ns == []:
+        return [([],n) for n in ns]
+    primes = _getPrimeTree()
+    if primes[-1] == []:
+        return [([],n) for n in ns]
+    prod = primes[-1][0]
+
+    # product modulo each number going down the tree of numbers
+    tree = _productTree([gmpy2.mpz(n) for n in ns]) # type:ignore
+    rems = [prod % tree[-1][0]]
+    for level in reversed(tree[:-1]):
+        rems = [rems[i//2] % x for i,x in enumerate(level)]
+
+    ret: list[tuple[list[int],int]] = []
+    for n,rem in zip(ns,rems):
+        g = gmpy2.gcd(n,rem) # type:ignore
+        fs: list[int] = []
+        if g > 1:
+            for p in _primesDividing(g,primes):
+                while n % p == 0:
+                    fs.append(p)
+                    n //= p
+        ret.append((fs,n))
+    return ret
+
+def smallFactors(n:int,/) -> tuple[list[int],int]:
+    '''
+    trial division by primes below TDIV_BOUND
+    returns (prime factors with multiplicity,cofactor)
+    '''
+    return smallFactorsMany((n,))[0]
@@ -43,6 +43,9 @@ create table factors
 create index factors_f1id_index on factors(f1_id);
 create index factors_f2id_index on factors(f2_id);
 create index factors_value_len on factors(length(value));
+-- smallest incomplete factors by primality (in numerical order)
+create index factors_incomplete_index on factors(primality,length(value),value)
+    where f1_id is null;
 
 -- starting numbers to factor (the nicely chosen ones)
 create table numbers
@@ -56,6 +59,11 @@ create table numbers
     cof_id bigint default null,
     -- is factorization complete
     complete boolean default false not null,
+    -- denormalized factorization kept in sync by the application
+    -- json list of [hex value,primality,factor id or null] sorted by value
+    summary jsonb default null,
+    -- log(prime or probable prime part) / log(value)
+    progress double precision default null,
     constraint check_value check (
         length(value) > 0 and substr(value,1,1) <> '\x00'::bytea),
     constraint check_spf2 check (spf2 = null or length(spf2) % 2 = 0),
@@ -82,6 +90,32 @@ create index factors_old_f0_index on factors_old(fac_id);
 create index factors_old_f1_index on factors_old(f1_id);
 create index factors_old_f2_index on factors_old(f2_id);
 
+-- ecm curves run on a factor for each B1 value
+-- cofactors inherit the curves of factors they divide when split
+create table ecm_effort
+(
+    fac_id bigint not null,
+    b1 bigint not null,
+    curves bigint not null,
+    unique (fac_id,b1),
+    constraint check_b1 check (b1 > 0),
+    constraint check_curves check (curves > 0),
+    foreign key (fac_id) references factors(id) on delete cascade
+);
+
+-- append-only log of changes (id is the cursor for syncing)
+-- kind is from ChangeType in app/database/constants.py
+-- no foreign keys so entries remain after deletions
+create table changes
+(
+    id bigserial primary key unique not null,
+    kind int not null,
+    fac_id bigint default null,
+    num_id bigint default null,
+    time timestamp default timezone('utc',now()) not null,
+    constraint check_kind check (kind in (0,1,2,3,4))
+);
+
 -- ====================
 -- numbers organization
 -- ====================
@@ -137,6 +171,19 @@ create table sequences
 );
 create index sequences_num_id_index on sequences(num_id);
 
+-- per table statistics kept in sync by the application
+-- (scripts/rebuild_category_stats.py recomputes them)
+-- bit sizes are of values in the numbers table, other values count as complete
+create table category_stats
+(
+    cat_id bigint primary key unique not null,
+    count bigint not null,
+    index_min bigint, index_max bigint,
+    bits_min int, bits_max int,
+    complete bigint not null,
+    foreign key (cat_id) references categories(id) on delete cascade
+);
+
 -- =============
 -- user accounts
 -- =============
@@ -176,6 +223,23 @@ create table sessions
 );
 create index sessions_user_id_index on sessions(user_id);
 
+-- factors reserved by users for work (a lease renewed by heartbeats)
+-- work type is from WorkType in app/database/reservations.py
+create table reservations
+(
+    fac_id bigint not null,
+    user_id bigint not null,
+    work int not null,
+    created timestamp default timezone('utc',now()) not null,
+    expires timestamp not null,
+    unique (fac_id,work),
+    constraint check_work check (work in (0,1,2)),
+    foreign key (fac_id) references factors(id) on delete cascade,
+    foreign key (user_id) references users(id) on delete cascade
+);
+create index reservations_user_id_index on reservations(user_id);
+create index reservations_expires_index on reservations(expires);
+
 -- ==================
 -- factor submissions
 -- ==================
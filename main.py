@@ -1,8 +1,14 @@
 import quart
 import sys
 
-from app.database.connectionPool import closeDatabaseConnections
+from app.database.connectionPool import \
+    openDatabaseConnections, \
+    closeDatabaseConnections
+from app.database.asyncConnectionPool import closeAsyncDatabaseConnections
 from app.database.logging import closeLogging
+from app.utils.primeService import \
+    startPrimeService, \
+    shutdownPrimeService
 
 from app.pages.account import bp as bpAccount
 from app.pages.api import bp as bpApi
@@ -30,11 +36,18 @@ app.register_blueprint(bpNumber)
 app.register_blueprint(bpRoot)
 app.register_blueprint(bpTables)
 
+@app.before_serving
+async def dbcon_open():
+    startPrimeService() # before the connection pools start threads
+    openDatabaseConnections()
+
 @app.after_serving
 async def dbcon_close():
     sys.stderr.write('closing database stuff\n')
+    shutdownPrimeService()
+    closeLogging() # writes remaining log messages first
     closeDatabaseConnections()
-    closeLogging()
+    await closeAsyncDatabaseConnections()
 
 # for development
 if __name__ == '__main__':
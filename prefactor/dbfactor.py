@@ -6,11 +6,13 @@ modify as needed for various sequences, below is an example
 '''
 
 import json
+import os
 import sys
 
 import gmpy2
 
-from factoring import prefactor_runner
+from factoring import prefactor_many
+from ecmplan import EcmPlanner
 from expreval import expreval
 
 import bases
@@ -22,8 +24,18 @@ sys.set_int_max_str_digits(0)
 # factoring parameters
 lim_tdiv = 10**5
 lim_prho = 10**5
-ecm_b1_curves = ((2000,2000),(10000,1000),(50000,500),(250000,250))
+# ecm up to a t-level (or fixed ((b1,curves),...) run in order on cofactors)
+# run ecmplan.py once to calibrate the curve times on this machine
+ecm_b1_curves = EcmPlanner(30)
 ecm_threads = 0
+# skip ecm curves already recorded in the database for stored numbers
+# (needs config.json and the database, one query per index)
+ecm_effort_from_db = False
+
+# numbers factored at the same time (0 for one per core, they share the cores)
+# with ordered = False results are written as they finish (tagged by index)
+jobs = 0
+ordered = True
 
 # ==============================================================================
 # modify the following section as necessary
@@ -60,11 +72,54 @@ def value(n:int,/) -> int:
 
 # ==============================================================================
 
-for n in range(index_beg,index_end):
-    if not dry_run:
-        sys.stderr.write(f'\n\033[94mFACTORING INDEX {n}\033[0m\n')
-
-    v = value(n)
+def numbers(indexes):
+    # ((index,value),value) for prefactor_many, values computed once and the
+    # recorded ecm effort loaded as they are submitted
+    # (continues without it if the database cannot be used)
+    get_effort = None
+    if ecm_effort_from_db:
+        try:
+            sys.path.append(f'{os.path.dirname(__file__)}/..')
+            from app.database.numbers import getNumberEcmEffort
+            get_effort = getNumberEcmEffort
+        except Exception as e:
+            sys.stderr.write(f'\033[33mnot using recorded ecm effort: '
+                             f'{e}\033[0m\n')
+    for n in indexes:
+        v = value(n)
+        if get_effort is not None and v >= 2:
+            try:
+                ecm_known.update(get_effort(v))
+            except Exception as e:
+                sys.stderr.write(f'\033[33mnot using recorded ecm effort: '
+                                 f'{e}\033[0m\n')
+                get_effort = None
+        yield (n,v),v
+
+def factor_results():
+    # ((index,value),factors) with factoring of several indexes running at once
+    # (factors is none for values below 2, passed through in index order)
+    progress_stream = sys.stderr if jobs == 1 else None
+    yield from prefactor_many(numbers(range(index_beg,index_end)),jobs,ordered,
+                              lim_tdiv=lim_tdiv,
+                              lim_prho=lim_prho,
+                              ecm_b1_curves=ecm_b1_curves,
+                              ecm_threads=ecm_threads,
+                              progress_stream=progress_stream,
+                              ecm_effort=ecm_effort,
+                              ecm_known=ecm_known)
+
+# curves run on unfactored cofactors (cofactor -> (b1 -> curves))
+ecm_effort: dict[int,dict[int,int]] = {}
+# curves recorded in the database before (cofactor -> (b1 -> curves))
+ecm_known: dict[int,dict[int,int]] = {}
+
+if dry_run:
+    results = (((n,value(n)),None) for n in range(index_beg,index_end))
+else:
+    results = factor_results()
+
+for (n,v),factors in results:
 
     # number details
     output = {
@@ -76,13 +131,10 @@ for n in range(index_beg,index_end):
 
     # (partial) factorization
     if not dry_run:
-        output['factors'] = None if v < 2 \
-            else prefactor_runner(v,
-                                  lim_tdiv=lim_tdiv,
-                                  lim_prho=lim_prho,
-                                  ecm_b1_curves=ecm_b1_curves,
-                                  ecm_threads=ecm_threads,
-                                  progress_stream=sys.stderr)
+        output['factors'] = factors
+        # [cofactor,b1,curves] for recording the ecm effort
+        output['ecm'] = [[f,b1,curves] for f,p,_ in factors or [] if not p
+                         for b1,curves in ecm_effort.pop(f,{}).items()]
         sys.stderr.write(f'\033[32mCOMPLETED INDEX {n}\033[0m\n')
 
         # check result
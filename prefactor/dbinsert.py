@@ -18,11 +18,69 @@ parser = argparse.ArgumentParser()
 parser.add_argument('-p','--path',help='provide or override table path',type=str)
 parser.add_argument('-d','--dry-run',help='show actions that would be performed',action='store_true')
 parser.add_argument('-i','--input',help='show input json lines',action='store_true')
+parser.add_argument('-b','--bulk',help='insert in chunks with batched queries',action='store_true')
+parser.add_argument('-c','--chunk-size',help='lines per transaction for --bulk',type=int,default=1000)
+parser.add_argument('-r','--resume',help='file storing lines completed for --bulk (skips those)',type=str)
 args = parser.parse_args()
 
+def readRecords(lines):
+    ''' convert json lines to records for bulkIngest '''
+    for line in lines:
+        data = json.loads(line)
+        index = data['index']
+        assert isinstance(index,int)
+        value = data['value']
+        assert isinstance(value,int)
+        expr = data['expr']
+        assert isinstance(expr,str)
+        path = data['path']
+        assert path is None or isinstance(path,str)
+        if args.path:
+            path = args.path
+        if path is not None:
+            path = tuple(p for p in path.split('/') if p)
+        factors = data['factors']
+        assert factors is None or isinstance(factors,list)
+        factor_list = None if factors is None else [f for f,_,_ in factors]
+        ecm_effort.setdefault(value,[]).extend(data.get('ecm',[]))
+        yield (path,index,value,expr,factor_list)
+
+# value -> [cofactor,b1,curves] from the records read, recorded only for
+# numbers the chunk inserted (curves add up, so a repeated line must not)
+ecm_effort: dict[int,list[tuple[int,int,int]]] = {}
+
+if args.bulk and not args.dry_run:
+    from app.database.ingest import bulkIngest
+    from app.database.numbers import addEcmEffort
+    from app.utils.primeService import startPrimeService
+    startPrimeService()
+
+    done = 0
+    if args.resume and os.path.exists(args.resume):
+        with open(args.resume) as f:
+            done = int(f.read().strip() or '0')
+        print(f'resuming after {done} lines')
+    lines = (line for i,line in enumerate(sys.stdin) if i >= done)
+
+    for progress in bulkIngest(readRecords(lines),args.chunk_size):
+        addEcmEffort(e for value in progress.inserted
+                     for e in ecm_effort.get(value,[]))
+        ecm_effort.clear()
+        if args.resume:
+            with open(args.resume,'w') as f:
+                f.write(f'{done+progress.records}\n')
+        print(f'\033[92mcommitted {done+progress.records} lines, '
+              f'{progress.numbers_added} numbers added '
+              f'({progress.numbers_existing} existing), '
+              f'{progress.sequences_added} category entries added '
+              f'({progress.sequences_existing} existing)\033[0m')
+    exit(0)
+
 if not args.dry_run:
-    from app.database.numbers import addNumber
+    from app.database.numbers import addNumber, addEcmEffort
     from app.database.categories import createCategoryNumber
+    from app.utils.primeService import startPrimeService
+    startPrimeService()
 
 for i,line in enumerate(sys.stdin):
     if args.input:
@@ -48,6 +106,8 @@ for i,line in enumerate(sys.stdin):
             added,nrow = addNumber(value,factor_list)
             if added:
                 print(f'\033[92mindex {i} added to database, number id {nrow.id}\033[0m')
+                # curves add up, so only record them for new numbers
+                addEcmEffort(data.get('ecm',[]))
             else:
                 print(f'\033[93mindex {i} already in database, number id {nrow.id}\033[0m')
         else:
@@ -61,4 +121,4 @@ for i,line in enumerate(sys.stdin):
             except Exception as e:
                 print(f'\033[31mfailed to add to category: {e}\033[0m')
         else:
-            print(f'create /{'/'.join(path)} index {i}')
+            print(f'create /{"/".join(path)} index {i}')
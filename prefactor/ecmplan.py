@@ -0,0 +1,262 @@
+'''
+planning ecm parameters from success probabilities
+
+public interface:
+- expected_curves(b1,digits) curves expected to find a factor of that size
+- ecm_work(effort,digits) fraction of expected curves done (1 reaches t-level)
+- t_level(effort) digits t where ecm_work(effort,t) reaches 1
+- benchmark(bits,b1s) time ecm curves on this machine (for EcmPlanner)
+- EcmPlanner(target) chooses b1 and curves for reaching a target t-level
+
+effort is b1 -> curves run (with the default b2 of GMP-ECM)
+
+probabilities use the dickman rho semismoothness estimate for the curve group
+orders, corrected to match the expected curves table from the GMP-ECM readme
+(the correction is within about 15% for the table rows)
+
+curve time is from benchmark() results saved in ecm_calibration.json (run this
+file to create it), otherwise from a rough estimate
+'''
+
+import functools
+import json
+import math
+import os
+import random
+import re
+import subprocess
+
+import gmpy2
+
+script_dir = os.path.dirname(__file__)
+path_calibration = f'{script_dir}/ecm_calibration.json'
+
+# (digits,b1,default b2,expected curves) from the GMP-ECM readme
+# (the 15 digit row is from older versions of the readme)
+ecm_table = (
+    (15,2000,147396,25),
+    (20,11000,1873422,74),
+    (25,50000,12746592,214),
+    (30,250000,128992510,430),
+    (35,1000000,1045563762,904),
+    (40,3000000,5706890290,2350),
+    (45,11000000,35133391030,4480),
+    (50,43000000,240490660426,7553),
+    (55,110000000,776278396540,17769),
+    (60,260000000,3178559884516,42017),
+    (65,850000000,15892628251516,69408),
+)
+
+# average extra smoothness of the curve group orders (as log)
+ecm_extra_smoothness = 3.134
+
+# ============
+# dickman rho
+# ============
+
+_rho_step = 0.01
+_rho_max = 40
+
+def _rho_table() -> list[float]:
+    # u*rho(u) is the integral of rho over [u-1,u] (trapezoid rule), this
+    # keeps the relative error small unlike integrating rho'(u)=-rho(u-1)/u
+    h = _rho_step
+    n1 = round(1/h)
+    rho = [1.0]*(round(_rho_max/h)+2)
+    s = sum(rho[1:n1]) # interior points of the interval
+    for i in range(n1+1,len(rho)):
+        u = i*h
+        s += rho[i-1] - rho[i-n1]
+        rho[i] = h*(0.5*rho[i-n1]+s) / (u-0.5*h)
+    return rho
+
+_rho = _rho_table()
+
+def _dickman_rho(u:float,/) -> float:
+    # probability that a random x has no prime factors above x**(1/u)
+    if u <= 1:
+        return 1.0
+    if u >= _rho_max:
+        return 0.0
+    i = int(u/_rho_step)
+    f = u/_rho_step - i
+    return _rho[i]*(1-f) + _rho[i+1]*f
+
+def _semismooth(ln_n:float,b1:float,b2:float,/) -> float:
+    # probability that all prime factors are below b1 except one below b2
+    u = ln_n/math.log(b1)
+    t1 = math.log(b1)/ln_n
+    t2 = min(1.0,math.log(b2)/ln_n)
+    if t1 >= 1:
+        return 1.0
+    steps = 200
+    dt = (t2-t1)/steps
+    s = sum(_dickman_rho((1-t)*u)/t
+            for t in (t1+(k+0.5)*dt for k in range(steps)))
+    return min(1.0,_dickman_rho(u) + s*dt)
+
+# =============
+# probabilities
+# =============
+
+def _interpolate(x:float,xs:list[float],ys:list[float],/) -> float:
+    # piecewise linear, extended from the end segments
+    i = 1
+    while i < len(xs)-1 and xs[i] < x:
+        i += 1
+    return ys[i-1] + (ys[i]-ys[i-1])*(x-xs[i-1])/(xs[i]-xs[i-1])
+
+def _default_b2(b1:int,/) -> float:
+    # GMP-ECM default b2 (log-log interpolation of the table)
+    return math.exp(_interpolate(math.log(b1),
+                                 [math.log(row[1]) for row in ecm_table],
+                                 [math.log(row[2]) for row in ecm_table]))
+
+def _estimated_curves(b1:int,digits:float,/) -> float:
+    # expected curves from the semismoothness estimate
+    ln_n = (digits-0.5)*math.log(10) - ecm_extra_smoothness
+    p = _semismooth(ln_n,b1,_default_b2(b1))
+    return 1/p if p > 0 else math.inf
+
+@functools.cache
+def _correction() -> tuple[list[float],list[float]]:
+    # table curves / estimated curves (as log) for each table row
+    return ([row[0] for row in ecm_table],
+            [math.log(row[3]/_estimated_curves(row[1],row[0]))
+             for row in ecm_table])
+
+@functools.lru_cache(maxsize=4096)
+def expected_curves(b1:int,digits:float,/) -> float:
+    ''' expected number of curves to find a factor with given digits '''
+    assert b1 > 1
+    return _estimated_curves(b1,digits) \
+        * math.exp(_interpolate(digits,*_correction()))
+
+def ecm_work(effort:dict[int,int],digits:float,/) -> float:
+    ''' fraction of the expected curves done for factors with given digits
+    (chance of missing such a factor is about exp(-ecm_work)) '''
+    return sum(curves/expected_curves(b1,digits)
+               for b1,curves in effort.items() if curves > 0)
+
+def t_level(effort:dict[int,int],/) -> float:
+    ''' largest digits where ecm_work reaches 1 (0 for no effort) '''
+    lo,hi = 10.0,100.0
+    if ecm_work(effort,lo) < 1:
+        return 0.0
+    while hi-lo > 0.01:
+        mid = (lo+hi)/2
+        if ecm_work(effort,mid) >= 1:
+            lo = mid
+        else:
+            hi = mid
+    return lo
+
+# ===========
+# calibration
+# ===========
+
+def benchmark(bits:tuple[int,...]=(128,256,384,512,768,1024),
+              b1s:tuple[int,...]=(2000,11000,50000,250000,1000000),
+              curves:int=3,
+              progress_stream=None) -> list[tuple[int,int,float]]:
+    '''
+    time ecm curves on random composites with the given sizes
+    returns (bits,b1,seconds per curve)
+    '''
+    from factoring import path_ecm
+    ret: list[tuple[int,int,float]] = []
+    for nbits in bits:
+        # product of 2 primes so ecm is unlikely to stop early
+        n = 1
+        while n.bit_length() != nbits:
+            p = int(gmpy2.next_prime(random.getrandbits(nbits//2))) # type:ignore
+            q = int(gmpy2.next_prime(random.getrandbits(nbits-nbits//2))) # type:ignore
+            n = p*q
+        for b1 in b1s:
+            proc = subprocess.run([path_ecm,'-c',str(curves),str(b1)],
+                                  input=f'{n}\n',capture_output=True,text=True)
+            times = [int(m) for m in re.findall(r'Step [12] took (\d+)ms',
+                                                proc.stdout)]
+            runs = len(re.findall(r'Step 1 took',proc.stdout))
+            if runs == 0:
+                raise RuntimeError(f'ecm benchmark failed for b1={b1}, '
+                                   f'{nbits} bits')
+            ret.append((nbits,b1,sum(times)/1000/runs))
+            if progress_stream:
+                progress_stream.write(f'{nbits} bits b1={b1}: '
+                                      f'{ret[-1][2]:.4f} sec/curve\n')
+    return ret
+
+def load_calibration(path:str=path_calibration,/) \
+        -> list[tuple[int,int,float]]|None:
+    ''' benchmark() results saved as json, None if the file does not exist '''
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        return [(int(b),int(b1),float(s)) for b,b1,s in json.load(f)]
+
+# =======
+# planner
+# =======
+
+class EcmPlanner:
+    '''
+    chooses ecm parameters for reaching a target t-level with least time
+    each level up to the target (table digits, smaller first since a factor
+    found early stops the search) gets the b1 with least expected time for
+    that level and enough curves to complete it, after counting prior effort
+    '''
+
+    def __init__(self,target:float,
+                 calibration:list[tuple[int,int,float]]|None=None,
+                 b1s:tuple[int,...]=tuple(row[1] for row in ecm_table)):
+        assert target > 0
+        assert len(b1s) > 0
+        self.target = target
+        self.calibration = load_calibration() if calibration is None \
+            else calibration
+        self.b1s = b1s
+
+    def curve_time(self,b1:int,bits:int,/) -> float:
+        ''' estimated seconds for one curve '''
+        bits = max(bits,64)
+        if not self.calibration:
+            # rough estimate from GMP-ECM on 100 digit numbers
+            return 1.4e-6 * b1 * (bits/330)**1.6
+        # nearest measurement, scaled linearly in b1 and to the power of 1.6
+        # in bits (close to the cost of multiplication for these sizes)
+        mb,mb1,ms = min(self.calibration,
+                        key=lambda c: abs(math.log(c[1]/b1))
+                                      + abs(math.log(c[0]/bits)))
+        return ms * (b1/mb1) * (bits/mb)**1.6
+
+    def plan(self,n:int,done:dict[int,int]|None=None,/) \
+            -> tuple[tuple[int,int],...]:
+        ''' (b1,curves) to run on n given the effort already done on it '''
+        # smallest factor of a composite has at most half the digits
+        target = min(self.target,(len(str(n))+1)//2)
+        bits = n.bit_length()
+        effort = dict(done or {})
+        levels = [row[0] for row in ecm_table if row[0] < target] + [target]
+        ret: list[tuple[int,int]] = []
+        for digits in levels:
+            need = 1 - ecm_work(effort,digits)
+            if need <= 0:
+                continue
+            b1 = min(self.b1s,key=lambda b1: self.curve_time(b1,bits)
+                                             * expected_curves(b1,digits))
+            curves = math.ceil(need*expected_curves(b1,digits))
+            effort[b1] = effort.get(b1,0) + curves
+            if ret and ret[-1][0] == b1:
+                ret[-1] = (b1,ret[-1][1]+curves)
+            else:
+                ret.append((b1,curves))
+        return tuple(ret)
+
+if __name__ == '__main__':
+    import sys
+    data = benchmark(progress_stream=sys.stderr)
+    with open(path_calibration,'w') as f:
+        json.dump(data,f)
+    print(f'saved {len(data)} measurements to {path_calibration}',
+          file=sys.stderr)
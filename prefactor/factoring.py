@@ -8,27 +8,32 @@ requires
 
 1. trial division up to 10^5 (all factors up to 5 digits will be found)
 2. pollard rho for 10^5 iterations (high chance to find factors up to 10 digits)
-3. ecm b1=2000, 2000 curves (very high chance to find smaller factors)
-4. ecm b1=10000, 1000 curves (high chance to find factors up to 20 digits)
-5. ecm b1=50000, 500 curves (moderate chance to find factors up to 25 digits)
+3. ecm up to t-level 25 with b1 and curves chosen by ecmplan.py (expected to
+   find factors up to 25 digits, sizes below that are run first)
 '''
 
 # =======
 # imports
 # =======
 
-import math
+import atexit
+import concurrent.futures
 import multiprocessing
 import os
+import queue
 import random
 import re
 import select
 import subprocess
-from time import time,sleep
+import threading
+from time import time
 import sys
+from typing import Generator, Hashable, Iterable
 
 import gmpy2
 
+from ecmplan import EcmPlanner
+
 # =======
 # utility
 # =======
@@ -56,6 +61,154 @@ path_tdiv = f'{script_dir}/tdiv'
 path_prho = f'{script_dir}/prho'
 path_ecm = f'{script_dir}/ecm/ecm'
 
+# ===========
+# core budget
+# ===========
+
+class CoreBudget:
+    '''
+    number of cores shared by everything running subprocesses
+    (ecm threads and tdiv/prho requests each hold cores while running)
+    '''
+
+    def __init__(self,total:int=0):
+        if total <= 0:
+            total = multiprocessing.cpu_count()
+        self.total = total
+        self.free = total
+        self.cond = threading.Condition()
+
+    def acquire(self,n:int,/) -> int:
+        '''
+        wait for n cores (at most the total), returns the number acquired
+        '''
+        n = max(1,min(n,self.total))
+        with self.cond:
+            while self.free < n:
+                self.cond.wait()
+            self.free -= n
+        return n
+
+    def release(self,n:int,/):
+        with self.cond:
+            self.free += n
+            assert self.free <= self.total
+            self.cond.notify_all()
+
+core_budget = CoreBudget()
+
+# ============
+# worker pools
+# ============
+
+class Worker:
+    '''
+    long running tdiv/prho process (started without arguments)
+    each request is a line of space separated numbers, the response is the
+    output lines up to an empty line
+    '''
+
+    def __init__(self,path:str):
+        self.path = path
+        self.proc = self._start()
+
+    def _start(self) -> subprocess.Popen:
+        return subprocess.Popen(
+            [self.path],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            text=True,
+            bufsize=1 # line buffered
+        )
+
+    def request(self,*args:int) -> list[str]:
+        '''
+        send a request and return the response lines
+        the process is restarted if it exits (exception for this request)
+        '''
+        assert self.proc.stdin and self.proc.stdout
+        try:
+            self.proc.stdin.write(' '.join(map(str,args))+'\n')
+            self.proc.stdin.flush()
+            ret: list[str] = []
+            while True:
+                line = self.proc.stdout.readline()
+                if not line:
+                    raise EOFError(f'{self.path} exited')
+                if line == '\n':
+                    return ret
+                ret.append(line)
+        except (OSError,EOFError):
+            self.close()
+            self.proc = self._start()
+            raise
+
+    def close(self):
+        if self.proc.poll() is None:
+            self.proc.kill()
+        self.proc.wait()
+
+class WorkerPool:
+    '''
+    fixed number of workers shared between threads
+    workers are started when first needed
+    '''
+
+    def __init__(self,path:str,size:int=0):
+        if size <= 0:
+            size = multiprocessing.cpu_count()
+        self.path = path
+        self.size = size
+        self.started = 0
+        self.idle: queue.Queue[Worker] = queue.Queue()
+        self.lock = threading.Lock()
+
+    def request(self,*args:int) -> list[str]:
+        '''
+        run a request on an idle worker (waits if all are busy)
+        '''
+        worker = None
+        with self.lock:
+            if self.idle.empty() and self.started < self.size:
+                worker = Worker(self.path)
+                # only counted once running (a failed start can be retried)
+                self.started += 1
+        if worker is None:
+            worker = self.idle.get()
+        cores = core_budget.acquire(1)
+        try:
+            return worker.request(*args)
+        finally:
+            core_budget.release(cores)
+            self.idle.put(worker)
+
+    def close(self):
+        with self.lock:
+            while not self.idle.empty():
+                self.idle.get().close()
+                self.started -= 1
+
+tdiv_pool = WorkerPool(path_tdiv)
+prho_pool = WorkerPool(path_prho)
+
+@atexit.register
+def close_pools():
+    tdiv_pool.close()
+    prho_pool.close()
+
+def tdiv_factors(n:int,lim:int,/) -> list[int]:
+    '''
+    prime factors of n (with multiplicity) up to lim using a tdiv worker
+    '''
+    return [int(line) for line in tdiv_pool.request(lim,n)]
+
+def prho_factor(n:int,iters:int,x0:int,b:int,/) -> int|None:
+    '''
+    run pollard rho on n with a prho worker, none if no factor is found
+    '''
+    lines = prho_pool.request(iters,x0,b,n)
+    return int(lines[0]) if lines else None
+
 # ==========
 # ecm runner
 # ==========
@@ -75,9 +228,87 @@ def ecm_runner(n:int,
                 -> tuple[int,int,int]:
     '''
     manages parallel execution of ecm until a single factor is found
-    TODO does not properly handle unexpected subprocess termination
+    waits until the core budget has the threads available
     returns (factor1,factor2,curves_run)
     '''
+    if threads <= 0:
+        threads = (multiprocessing.cpu_count()+1)//2
+    threads = core_budget.acquire(threads)
+    try:
+        return _ecm_runner(n,curves,b1,b2,threads,maxmem,output,progress_stream)
+    finally:
+        core_budget.release(threads)
+
+class EcmChild:
+    '''
+    one ecm process running curves until it finds a factor or is stopped
+    reads its output with a line buffer (nonblocking reads from epoll)
+    '''
+
+    def __init__(self,cmd:list[str],n:int):
+        self.proc = subprocess.Popen(
+            cmd,
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL
+        )
+        assert self.proc.stdin and self.proc.stdout
+        self.proc.stdin.write(f'{n}\n'.encode())
+        self.proc.stdin.close()
+        self.fd = self.proc.stdout.fileno()
+        os.set_blocking(self.fd,False)
+        self.buffer = b''
+        self.stopped = False # terminated on purpose
+        self.found = False # printed the factor found line
+        self.curve_start: float|None = None # time current curve started
+        self.stage = 0
+        self.b1 = 0
+        self.b2 = 0
+        self.poly = ''
+        self.sigma = ''
+
+    def read_lines(self) -> list[str]|None:
+        '''
+        complete lines available now, none at eof (partial line included)
+        '''
+        try:
+            data = os.read(self.fd,65536)
+        except BlockingIOError:
+            return []
+        if not data:
+            rest = self.buffer
+            self.buffer = b''
+            return None if not rest else [rest.decode()+'\n']
+        self.buffer += data
+        *lines,self.buffer = self.buffer.split(b'\n')
+        return [line.decode()+'\n' for line in lines]
+
+    def stop(self):
+        self.stopped = True
+        if self.proc.poll() is None:
+            self.proc.terminate()
+
+    def close(self):
+        if self.proc.poll() is None:
+            self.proc.terminate()
+        self.proc.wait()
+        assert self.proc.stdout
+        self.proc.stdout.close()
+
+def _ecm_runner(n:int,
+                curves:int,
+                b1:int,
+                b2:int|None=None,
+                threads:int=0,
+                maxmem:int|None=None,
+                output:list[list[str]]|None=None,
+                progress_stream=None) \
+                -> tuple[int,int,int]:
+    '''
+    ecm_runner after the cores are acquired
+    waits on epoll (no polling loop), children which exit without finding a
+    factor are started again (at most max_respawns times in total)
+    '''
     if threads <= 0:
         threads = (multiprocessing.cpu_count()+1)//2
     if debug:
@@ -94,148 +325,141 @@ def ecm_runner(n:int,
     if b2 is not None:
         cmd.append(str(b2))
 
-    # track info for each subprocess
-    procs: list[subprocess.Popen] = []
-    procs_poll = select.epoll(threads)
-    procs_fds = dict() # fdnum -> stream,proc_index
-    last_line: list[str] = []
-    last_stage: list[int] = []
-    last_b1: list[int] = []
-    last_b2: list[int] = []
-    last_poly: list[str] = []
-    last_sigma: list[str] = []
-
-    # initialize
     t_start = time()
-    t_sleep = math.sqrt(b1/threads) * 1e-4
-    for ii in range(threads):
-        procs.append(subprocess.Popen(
-            cmd,
-            stdin=subprocess.PIPE,
-            stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE,
-            text=True,
-            bufsize=1 # line buffered
-        ))
-
-        # stdout polling
-        assert procs[-1].stdout
-        procs_poll.register(procs[-1].stdout,select.EPOLLIN)
-        fd = procs[-1].stdout.fileno()
-        procs_fds[fd] = (procs[-1].stdout,ii)
-
-        # write number to stdin
-        assert procs[-1].stdin
-        procs[-1].stdin.write(str(n))
-        procs[-1].stdin.flush()
-        procs[-1].stdin.close()
-
-        # add list element corresponding to process
+    children: list[EcmChild|None] = [None]*threads
+    poller = select.epoll(threads)
+    fd_index: dict[int,int] = dict() # fdnum -> child index
+    respawns = 0
+    max_respawns = 2*threads
+
+    def start(i:int):
+        child = EcmChild(cmd,n)
+        children[i] = child
+        poller.register(child.fd,select.EPOLLIN)
+        fd_index[child.fd] = i
+
+    for i in range(threads):
+        start(i)
         if output is not None:
             output.append([])
-        last_line.append('')
-        last_stage.append(0)
-        last_b1.append(0)
-        last_b2.append(0)
-        last_poly.append('')
-        last_sigma.append('')
-
-    # monitor output
+
+    started_curves = 0 # curves begun by any child
+    completed_curves = 0 # curves finished (including one finding a factor)
+    curve_times: list[float] = []
     found_factor = None
     found_cofactor = None
     found_index = None
-    completed_curves = 0
-    threads_running = threads
+    found_child: EcmChild|None = None
+
+    def finish_curve(child:EcmChild):
+        # count the current curve of a child as done
+        nonlocal completed_curves
+        if child.curve_start is None:
+            return
+        completed_curves += 1
+        curve_times.append(time()-child.curve_start)
+        child.curve_start = None
+        if progress_stream is not None:
+            progress_stream.write(f'\rrunning ({completed_curves} / {curves}) '
+                                  f'({time()-t_start:.3f} sec, '
+                                  f'{curve_times[-1]:.3f} sec/curve)')
+
     if progress_stream is not None:
         progress_stream.write(f'running (0/{curves}) (0.000sec)')
-    while completed_curves < curves:
-        any_change = False
-        done = False
-
-        # check ready outputs
-        for fdnum,_ in procs_poll.poll(0):
-            stream,i = procs_fds[fdnum]
-
-            any_change = True
-            line: str = stream.readline()
-            if not line: # eof
-                continue
-            last_line[i] += line
-            if not last_line[i].endswith('\n'): # need more from buffer
-                continue
-            line = last_line[i]
-            last_line[i] = ''
-
-            if output:
-                output[i].append(line)
-            if debug:
-                sys.stderr.write(f'{line}\n')
-
-            if line.startswith('Run'): # starting new curve
-                completed_curves += 1
-                if progress_stream is not None:
-                    progress_stream.write(f'\rrunning ({completed_curves} / {curves}) ({time()-t_start:.3f} sec)')
-                if completed_curves + threads_running > curves:
-                    procs[i].terminate()
-                    threads_running -= 1
-                    # TODO this also needs to be decremented on unexpected subprocess termination
-                if completed_curves >= curves:
-                    break
-
-            elif line.startswith('Using'): # parameters
-                match = using_re.match(line)
-                assert match is not None, f'unexpected line: {repr(line)}'
-                s_b1,s_b2,s_poly,s_sigma = match.groups()
-                last_b1[i] = int(s_b1)
-                last_b2[i] = int(s_b2)
-                last_poly[i] = s_poly
-                last_sigma[i] = s_sigma
-
-            elif line.startswith('Step 1'):
-                last_stage[i] = 1
-
-            elif line.startswith('Step 2'):
-                last_stage[i] = 2
-
-            elif line.startswith('****'): # factored
-
-                for line in procs[i].stdout: # type:ignore
-                    if line == '\n' or line.startswith('APR'):
-                        continue # skip APR primality test lines
-
-                    if output:
+    try:
+        # (a child that found a factor is read until it exits)
+        while found_index is None \
+                and any(child is not None for child in children) \
+                and (completed_curves < curves
+                     or any(child is not None and child.found
+                            for child in children)):
+            for fdnum,_ in poller.poll():
+                i = fd_index[fdnum]
+                child = children[i]
+                assert child is not None
+                lines = child.read_lines()
+
+                for line in lines or []:
+                    if output is not None:
                         output[i].append(line)
                     if debug:
-                        print(line)
-                    m1 = factor_re.match(line)
-                    m2 = cofactor_re.match(line)
-
-                    if m1:
-                        status,value = m1.groups()
-                        found_factor = (int(value), status != 'composite')
-                        found_index = i
-                    if m2:
-                        status,value = m2.groups()
-                        found_cofactor = (int(value), status != 'Composite')
-                        found_index = i
-
-                completed_curves += 1
-                if isinstance(found_index,int):
-                    done = True
+                        sys.stderr.write(line)
+
+                    if line.startswith('Using'): # parameters, new curve
+                        finish_curve(child) # (if step 2 was not reported)
+                        match = using_re.match(line)
+                        assert match is not None, f'unexpected line: {repr(line)}'
+                        s_b1,s_b2,s_poly,s_sigma = match.groups()
+                        child.b1 = int(s_b1)
+                        child.b2 = int(s_b2)
+                        child.poly = s_poly
+                        child.sigma = s_sigma
+                        child.stage = 0
+                        if started_curves >= curves and not child.found:
+                            child.stop() # enough curves running
+                        else:
+                            started_curves += 1
+                            child.curve_start = time()
+
+                    elif line.startswith('Step 1'):
+                        child.stage = 1
+
+                    elif line.startswith('Step 2'):
+                        child.stage = 2
+                        finish_curve(child)
+
+                    elif line.startswith('****'): # factored
+                        child.found = True
+                        finish_curve(child)
+
+                    elif child.found:
+                        m1 = factor_re.match(line)
+                        m2 = cofactor_re.match(line)
+                        if m1:
+                            status,value = m1.groups()
+                            found_factor = (int(value), status != 'composite')
+                        if m2:
+                            status,value = m2.groups()
+                            found_cofactor = (int(value), status != 'Composite')
+
+                if lines is not None:
+                    continue
+
+                # eof, child exited
+                poller.unregister(fdnum)
+                del fd_index[fdnum]
+                child.close()
+                children[i] = None
+                if child.found:
+                    # factor lines are complete once the child exits
+                    found_index = i
+                    found_child = child
                     break
-
-        if done:
-            break
-
-        if not any_change:
-            sleep(t_sleep)
-
-    for proc in procs:
-        proc.terminate()
+                if not child.stopped and child.curve_start is not None:
+                    started_curves -= 1 # curve cut short, run it again
+                if not child.stopped and completed_curves < curves:
+                    if respawns >= max_respawns:
+                        raise RuntimeError(f'ecm exited with code '
+                                           f'{child.proc.returncode} '
+                                           f'{respawns} times')
+                    respawns += 1
+                    if progress_stream is not None:
+                        progress_stream.write(f'\necm exited with code '
+                                              f'{child.proc.returncode}, '
+                                              f'restarting\n')
+                    start(i)
+    finally:
+        for child in children:
+            if child is not None:
+                child.close()
+        poller.close()
 
     t_finish = time()
     if progress_stream is not None:
-        progress_stream.write(f'\rcompleted {completed_curves} curves in {t_finish-t_start:.3f} sec\n')
+        progress_stream.write(f'\rcompleted {completed_curves} curves in {t_finish-t_start:.3f} sec')
+        if curve_times:
+            progress_stream.write(f' ({sum(curve_times)/len(curve_times):.3f} sec/curve)')
+        progress_stream.write('\n')
 
     if found_index is None:
         return (0,0,completed_curves)
@@ -244,9 +468,10 @@ def ecm_runner(n:int,
     assert found_cofactor is not None
     fflen = len(str(found_factor[0]))
 
-    i = found_index
+    child = found_child
+    assert child is not None
     if progress_stream is not None:
-        progress_stream.write(f'stage={last_stage[i]},b1={last_b1[i]},b2={last_b2[i]},poly={last_poly[i]},sigma={last_sigma[i]}\n')
+        progress_stream.write(f'stage={child.stage},b1={child.b1},b2={child.b2},poly={child.poly},sigma={child.sigma}\n')
         progress_stream.write(f'factor {found_factor[0]}<{fflen}> ({('composite','prime')[found_factor[1]]})\n')
         progress_stream.write(f'cofactor {shortnum(found_cofactor[0])} ({('composite','prime')[found_cofactor[1]]})\n')
 
@@ -259,13 +484,24 @@ def ecm_runner(n:int,
 def prefactor_runner(n:int,
                      lim_tdiv:int=0,
                      lim_prho:int=0,
-                     ecm_b1_curves:tuple[tuple[int,int],...]=(),
+                     ecm_b1_curves:tuple[tuple[int,int],...]|EcmPlanner=(),
                      ecm_threads:int=0,
-                     progress_stream=None) -> list[tuple[int,bool,str]]:
+                     progress_stream=None,
+                     ecm_done:dict[int,int]|None=None,
+                     ecm_effort:dict[int,dict[int,int]]|None=None,
+                     ecm_known:dict[int,dict[int,int]]|None=None) \
+                        -> list[tuple[int,bool,str]]:
     '''
     apply prefactoring steps to number and get a list of (factor,primality,algo)
     primality is a probable test from gmpy2.is_prime
     algo is the algorithm used from ('tdiv','prho','ecm')
+    ecm_b1_curves is (b1,curves) run in order on each cofactor, or a planner
+    choosing them for each cofactor from its size and the effort done on it
+    ecm_done is b1 -> curves already run on n (only the rest are run)
+    ecm_known is cofactor -> (b1 -> curves) already run on cofactors which
+    may come up (such as the effort recorded in the database)
+    ecm_effort gets cofactor -> (b1 -> curves) run by this call for the
+    cofactors left unfactored (to record with the database)
     '''
     assert n > 1
     cofactor = n
@@ -277,16 +513,7 @@ def prefactor_runner(n:int,
         if progress_stream:
             progress_stream.write(f'running tdiv on {shortnum(cofactor)}\n')
         t = time()
-        proc_tdiv = subprocess.Popen(
-            [path_tdiv,str(lim_tdiv),str(cofactor)],
-            stdin=subprocess.PIPE,
-            stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE,
-            universal_newlines=True
-        )
-        assert proc_tdiv.stdout
-        for line in proc_tdiv.stdout:
-            f = int(line)
+        for f in tdiv_factors(cofactor,lim_tdiv):
             assert prp(f)
             factors.append((f,True,'tdiv'))
             assert cofactor % f == 0
@@ -317,22 +544,13 @@ def prefactor_runner(n:int,
             if progress_stream:
                 progress_stream.write(f'running prho on {shortnum(cofactor)}\n')
             t = time()
-            proc_prho = subprocess.Popen(
-                [path_prho,str(lim_prho),str(x0),str(b),str(cofactor)],
-                stdin=subprocess.PIPE,
-                stdout=subprocess.PIPE,
-                stderr=subprocess.PIPE,
-                universal_newlines=True
-            )
-            assert proc_prho.stdout
-            line = proc_prho.stdout.readline()
-            if not line: # did not find factor
+            f = prho_factor(cofactor,lim_prho,x0,b)
+            if f is None: # did not find factor
                 if progress_stream:
                     progress_stream.write(f'no factor found ({time()-t:.3f} sec)\n')
                 cofactors_done.append(cofactor)
                 continue
 
-            f = int(line)
             lf = len(str(f))
             assert 1 < f < cofactor
             assert cofactor % f == 0
@@ -344,6 +562,13 @@ def prefactor_runner(n:int,
     # attempt ecm until it fails to find factor with all parameter choices
     cofactors_attempt = cofactors_done
     cofactors_done = []
+    done = ecm_done or {}
+    planner = ecm_b1_curves if isinstance(ecm_b1_curves,EcmPlanner) else None
+    if planner is None:
+        ecm_b1_curves = tuple((b1,curves-done.get(b1,0))
+                              for b1,curves in ecm_b1_curves
+                              if curves > done.get(b1,0))
+    history: dict[int,dict[int,int]] = {c: {} for c in cofactors_attempt}
     while len(cofactors_attempt) > 0:
         # get a cofactor, nothing to do if it is prime
         cofactor = cofactors_attempt.pop()
@@ -353,19 +578,39 @@ def prefactor_runner(n:int,
             continue
 
         # ecm using selected parameter choices
+        known = dict(done)
+        for b1,curves in (ecm_known or {}).get(cofactor,{}).items():
+            known[b1] = max(known.get(b1,0),curves)
+        if planner:
+            effort = known
+            for b1,curves in history[cofactor].items():
+                effort[b1] = effort.get(b1,0) + curves
+            b1_curves = planner.plan(cofactor,effort)
+        else:
+            # done is already subtracted from ecm_b1_curves
+            b1_curves = tuple((b1,curves-known.get(b1,0)+done.get(b1,0))
+                              for b1,curves in ecm_b1_curves
+                              if curves > known.get(b1,0)-done.get(b1,0))
         f1,f2,num_curves = 0,0,0
+        t = time()
         index_b1_curves = 0 # count b1 choices that found no factors
-        for b1,curves in ecm_b1_curves:
+        for b1,curves in b1_curves:
             t = time()
             if progress_stream:
                 progress_stream.write(f'running ecm (b1={b1},runs={curves}) on {shortnum(cofactor)}\n')
             f1,f2,num_curves = ecm_runner(cofactor,curves,b1,threads=ecm_threads,progress_stream=progress_stream)
+            if num_curves > 0:
+                history[cofactor][b1] = history[cofactor].get(b1,0) + num_curves
             if f1 != 0:
                 break
             index_b1_curves += 1
 
         # do not rerun parameters which found no factors
-        ecm_b1_curves = ecm_b1_curves[index_b1_curves:]
+        # (a planner counts them in the effort of the cofactors instead)
+        if not planner:
+            failed = set(b1 for b1,_ in b1_curves[:index_b1_curves])
+            ecm_b1_curves = tuple((b1,curves) for b1,curves in ecm_b1_curves
+                                  if b1 not in failed)
 
         if f1 == 0: # no factor found
             if progress_stream:
@@ -386,13 +631,75 @@ def prefactor_runner(n:int,
             progress_stream.write(f'>>> found factor {f1}<{lf1}> with ecm ({time()-t:.3f} sec)\n')
         cofactors_attempt.append(f1)
         cofactors_attempt.append(f2)
+        history[f1] = dict(history[cofactor])
+        history[f2] = dict(history[cofactor])
 
     # after this would be snfs/gnfs if choosing to implement further factoring
     for f in cofactors_done:
         factors.append((f,prp(f),'ecm'))
+        if ecm_effort is not None and history[f]:
+            ecm_effort[f] = history[f]
 
     return sorted(factors)
 
+# ==========
+# scheduling
+# ==========
+
+def prefactor_many(nums:Iterable[tuple[Hashable,int]],
+                   jobs:int=0,
+                   ordered:bool=True,
+                   **kwargs) \
+                    -> Generator[tuple[Hashable,list[tuple[int,bool,str]]|None],None,None]:
+    '''
+    run prefactor_runner on (key,number) pairs, up to jobs numbers at once
+    so tdiv/prho of upcoming numbers overlap with ecm of earlier ones
+    all of them share core_budget so the machine is used without overloading
+    yields (key,factors) in input order, or as completed if not ordered
+    (factors is none for numbers below 2, they are not factored)
+    kwargs are passed to prefactor_runner
+    '''
+    if jobs <= 0:
+        jobs = core_budget.total
+    nums = iter(nums)
+    # numbers in input order, finished ones wait here for earlier ones
+    # (up to 4*jobs so a slow number does not hold up all the others)
+    pending: list[tuple[Hashable,concurrent.futures.Future]] = []
+    more = True
+    with concurrent.futures.ThreadPoolExecutor(jobs) as executor:
+        while more or pending:
+
+            # keep jobs numbers running
+            running = sum(not f.done() for _,f in pending)
+            while more and running < jobs and len(pending) < 4*jobs:
+                item = next(nums,None)
+                if item is None:
+                    more = False
+                    break
+                key,n = item
+                if n < 2:
+                    future: concurrent.futures.Future = concurrent.futures.Future()
+                    future.set_result(None)
+                    pending.append((key,future))
+                    continue
+                pending.append((key,executor.submit(prefactor_runner,n,**kwargs)))
+                running += 1
+
+            # only unfinished ones, finished ones waiting on an earlier number
+            # would make wait return immediately (busy loop)
+            waiting = [f for _,f in pending if not f.done()]
+            if waiting:
+                concurrent.futures.wait(waiting,
+                                        return_when=concurrent.futures.FIRST_COMPLETED)
+            if ordered:
+                while pending and pending[0][1].done():
+                    key,future = pending.pop(0)
+                    yield key,future.result()
+            else:
+                for key,future in [(k,f) for k,f in pending if f.done()]:
+                    pending.remove((key,future))
+                    yield key,future.result()
+
 # ===========
 # test runner
 # ===========
@@ -400,7 +707,7 @@ def prefactor_runner(n:int,
 # factoring parameters
 lim_tdiv = 10**5
 lim_prho = 10**6
-ecm_b1_curves = ((2000,2000),(10000,1000),(50000,500))
+ecm_b1_curves = EcmPlanner(25)
 
 if __name__ == '__main__':
 
@@ -85,13 +85,34 @@ bool prho_gmp(mpz_t N, uint64_t IT, uint64_t X0, uint64_t B)
 }
 
 // prho <iters> <init> <add> <number>
+// prho (no arguments) reads "<iters> <init> <add> <number>" lines from stdin
+// until eof and writes the factor (if found) for each followed by an empty line
 int main(int argc, char **argv)
 {
-    assert(argc == 5);
+    assert(argc == 5 || argc == 1);
     mpz_t N;
     mpz_init(N);
-    mpz_set_str(N,argv[4],10);
-    prho_gmp(N,atoll(argv[1]),atoll(argv[2]),atoll(argv[3]));
+    if (argc == 5)
+    {
+        mpz_set_str(N,argv[4],10);
+        prho_gmp(N,atoll(argv[1]),atoll(argv[2]),atoll(argv[3]));
+    }
+    else
+    {
+        uint64_t IT, X0, B;
+        while (scanf("%lu %lu %lu",&IT,&X0,&B) == 3)
+        {
+            // read outside assert so it still happens with NDEBUG
+            if (mpz_inp_str(N,stdin,10) == 0)
+            {
+                mpz_clear(N);
+                return 1;
+            }
+            prho_gmp(N,IT,X0,B);
+            printf("\n");
+            fflush(stdout);
+        }
+    }
     mpz_clear(N);
     return 0;
 }
@@ -50,14 +50,35 @@ void tdiv_gmp(mpz_t N, uint64_t L)
 }
 
 // tdiv <limit> <number>
+// tdiv (no arguments) reads "<limit> <number>" lines from stdin until eof
+// and writes the factors for each one followed by an empty line
 int main(int argc, char **argv)
 {
-    assert(argc == 3);
-    uint64_t L = atoll(argv[1]);
+    assert(argc == 3 || argc == 1);
     mpz_t N;
     mpz_init(N);
-    mpz_set_str(N,argv[2],10);
-    tdiv_gmp(N,L);
+    if (argc == 3)
+    {
+        uint64_t L = atoll(argv[1]);
+        mpz_set_str(N,argv[2],10);
+        tdiv_gmp(N,L);
+    }
+    else
+    {
+        uint64_t L;
+        while (scanf("%lu",&L) == 1)
+        {
+            // read outside assert so it still happens with NDEBUG
+            if (mpz_inp_str(N,stdin,10) == 0)
+            {
+                mpz_clear(N);
+                return 1;
+            }
+            tdiv_gmp(N,L);
+            printf("\n");
+            fflush(stdout);
+        }
+    }
     mpz_clear(N);
     return 0;
 }
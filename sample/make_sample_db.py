@@ -47,6 +47,9 @@ if not args.no_recreate_config:
             'prove_bit_lim': 256,
             'table_per_page_default': 20,
             'table_per_page_limit': 100,
+            'table_cache_size': 2**24,
+            'table_cache_ttl': 60.0,
+            'category_cache_ttl': 60.0,
             'max_content_length': 2**20,
             'max_factors_length': 2**16,
             'max_details_length': 2**18,
@@ -57,11 +60,24 @@ if not args.no_recreate_config:
             'db_pass': 'test_fdb',
             'db_name': 'test_fdb',
             'db_con_lim': 16,
+            'db_con_min': 1,
+            'db_con_timeout': 10.0,
+            'db_con_max_age': 3600.0,
             'log_to_file': True,
+            'log_batch_size': 100,
+            'log_flush_interval': 2.0,
             'admin_email': 'admin@example.com',
             'proxy_fix_mode': None,
             'proxy_fix_hops': 0,
-            'pari_mem': 32000000
+            'pari_mem': 32000000,
+            'prime_workers': 2,
+            'prime_cache_size': 10000,
+            'prime_cache_file': None,
+            'tdiv_bound': 100000,
+            'reservation_limit': 1000,
+            'reservation_lease_secs': 86400,
+            'api_batch_limit': 1000,
+            'api_export_limit': 2
         },f,indent=4)
 
 # import afterward because it creates a connection to the database
@@ -71,6 +87,9 @@ import app.database.categories as dbcat
 import app.database.users as dbuser
 import app.database.numbers as dbnum
 from app.database.helpers import FdbException
+from app.utils.primeService import startPrimeService
+
+startPrimeService()
 
 # ==============================================================================
 
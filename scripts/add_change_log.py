@@ -0,0 +1,26 @@
+#!/bin/python3
+
+'''
+add the changes table to a database created before it was in the schema
+(also updates the allowed change kinds of an existing table)
+'''
+
+import os
+import sys
+scriptdir = os.path.dirname(__file__)
+sys.path.append(f'{scriptdir}/..')
+
+from app.database.connectionPool import FdbConnection
+
+with FdbConnection() as con:
+    con.execute("create table if not exists changes ("
+                "id bigserial primary key unique not null, "
+                "kind int not null, "
+                "fac_id bigint default null, "
+                "num_id bigint default null, "
+                "time timestamp default timezone('utc',now()) not null);")
+    con.execute("alter table changes "
+                "drop constraint if exists check_kind, "
+                "add constraint check_kind check (kind in (0,1,2,3,4));")
+    con.commit()
+sys.stderr.write('changes table is up to date\n')
@@ -0,0 +1,28 @@
+#!/bin/python3
+
+'''
+add the ecm_effort table to a database created before it was in the schema
+(also updates the foreign key of an existing table to cascade on delete)
+'''
+
+import os
+import sys
+scriptdir = os.path.dirname(__file__)
+sys.path.append(f'{scriptdir}/..')
+
+from app.database.connectionPool import FdbConnection
+
+with FdbConnection() as con:
+    con.execute("create table if not exists ecm_effort ("
+                "fac_id bigint not null, "
+                "b1 bigint not null, "
+                "curves bigint not null, "
+                "unique (fac_id,b1), "
+                "constraint check_b1 check (b1 > 0), "
+                "constraint check_curves check (curves > 0));")
+    con.execute("alter table ecm_effort "
+                "drop constraint if exists ecm_effort_fac_id_fkey, "
+                "add constraint ecm_effort_fac_id_fkey foreign key (fac_id) "
+                "references factors(id) on delete cascade;")
+    con.commit()
+sys.stderr.write('ecm_effort table is up to date\n')
@@ -0,0 +1,26 @@
+#!/bin/python3
+
+'''
+split composites using factors shared with other composites (batch gcd)
+'''
+
+import argparse
+import os
+import sys
+scriptdir = os.path.dirname(__file__)
+sys.path.append(f'{scriptdir}/..')
+
+parser = argparse.ArgumentParser()
+parser.add_argument('path',type=str,nargs='?',
+                    help='only use cofactors in this category (and below)')
+parser.add_argument('-r','--rounds',type=int,default=10,
+                    help='maximum number of batch gcd passes')
+args = parser.parse_args()
+
+import app.database.batchGcd as db
+from app.utils.primeService import startPrimeService
+
+startPrimeService()
+
+count = db.refactorSharedFactors(args.path,max_rounds=args.rounds)
+sys.stderr.write(f'split {count} factors\n')
@@ -0,0 +1,28 @@
+#!/bin/python3
+
+'''
+export categories, sequences with factorizations, and factors as ndjson
+'''
+
+import argparse
+import os
+import sys
+scriptdir = os.path.dirname(__file__)
+sys.path.append(f'{scriptdir}/..')
+
+parser = argparse.ArgumentParser()
+parser.add_argument('path',type=str,nargs='?',default='',
+                    help='only export this category (and below)')
+parser.add_argument('-f','--factors',action='store_true',
+                    help='include all rows of the factors table')
+parser.add_argument('-z','--compression',type=str,choices=('gzip','zstd'))
+parser.add_argument('-o','--output',type=str,help='file (default stdout)')
+args = parser.parse_args()
+
+import app.database.export as db
+
+out = sys.stdout.buffer if args.output is None else open(args.output,'wb')
+with out:
+    for chunk in db.exportNdjson(args.path,factors=args.factors,
+                                 compression=args.compression):
+        out.write(chunk)
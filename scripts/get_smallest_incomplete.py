@@ -15,17 +15,33 @@ import app.database.numbers as db
 parser = argparse.ArgumentParser()
 parser.add_argument('type',type=str,help='unknown,composite,probable')
 parser.add_argument('limit',type=int,nargs='?')
+parser.add_argument('-b','--bits',type=int,help='largest factor size')
+parser.add_argument('-a','--after',type=int,
+                    help='start after this value (last one of a previous run)')
+parser.add_argument('-p','--page',type=int,default=10000,
+                    help='factors fetched per query')
 args = parser.parse_args()
 
 if args.type == 'unknown':
-    gen = db.smallestUnknowns(args.limit)
+    func = db.smallestUnknowns
 elif args.type == 'composite':
-    gen = db.smallestComposites(args.limit)
+    func = db.smallestComposites
 elif args.type == 'probable':
-    gen = db.smallestProbablePrimes(args.limit)
+    func = db.smallestProbablePrimes
 else:
     sys.stderr.write(f'invalid type: {args.type}\n')
     exit(1)
 
-for row in gen:
-    print(f'{row.id} {row.value}')
+# fetch pages continuing after the last value (keyset pagination)
+after = args.after
+remaining = args.limit
+while remaining is None or remaining > 0:
+    count = args.page if remaining is None else min(args.page,remaining)
+    rows = list(func(count,args.bits,after))
+    for row in rows:
+        print(f'{row.id} {row.value}')
+    if len(rows) < count:
+        break
+    after = rows[-1].value
+    if remaining is not None:
+        remaining -= len(rows)
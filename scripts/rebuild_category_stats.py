@@ -0,0 +1,37 @@
+#!/bin/python3
+
+'''
+recompute the stored statistics (counts, index and bit size ranges) of tables
+'''
+
+import argparse
+import os
+import sys
+scriptdir = os.path.dirname(__file__)
+sys.path.append(f'{scriptdir}/..')
+
+parser = argparse.ArgumentParser()
+parser.add_argument('--create-table',action='store_true',
+                    help='first create the category_stats table (older '
+                         'databases)')
+args = parser.parse_args()
+
+from app.database.connectionPool import FdbConnection
+
+if args.create_table:
+    with FdbConnection() as con:
+        con.execute("create table if not exists category_stats ("
+                    "cat_id bigint primary key unique not null, "
+                    "count bigint not null, "
+                    "index_min bigint, index_max bigint, "
+                    "bits_min int, bits_max int, "
+                    "complete bigint not null, "
+                    "foreign key (cat_id) references categories(id) "
+                    "on delete cascade);")
+        con.commit()
+    sys.stderr.write('created category_stats table\n')
+
+import app.database.categoryStats as db
+
+count = db.rebuildCategoryStats()
+sys.stderr.write(f'updated stats of {count} tables\n')
@@ -0,0 +1,34 @@
+#!/bin/python3
+
+'''
+recompute the stored factorization summary and progress for all numbers
+'''
+
+import argparse
+import os
+import sys
+scriptdir = os.path.dirname(__file__)
+sys.path.append(f'{scriptdir}/..')
+
+parser = argparse.ArgumentParser()
+parser.add_argument('-b','--batch-size',type=int,default=1000,
+                    help='numbers updated per transaction')
+parser.add_argument('--add-columns',action='store_true',
+                    help='first add the summary columns (older databases)')
+args = parser.parse_args()
+
+from app.database.connectionPool import FdbConnection
+
+if args.add_columns:
+    with FdbConnection() as con:
+        con.execute("alter table numbers "
+                    "add column if not exists summary jsonb default null, "
+                    "add column if not exists progress double precision "
+                    "default null;")
+        con.commit()
+    sys.stderr.write('added summary columns\n')
+
+import app.database.numbers as db
+
+count = db.rebuildNumberSummaries(args.batch_size)
+sys.stderr.write(f'updated {count} numbers\n')
@@ -0,0 +1,62 @@
+#!/bin/python3
+
+'''
+reserve factors for work, renew or release the reservations of a user
+'''
+
+import argparse
+import os
+import sys
+scriptdir = os.path.dirname(__file__)
+sys.path.append(f'{scriptdir}/..')
+
+parser = argparse.ArgumentParser()
+parser.add_argument('user',type=str,help='username, email, or id')
+parser.add_argument('action',type=str,help='claim,renew,release,list')
+parser.add_argument('-t','--type',type=str,default='composite',
+                    help='unknown,composite,probable (for claim)')
+parser.add_argument('-n','--count',type=int,default=1,
+                    help='number of factors to claim')
+parser.add_argument('-b','--bits',type=int,
+                    help='largest factor size to claim')
+parser.add_argument('-l','--lease',type=float,
+                    help='seconds until the reservations expire')
+parser.add_argument('-i','--ids',action='store_true',
+                    help='read factor IDs from stdin (for renew, release)')
+args = parser.parse_args()
+
+import app.database.reservations as db
+from app.database.users import getUser
+
+work_types = {'unknown': db.WorkType.PRP,
+              'composite': db.WorkType.FACTOR,
+              'probable': db.WorkType.PROVE}
+
+user = getUser(int(args.user) if args.user.isdigit() else args.user)
+if user is None:
+    sys.stderr.write(f'user does not exist: {args.user}\n')
+    exit(1)
+ids = [int(line.split()[0]) for line in sys.stdin if line.strip()] \
+    if args.ids else None
+
+if args.action == 'claim':
+    if args.type not in work_types:
+        sys.stderr.write(f'invalid type: {args.type}\n')
+        exit(1)
+    rows,expires = db.claimWork(user.id,work_types[args.type],args.count,
+                                args.bits,args.lease)
+    for row in rows:
+        print(f'{row.id} {row.value}')
+    sys.stderr.write(f'reserved {len(rows)} until {expires}\n')
+elif args.action == 'renew':
+    count = db.renewReservations(user.id,ids,args.lease)
+    sys.stderr.write(f'renewed {count} reservations\n')
+elif args.action == 'release':
+    count = db.releaseReservations(user.id,ids)
+    sys.stderr.write(f'released {count} reservations\n')
+elif args.action == 'list':
+    for row in db.getReservations(user.id):
+        print(f'{row.fac_id} {row.work} {row.expires}')
+else:
+    sys.stderr.write(f'invalid action: {args.action}\n')
+    exit(1)
@@ -11,6 +11,9 @@ scriptdir = os.path.dirname(__file__)
 sys.path.append(f'{scriptdir}/..')
 
 import app.database.numbers as db
+from app.utils.primeService import startPrimeService
+
+startPrimeService()
 
 for line in tqdm(sys.stdin.read().splitlines()):
     # first integer on the line
@@ -10,10 +10,10 @@ scriptdir = os.path.dirname(__file__)
 sys.path.append(f'{scriptdir}/..')
 
 from app.database.logging import currentTimeUtc
-from app.database.helpers import timestampToString
+from app.database.helpers import timestampToString, pathToString
 import app.database.stats as db
-from app.database.categories import walkCategories, getCategoryNumberInfo
-from app.database.numbers import NumberRow
+from app.database.categories import walkCategories
+from app.database.categoryStats import getAllCategoryStats
 
 print(f'Report Timestamp: {timestampToString(currentTimeUtc())}')
 print(f'Database Size: {db.getDatabaseSize()}')
@@ -21,20 +21,18 @@ print(f'Numbers Stored: {db.getNumbersCount()}')
 print(f'Factors Stored: {db.getFactorsCount()}')
 print()
 
+# table statistics are stored (see rebuild_category_stats.py)
+stats = getAllCategoryStats()
 for path,row in walkCategories():
-    if row.is_table:
-        info = getCategoryNumberInfo(path,0,1000000)
-        indexes = [i for i,_,_,_ in info]
-        if indexes == []:
-            print(f'/{'/'.join(path)} EMPTY')
-        else:
-            numlens = [n.value.bit_length() for _,_,n,_ in info if isinstance(n,NumberRow)]
-            complete_count = sum(1 for _,_,n,_ in info if not isinstance(n,NumberRow) or n.complete)
-            i0,i1 = min(indexes),max(indexes)
-            b0,b1 = (0,0) if numlens == [] else (min(numlens),max(numlens))
-            print(f'/{'/'.join(path)} '
-                f'indexes({i0}-{i1}) '
-                f'bitsizes({b0}-{b1}) '
-                f'completed({complete_count}/{len(indexes)})')
-            if set(indexes) != set(range(i0,i1+1)):
-                print(f'    INDEXES CONTAIN GAPS')
+    if not row.is_table:
+        continue
+    t = stats.get(row.id)
+    if t is None or t.count == 0:
+        print(f'{pathToString(path)} EMPTY')
+        continue
+    print(f'{pathToString(path)} '
+        f'indexes({t.index_min}-{t.index_max}) '
+        f'bitsizes({t.bits_min or 0}-{t.bits_max or 0}) '
+        f'completed({t.complete}/{t.count})')
+    if t.has_gaps:
+        print(f'    INDEXES CONTAIN GAPS')
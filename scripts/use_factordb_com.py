@@ -13,6 +13,9 @@ scriptdir = os.path.dirname(__file__)
 sys.path.append(f'{scriptdir}/..')
 
 import app.database.factordbCom as db
+from app.utils.primeService import startPrimeService
+
+startPrimeService()
 
 MAX_DELAY = 60
 
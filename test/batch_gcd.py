@@ -0,0 +1,49 @@
+#!/bin/python3
+
+'''
+check batchGcd and findSharedFactors against naive gcds
+(imports app.database.batchGcd so config.json must exist, does not connect)
+
+run from anywhere: python3 test/batch_gcd.py
+'''
+
+import argparse
+import math
+import os
+import random
+import sys
+scriptdir = os.path.dirname(__file__)
+sys.path.append(f'{scriptdir}/..')
+
+import gmpy2
+
+parser = argparse.ArgumentParser()
+parser.add_argument('--seed',type=int,default=1,help='random seed')
+args = parser.parse_args()
+
+rng = random.Random(args.seed)
+
+def random_prime(bits:int) -> int:
+    return int(gmpy2.next_prime(rng.getrandbits(bits) | (1 << (bits-1))))
+
+def check_batch_gcd():
+    from app.database.batchGcd import batchGcd, findSharedFactors
+    primes = [random_prime(64) for _ in range(12)]
+    values = [math.prod(rng.sample(primes,3)) for _ in range(40)]
+    values += [random_prime(100)*random_prime(100) for _ in range(10)]
+    for i,(v,g) in enumerate(zip(values,batchGcd(values))):
+        others = math.prod(values[:i]+values[i+1:])
+        assert g == math.gcd(v,others), v
+    assert batchGcd([]) == []
+    assert batchGcd([15]) == [1]
+    for v,f in findSharedFactors(values):
+        assert v in values and 1 < f < v and v % f == 0, (v,f)
+    # every value sharing a factor (but not equal to another) gets one
+    split = set(v for v,_ in findSharedFactors(values))
+    for i,v in enumerate(values):
+        if any(1 < math.gcd(v,w) < v for w in values[:i]+values[i+1:]):
+            assert v in split, v
+    print(f'batch gcd ok ({len(values)} values)')
+
+if __name__ == '__main__':
+    check_batch_gcd()
@@ -0,0 +1,104 @@
+#!/bin/python3
+
+'''
+check _FactorCascade (tryFactorsMany) against applying the same factors with
+one addFactor() call each, compares the resulting factorizations
+writes to the database, requires config.json for a scratch database whose
+name starts with test
+
+run from anywhere: python3 test/cascade.py
+'''
+
+import argparse
+import math
+import os
+import random
+import sys
+scriptdir = os.path.dirname(__file__)
+sys.path.append(f'{scriptdir}/..')
+
+import gmpy2
+
+parser = argparse.ArgumentParser()
+parser.add_argument('--seed',type=int,default=1,help='random seed')
+args = parser.parse_args()
+
+rng = random.Random(args.seed)
+
+def random_prime(bits:int) -> int:
+    return int(gmpy2.next_prime(rng.getrandbits(bits) | (1 << (bits-1))))
+
+# numbers as (small factor,large prime indexes) and the factors provided for
+# their cofactors (as large prime indexes), numbers 0 and 1 share a cofactor
+_NUMBERS = ((1,(0,1,2,3)),(6,(0,1,2,3)),(1,(0,1,4)),
+            (1,(2,3,5,6)),(5,(5,6)),(1,(7,8)))
+_FACTORS = (((0,),(1,),(2,)),((0,),),((4,),),((5,),(2,)),(),((7,),))
+
+def _labels(v:int,primes:list[int]) -> tuple:
+    # factor value by the indexes of the large primes dividing it
+    label: list = []
+    for i,p in enumerate(primes):
+        while v % p == 0:
+            label.append(i)
+            v //= p
+    return tuple(label) + ((v,) if v != 1 else ())
+
+def _run_cascade(batched:bool) -> list:
+    import app.database.numbers as db
+    primes = [random_prime(90) for _ in range(9)]
+    ids: list[int] = []
+    for small,indexes in _NUMBERS:
+        n = small * math.prod(primes[i] for i in indexes)
+        _,row = db.addNumber(n)
+        ids.append(row.id)
+    items = [(db.getNumberById(n_id).cof_id, # type:ignore
+              [math.prod(primes[i] for i in f) for f in fs])
+             for n_id,fs in zip(ids,_FACTORS)]
+
+    if batched:
+        db.tryFactorsMany(items)
+    else:
+        # one transaction per split like before _FactorCascade
+        for cof_id,fs in items:
+            for f in sorted(fs):
+                for g in _factor_leaves(db,cof_id):
+                    if 1 < f < g and g % f == 0:
+                        try:
+                            db.addFactor(g,f)
+                        except db.FdbException:
+                            pass
+
+    ret = []
+    for n_id in ids:
+        row = db.getNumberById(n_id)
+        assert row is not None
+        fs = db.getNumberFactorizationById(n_id)
+        assert fs is not None
+        assert math.prod(f for f,_,_ in fs) == row.value, n_id
+        ret.append((row.complete,sorted((_labels(f,primes),primality)
+                                        for f,primality,_ in fs)))
+    return ret
+
+def _factor_leaves(db,f_id:int) -> list[int]:
+    # composite or unknown values in the current factorization of a factor
+    row = db.getFactorById(f_id)
+    assert row is not None
+    if row.f1_id is None:
+        return [row.value] if row.primality != db.Primality.PRIME \
+            and row.primality != db.Primality.PROBABLE else []
+    return _factor_leaves(db,row.f1_id) + _factor_leaves(db,row.f2_id)
+
+def check_cascade():
+    from app.config import DB_NAME
+    assert DB_NAME.startswith('test'), 'refusing to write to ' + DB_NAME
+    one_call = _run_cascade(False)
+    batched = _run_cascade(True)
+    for i,(a,b) in enumerate(zip(one_call,batched)):
+        assert a == b, (i,a,b)
+    # numbers 0 and 5 are fully factored (1 through its shared cofactor)
+    assert [complete for complete,_ in batched] == \
+        [True,True,False,False,False,True]
+    print(f'cascade ok ({len(_NUMBERS)} numbers)')
+
+if __name__ == '__main__':
+    check_cascade()
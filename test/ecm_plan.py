@@ -0,0 +1,27 @@
+#!/bin/python3
+
+'''
+check prefactor/ecmplan.py expected_curves and t_level against the GMP-ECM
+expected curves table they are corrected to
+
+run from anywhere: python3 test/ecm_plan.py
+'''
+
+import os
+import sys
+scriptdir = os.path.dirname(__file__)
+sys.path.append(f'{scriptdir}/../prefactor')
+
+import ecmplan
+
+def check_ecm_plan():
+    for digits,b1,_,curves in ecmplan.ecm_table:
+        estimate = ecmplan.expected_curves(b1,digits)
+        assert abs(estimate/curves-1) <= 0.15, (digits,b1,estimate,curves)
+        # one t-level of curves at the table b1 reaches the table digits
+        assert abs(ecmplan.t_level({b1:curves})-digits) < 1, (digits,b1)
+    assert ecmplan.t_level({}) == 0
+    print(f'ecm plan ok ({len(ecmplan.ecm_table)} table rows)')
+
+if __name__ == '__main__':
+    check_ecm_plan()
@@ -0,0 +1,57 @@
+#!/bin/python3
+
+'''
+check smallFactorsMany and smallFactors against naive trial division
+(config.json must exist for TDIV_BOUND)
+
+run from anywhere: python3 test/trial_division.py
+'''
+
+import argparse
+import math
+import os
+import random
+import sys
+scriptdir = os.path.dirname(__file__)
+sys.path.append(f'{scriptdir}/..')
+
+import gmpy2
+
+parser = argparse.ArgumentParser()
+parser.add_argument('--seed',type=int,default=1,help='random seed')
+args = parser.parse_args()
+
+rng = random.Random(args.seed)
+
+def random_prime(bits:int) -> int:
+    return int(gmpy2.next_prime(rng.getrandbits(bits) | (1 << (bits-1))))
+
+def naive_small_factors(n:int,bound:int) -> tuple[list[int],int]:
+    fs: list[int] = []
+    p = 2
+    while p < bound and p*p <= n:
+        while n % p == 0:
+            fs.append(p)
+            n //= p
+        p += 1
+    # remaining n is prime if p*p > n
+    if 1 < n < bound:
+        fs.append(n)
+        n = 1
+    return fs,n
+
+def check_trial_division():
+    from app.config import TDIV_BOUND
+    from app.utils.trialDivision import smallFactorsMany, smallFactors
+    ns = [rng.randrange(1,10**30) for _ in range(200)]
+    ns += [2**64, 3**40, 1, 2, TDIV_BOUND, random_prime(80),
+           random_prime(20)*random_prime(90)]
+    ns += [math.prod(rng.choice((2,3,5,7,11,13)) for _ in range(30))]
+    for n,result in zip(ns,smallFactorsMany(ns)):
+        assert result == naive_small_factors(n,TDIV_BOUND), n
+        assert smallFactors(n) == result, n
+    assert smallFactorsMany([]) == []
+    print(f'trial division ok ({len(ns)} numbers)')
+
+if __name__ == '__main__':
+    check_trial_division()